@@ -0,0 +1,172 @@
+import math
+import numpy as np
+from .history import snapshot_date, query_history
+
+# Initial guesses for the IRR solver; all are iterated together and the converged
+# root closest to 0 wins (cash flow series with sign changes can have several roots)
+IRR_GUESSES = (-0.5, -0.1, 0.0, 0.1, 0.5, 1.0)
+IRR_TOLERANCE = 1e-10
+IRR_MAX_ITER = 100
+DAYS_PER_YEAR = 365.25
+
+
+def _holding_key(row):
+    return row.get("id") or f"{row.get('asset_type')}:{row.get('market')}:{row.get('ticker')}"
+
+
+def _unit_values(holdings):
+    """{key: (quantity, HKD value per unit, label fields)} for one snapshot's holdings."""
+    units = {}
+    for row in holdings:
+        quantity = float(row.get("quantity") or 0)
+        value = float(row.get("market_value_hkd") or 0)
+        units[_holding_key(row)] = (quantity, value / quantity if quantity else 0.0, row)
+    return units
+
+
+def irr(times, flows, guesses=IRR_GUESSES):
+    """
+    Annualized internal rate of return of `flows` at `times` (years from the first flow),
+    by Newton's method run on every guess at once. None if no guess converges.
+    """
+    t = np.asarray(times, dtype=float)[None, :]
+    cf = np.asarray(flows, dtype=float)[None, :]
+    rate = np.asarray(guesses, dtype=float)[:, None]
+    scale = np.abs(cf).sum() or 1.0
+    for _ in range(IRR_MAX_ITER):
+        disc = np.exp(-t * np.log1p(rate))
+        npv = (cf * disc).sum(axis=1, keepdims=True)
+        slope = (-t * cf * disc).sum(axis=1, keepdims=True) / (1 + rate)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = npv / slope
+        rate = np.maximum(rate - np.nan_to_num(step), -0.9999)
+        if np.all(np.abs(np.nan_to_num(step, nan=0.0)) < IRR_TOLERANCE):
+            break
+    disc = np.exp(-t * np.log1p(rate))
+    npv = (cf * disc).sum(axis=1)
+    rate = rate[:, 0]
+    ok = np.isfinite(rate) & (np.abs(npv) < 1e-6 * scale) & (rate > -0.9999)
+    if not ok.any():
+        return None
+    roots = rate[ok]
+    return float(roots[np.argmin(np.abs(roots))])
+
+
+class PerformanceSeries:
+    """
+    Return analytics over the snapshot history (last snapshot per day).
+
+    Between consecutive snapshots, market P/L is each holding's previous quantity times
+    the change in its HKD unit value (matched by holding id); whatever net worth change
+    is left over is treated as an external flow (deposit > 0, withdrawal < 0), assumed
+    to arrive at the end of the period.
+
+    Built once in O(n); prefix sums of log growth, squared log growth, flows and
+    per-holding P/L make TWR, volatility, net flows and attribution for any date range
+    O(1) (attribution O(holdings)). Max drawdown is a vectorized pass over the range.
+    """
+
+    def __init__(self, snapshots):
+        selected = query_history(snapshots, interval="daily")
+        self.dates = np.array([snapshot_date(s) for s in selected], dtype="datetime64[D]")
+        n = len(selected)
+        self.values = np.array([float(s.get("total_net_worth_hkd") or 0) for s in selected])
+        self.flows = np.zeros(n)
+        growth = np.zeros(n)
+
+        self.labels = {}
+        columns = {}
+        pnl_rows, pnl_cols, pnl_vals = [], [], []
+        previous = None
+        for i, snapshot in enumerate(selected):
+            units = _unit_values(snapshot.get("holdings_snapshot") or [])
+            if previous is not None:
+                pnl = 0.0
+                for key, (quantity, unit, row) in units.items():
+                    if key in previous:
+                        prev_quantity, prev_unit, _ = previous[key]
+                        change = prev_quantity * (unit - prev_unit)
+                        pnl += change
+                        if key not in columns:
+                            columns[key] = len(columns)
+                            self.labels[key] = {f: row.get(f) for f in ("id", "ticker", "market", "asset_type", "company_name")}
+                        pnl_rows.append(i)
+                        pnl_cols.append(columns[key])
+                        pnl_vals.append(change)
+                self.flows[i] = self.values[i] - self.values[i - 1] - pnl
+                if self.values[i - 1] > 0 and self.values[i] - self.flows[i] > 0:
+                    growth[i] = math.log((self.values[i] - self.flows[i]) / self.values[i - 1])
+            previous = units
+
+        # Prefix arrays: entry i covers periods 1..i, so a range [a, b] is P[b] - P[a]
+        self.cum_growth = np.cumsum(growth)
+        self.cum_growth_sq = np.cumsum(growth * growth)
+        self.cum_flows = np.cumsum(self.flows)
+        days = (self.dates - self.dates[0]).astype(float) if n else np.zeros(0)
+        self.years = days / DAYS_PER_YEAR
+        self.keys = list(columns)
+        pnl = np.zeros((n, len(columns)))
+        np.add.at(pnl, (np.array(pnl_rows, dtype=int), np.array(pnl_cols, dtype=int)), pnl_vals)
+        self.cum_pnl = np.cumsum(pnl, axis=0)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _range(self, start=None, end=None):
+        a = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), side="left"))
+        b = len(self.dates) - 1 if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), side="right")) - 1
+        return a, b
+
+    def twr(self, a, b):
+        return math.exp(self.cum_growth[b] - self.cum_growth[a]) - 1
+
+    def volatility(self, a, b):
+        """Annualized std of per-period log returns (periods scaled by their average length)."""
+        m = b - a
+        if m < 2:
+            return None
+        total = self.cum_growth[b] - self.cum_growth[a]
+        total_sq = self.cum_growth_sq[b] - self.cum_growth_sq[a]
+        variance = max((total_sq - total * total / m) / (m - 1), 0.0)
+        years_per_period = (self.years[b] - self.years[a]) / m
+        return math.sqrt(variance / years_per_period) if years_per_period > 0 else None
+
+    def max_drawdown(self, a, b):
+        """Largest peak-to-trough fall of the time-weighted wealth index (so flows are not drawdowns)."""
+        wealth = np.exp(self.cum_growth[a:b + 1] - self.cum_growth[a])
+        return float(np.max(1 - wealth / np.maximum.accumulate(wealth)))
+
+    def mwr(self, a, b):
+        """Annualized money-weighted return (IRR): start value and flows in, end value out."""
+        if self.years[b] - self.years[a] <= 0:
+            return None
+        times = self.years[a:b + 1] - self.years[a]
+        flows = -self.flows[a:b + 1].copy()
+        flows[0] = -self.values[a]
+        flows[-1] += self.values[b]
+        return irr(times, flows)
+
+    def attribution(self, a, b):
+        pnl = self.cum_pnl[b] - self.cum_pnl[a]
+        rows = [{**self.labels[key], "pnl_hkd": float(value)} for key, value in zip(self.keys, pnl) if value]
+        return sorted(rows, key=lambda r: -abs(r["pnl_hkd"]))
+
+    def summary(self, start=None, end=None):
+        a, b = self._range(start, end)
+        if len(self.dates) == 0 or b < a:
+            return None
+        net_flows = float(self.cum_flows[b] - self.cum_flows[a])
+        return {
+            "start": str(self.dates[a]),
+            "end": str(self.dates[b]),
+            "periods": b - a,
+            "start_value_hkd": float(self.values[a]),
+            "end_value_hkd": float(self.values[b]),
+            "net_flows_hkd": net_flows,
+            "pnl_hkd": float(self.values[b] - self.values[a]) - net_flows,
+            "twr": self.twr(a, b),
+            "mwr_annualized": self.mwr(a, b),
+            "max_drawdown": self.max_drawdown(a, b),
+            "volatility_annualized": self.volatility(a, b),
+            "attribution": self.attribution(a, b),
+        }
@@ -1,9 +1,15 @@
 import json
 import os
+import threading
+import time
 from typing import List, Optional
 from uuid import uuid4
 from datetime import date
 from .models import Holding, PortfolioSnapshot
+from .storage import create_storage
+from .history import query_history
+from .rwlock import ReadWriteLock
+from . import startup
 
 from pathlib import Path
 
@@ -11,15 +17,33 @@ from pathlib import Path
 docs_dir = Path.home() / "Documents" / "PortfolioManager"
 docs_dir.mkdir(parents=True, exist_ok=True)
 DATA_FILE = str(docs_dir / "portfolio_data.json")
+DB_FILE = str(docs_dir / "portfolio_data.db")
+# "sqlite" (default) or "json" (legacy single-file storage)
+STORAGE_BACKEND = os.environ.get("PORTFOLIO_STORAGE", "sqlite")
 
 class DataManager:
-    def __init__(self):
-        self.data_file = DATA_FILE
+    def __init__(self, storage=None):
+        self.storage = storage or create_storage(STORAGE_BACKEND, DATA_FILE, DB_FILE)
+        self.data_file = self.storage.location
         print(f"Data file location: {self.data_file}")
+        # Bumped on every holdings change; lets cached valuations detect staleness
+        self._holdings_version = 0
+        # Bumped on every snapshot change (cached history analytics)
+        self._snapshots_version = 0
+        # Both are per-process cache keys; HTTP validators come from storage (see validators())
+        self._listeners = []
+        # Readers (summary, history, export) run in parallel; mutations are serialized.
+        # Stored rows are never mutated in place, so readers may hold on to them after release.
+        self._lock = ReadWriteLock()
+        # Snapshot history is read on first use (see _ensure_snapshots), not at startup
+        self._snapshots_loaded = False
+        self._snapshot_load_lock = threading.Lock()
         self._load_data()
 
     def _load_data(self):
-        if not os.path.exists(self.data_file):
+        # Baseline for sync(): read before loading, so a racing commit can only cause an extra reload
+        self._data_version = self.storage.data_version()
+        if not self.storage.exists():
             # Create default demo holdings for new users
             self.data = {
                 "holdings": [
@@ -54,57 +78,290 @@ class DataManager:
                 ],
                 "snapshots": []
             }
+            self._snapshots_loaded = True
             self._save_data()
         else:
-            with open(self.data_file, "r") as f:
-                self.data = json.load(f)
-            # Backfill IDs for snapshots if missing
-            changed = False
-            for s in self.data["snapshots"]:
-                if "id" not in s:
-                    s["id"] = str(uuid4())
-                    changed = True
-            if changed:
-                self._save_data()
+            # Holdings only (the JSON backend has to parse the history as well)
+            self.data = self.storage.load(snapshots=False)
+
+    def _ensure_snapshots(self):
+        """
+        Load the snapshot history on first use, so startup and holdings-only requests
+        never pay for it. Call before taking self._lock.
+        """
+        self.sync()
+        while not self._snapshots_loaded:
+            self._load_snapshots()
+
+    def _load_snapshots(self):
+        with self._snapshot_load_lock:
+            if self._snapshots_loaded:
+                return
+            start = time.perf_counter()
+            loaded_at = self._snapshots_version
+            snapshots = self.data.get("snapshots")
+            if snapshots is None:
+                snapshots = self.storage.load_snapshots()
+            # Backfill IDs for snapshots if missing (new rows: readers may share the loaded ones)
+            missing = any("id" not in s for s in snapshots)
+            if missing:
+                snapshots = [s if "id" in s else {**s, "id": str(uuid4())} for s in snapshots]
+            with self._lock.write():
+                # A snapshot write, sync() reload or replace_all since we started: retry
+                if self._snapshots_loaded or self._snapshots_version != loaded_at:
+                    return
+                self.data["snapshots"] = snapshots
+                self._snapshots_loaded = True
+            startup.deferred("load_snapshots", time.perf_counter() - start)
+            print(f"Loaded {len(snapshots)} snapshots in {time.perf_counter() - start:.2f}s")
+            if missing:
+                threading.Thread(target=self._save_data_locked, name="snapshot-id-backfill", daemon=True).start()
+
+    def _save_data_locked(self):
+        with self._lock.read():
+            self._save_data()
 
     def _save_data(self):
-        with open(self.data_file, "w") as f:
-            json.dump(self.data, f, default=str, indent=4)
+        """Full rewrite of everything; prefer the single-row operations below."""
+        self.storage.save_all(self.data)
+
+    def _holdings_changed(self):
+        """Call with the write lock held; returns the new holdings_version."""
+        self._holdings_version += 1
+        return self._holdings_version
+
+    def _snapshots_changed(self):
+        self._snapshots_version += 1
+
+    def validators(self, *names):
+        """
+        (ETag parts, Last-Modified) for "holdings" / "snapshots": the version counters and
+        change times the storage commits together with each write, so every worker on the
+        same database derives the same validators for the same data. Read them before
+        the data: a racing write then only makes the validators older, never newer.
+        """
+        versions = self.storage.versions()
+        parts = [f"{name[0]}{versions[name][0]}.{int(versions[name][1] * 1e6):x}" for name in names]
+        return parts, max(versions[name][1] for name in names)
+
+    def sync(self):
+        """
+        Reload if another process (another worker, see backend/workers.py) committed to
+        the storage since we last looked. Holdings are reloaded, snapshots go back to
+        lazy loading, and listeners get a "replace" event. Cheap when nothing changed
+        (one PRAGMA data_version). Call without holding self._lock.
+        """
+        data_version = self.storage.data_version()
+        if data_version == self._data_version:
+            return
+        with self._lock.write():
+            data_version = self.storage.data_version()
+            if data_version == self._data_version:
+                return
+            self.data = self.storage.load(snapshots=False)
+            self._snapshots_loaded = False
+            self._data_version = data_version
+            self._snapshots_changed()
+            version = self._holdings_changed()
+        print("Reloaded data changed by another worker")
+        self._emit("replace", version)
+
+    @property
+    def holdings_version(self):
+        self.sync()
+        return self._holdings_version
+
+    @property
+    def snapshots_version(self):
+        self.sync()
+        return self._snapshots_version
+
+    def subscribe(self, listener):
+        """
+        Register listener(event, old, new, holdings_version) for holdings changes.
+        event: "add" | "update" | "delete" (old/new are holding dicts) or "replace" (bulk).
+        Listeners run after the write lock is released and may see events out of order
+        under concurrent edits; `holdings_version` tells them whether they missed one.
+        """
+        self._listeners.append(listener)
+
+    def _emit(self, event, version, old=None, new=None):
+        for listener in self._listeners:
+            try:
+                listener(event, old, new, version)
+            except Exception as e:
+                print(f"Holdings listener error: {e}")
 
     def get_holdings(self) -> List[Holding]:
-        return [Holding(**h) for h in self.data["holdings"]]
+        self.sync()
+        with self._lock.read():
+            rows = list(self.data["holdings"])
+        return [Holding(**h) for h in rows]
+
+    def get_holdings_versioned(self):
+        """(holdings, holdings_version) read together, so the version matches the holdings exactly."""
+        self.sync()
+        with self._lock.read():
+            rows = list(self.data["holdings"])
+            version = self._holdings_version
+        return [Holding(**h) for h in rows], version
 
     def add_holding(self, holding: Holding):
         if not holding.id:
             holding.id = str(uuid4())
-        self.data["holdings"].append(holding.dict())
-        self._save_data()
+        row = holding.dict()
+        self.sync()
+        with self._lock.write():
+            self.data["holdings"].append(row)
+            version = self._holdings_changed()
+            self.storage.upsert_holding(row)
+        self._emit("add", version, new=row)
 
     def update_holding(self, holding: Holding):
-        for i, h in enumerate(self.data["holdings"]):
-            if h["id"] == holding.id:
-                self.data["holdings"][i] = holding.dict()
-                self._save_data()
-                return
-        raise ValueError("Holding not found")
+        row = holding.dict()
+        self.sync()
+        with self._lock.write():
+            for i, h in enumerate(self.data["holdings"]):
+                if h["id"] == holding.id:
+                    self.data["holdings"][i] = row
+                    version = self._holdings_changed()
+                    self.storage.upsert_holding(row)
+                    break
+            else:
+                raise ValueError("Holding not found")
+        self._emit("update", version, old=h, new=row)
 
     def delete_holding(self, holding_id: str):
-        self.data["holdings"] = [h for h in self.data["holdings"] if h["id"] != holding_id]
-        self._save_data()
+        self.sync()
+        with self._lock.write():
+            removed = next((h for h in self.data["holdings"] if h["id"] == holding_id), None)
+            self.data["holdings"] = [h for h in self.data["holdings"] if h["id"] != holding_id]
+            version = self._holdings_changed()
+            self.storage.delete_holding(holding_id)
+        self._emit("delete", version, old=removed)
+
+    def replace_holdings(self, holdings: List[dict]):
+        """Replace all current holdings (restore / import), leaving snapshots untouched."""
+        # Copy so later edits never write through into the source (e.g. a snapshot's holdings)
+        rows = [dict(h) for h in holdings]
+        with self._lock.write():
+            self.data["holdings"] = rows
+            version = self._holdings_changed()
+            self.storage.replace_holdings(rows)
+        self._emit("replace", version)
+
+    def flush(self):
+        """Write any pending (write-behind) changes to disk now."""
+        self.storage.flush()
+
+    def replace_all(self, data: dict):
+        """Replace holdings and snapshot history (full import)."""
+        with self._lock.write():
+            self.data = data
+            self._snapshots_loaded = True
+            self._snapshots_changed()
+            version = self._holdings_changed()
+            self._save_data()
+        self._emit("replace", version)
+
+    def import_batches(self, batches, history=False):
+        """
+        Replace holdings, and with history=True the snapshot history too, from an
+        iterable of ("holdings" | "snapshots", rows) batches (see transfer.parse_import).
+        Batches are staged in storage as they arrive and swapped in at the end, so only
+        one batch is in memory at a time; snapshot batches are skipped unless `history`.
+        Nothing changes when no row was staged. Returns the staged row counts.
+        """
+        with self.storage.begin_import(history) as staged:
+            for name, rows in batches:
+                if name == "snapshots" and not history:
+                    continue
+                for row in rows:
+                    if not row.get("id"):
+                        row["id"] = str(uuid4())
+                staged.add(name, rows)
+            counts = dict(staged.counts)
+            if not any(counts.values()):
+                return counts
+            self.sync()
+            with self._lock.write():
+                staged.commit()
+                # Holdings are small; a new history loads lazily like at startup
+                snapshots = self.data.get("snapshots")
+                self.data = self.storage.load(snapshots=False)
+                if snapshots is not None and not history:
+                    self.data.setdefault("snapshots", snapshots)
+                if history:
+                    self._snapshots_loaded = False
+                    self._snapshots_changed()
+                version = self._holdings_changed()
+        self._emit("replace", version)
+        return counts
+
+    def export(self) -> dict:
+        """Consistent point-in-time copy of holdings and snapshots."""
+        while True:
+            self._ensure_snapshots()
+            with self._lock.read():
+                # Unless a sync() reload dropped the history in between
+                if self._snapshots_loaded:
+                    return {key: list(value) if isinstance(value, list) else value for key, value in self.data.items()}
+
+    def _snapshot_rows(self):
+        """The loaded snapshot list (loading it first); safe against a concurrent sync() reload."""
+        while True:
+            self._ensure_snapshots()
+            with self._lock.read():
+                if self._snapshots_loaded:
+                    return list(self.data["snapshots"])
 
     def save_snapshot(self, snapshot: PortfolioSnapshot):
         if not snapshot.id:
             snapshot.id = str(uuid4())
             
         # Always append new snapshot as per user request to keep history of every update
-        self.data["snapshots"].append(snapshot.dict())
-        
-        self._save_data()
+        row = snapshot.dict()
+        with self._lock.write():
+            # Not loaded yet: storage is the only copy, and loaders retry after this write
+            if "snapshots" in self.data:
+                self.data["snapshots"].append(row)
+            self._snapshots_changed()
+            self.storage.add_snapshot(row)
+
+    def save_snapshots(self, snapshots):
+        """Append many snapshots in one storage write (used by the backfill job)."""
+        if not snapshots:
+            return
+        rows = []
+        for snapshot in snapshots:
+            if not snapshot.id:
+                snapshot.id = str(uuid4())
+            rows.append(snapshot.dict())
+        with self._lock.write():
+            if "snapshots" in self.data:
+                self.data["snapshots"].extend(rows)
+            self._snapshots_changed()
+            self.storage.add_snapshots(rows)
 
     def delete_snapshot(self, snapshot_id: str):
         print(f"Deleting snapshot with ID: {snapshot_id}")
-        self.data["snapshots"] = [s for s in self.data["snapshots"] if s.get("id") != snapshot_id]
-        self._save_data()
+        with self._lock.write():
+            if "snapshots" in self.data:
+                self.data["snapshots"] = [s for s in self.data["snapshots"] if s.get("id") != snapshot_id]
+            self._snapshots_changed()
+            self.storage.delete_snapshot(snapshot_id)
+
+    def get_history(self, start: Optional[date] = None, end: Optional[date] = None,
+                    interval: Optional[str] = None, net_worth_only: bool = False):
+        self.sync()
+        if net_worth_only and not self._snapshots_loaded:
+            # Dates and totals only: read them without loading (and decoding) the full history
+            snapshots = self.storage.load_snapshots(holdings=False)
+            return query_history(snapshots, start, end, interval, net_worth_only)
+        snapshots = self._snapshot_rows()
+        if start is None and end is None and interval is None and not net_worth_only:
+            return snapshots
+        return query_history(snapshots, start, end, interval, net_worth_only)
 
-    def get_history(self):
-        return self.data["snapshots"]
+    def get_snapshot(self, snapshot_id: str) -> Optional[dict]:
+        return next((s for s in self._snapshot_rows() if s.get("id") == snapshot_id), None)
@@ -0,0 +1,79 @@
+import json
+import zlib
+from datetime import date
+
+INTERVALS = ("daily", "weekly", "monthly")
+NET_WORTH_FIELDS = ("id", "date", "total_net_worth_hkd")
+
+
+def encode_holdings(holdings):
+    """
+    Columnar, zlib-compressed encoding of a snapshot's holdings list.
+    Rows usually share a handful of key sets (Cash / Stock / Option), so we store
+    each distinct key set once, a key-set index per row, and one value list per column.
+    """
+    schemas = []
+    schema_index = {}
+    row_schema = []
+    columns = {}
+    for i, row in enumerate(holdings):
+        keys = tuple(row.keys())
+        if keys not in schema_index:
+            schema_index[keys] = len(schemas)
+            schemas.append(list(keys))
+        row_schema.append(schema_index[keys])
+        for key in keys:
+            columns.setdefault(key, [None] * len(holdings))[i] = row[key]
+    payload = {"schemas": schemas, "rows": row_schema, "columns": columns}
+    return zlib.compress(json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_holdings(blob):
+    if not blob:
+        return []
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    schemas = payload["schemas"]
+    columns = payload["columns"]
+    return [{key: columns[key][i] for key in schemas[s]} for i, s in enumerate(payload["rows"])]
+
+
+def snapshot_date(snapshot):
+    d = snapshot.get("date")
+    if isinstance(d, date):
+        return d
+    return date.fromisoformat(str(d)[:10])
+
+
+def _bucket(d, interval):
+    if interval == "daily":
+        return d
+    if interval == "weekly":
+        return d.isocalendar()[:2]
+    return d.year, d.month
+
+
+def query_history(snapshots, start=None, end=None, interval=None, net_worth_only=False):
+    """
+    Filter snapshots to [start, end], optionally keep only the last snapshot per
+    day / ISO week / month, and optionally project to id/date/net worth only.
+    Snapshots are returned in chronological order (stable for same-day entries).
+    """
+    if interval is not None and interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+
+    selected = []
+    for s in snapshots:
+        d = snapshot_date(s)
+        if (start is None or d >= start) and (end is None or d <= end):
+            selected.append((d, s))
+    selected.sort(key=lambda item: item[0])
+
+    if interval is not None:
+        last_per_bucket = {}
+        for d, s in selected:
+            last_per_bucket[_bucket(d, interval)] = (d, s)
+        selected = list(last_per_bucket.values())
+
+    if net_worth_only:
+        return [{k: s.get(k) for k in NET_WORTH_FIELDS} for _, s in selected]
+    return [s for _, s in selected]
@@ -1,18 +1,63 @@
-from fastapi import FastAPI, HTTPException
+from . import startup  # first, so the boot timing report includes every import
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+import asyncio
+import cProfile
+import io
 import os
 import sys
+import tempfile
+import time
 import webbrowser
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-from datetime import date, datetime
-from .models import Holding, PortfolioSnapshot, PortfolioSummary
-from .data_manager import DataManager
-from .market_data import MarketData
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+from .models import Holding, PortfolioSnapshot, PortfolioSummary, Scenario
+from .data_manager import STORAGE_BACKEND, DataManager, docs_dir
+from .market_data import MarketData, QuoteContext, use_shared_cache
+from .valuation import IncrementalValuation, value_portfolio
+from .scheduler import DEFAULT_SCHEDULE, SnapshotScheduler, SummaryCache, parse_schedule
+from .streaming import SummaryStreamer
+from .price_history import PriceHistoryStore, backfill_snapshots, from_day, valid_symbol
+from .analytics import PerformanceSeries
+from .transfer import FORMATS, ImportReport, export_csv, export_ndjson, parse_import
+from .metrics import HTTP_REQUEST_SECONDS, render as render_metrics, span
+from .quote_sources import LastKnownGoodStore
+from .symbol_metadata import SymbolMetadataStore
+from .responses import content_etag, dumps, json_response, not_modified, version_etag
+from .quote_cache import SharedQuoteCache
+from .workers import WORKERS, LeaderElection, LeaderLock, QuoteRefresher
+from . import risk
+from .scenarios import ScenarioBook
+import threading
 
-app = FastAPI()
+startup.mark("imports")
+
+def _warm_up():
+    """Import what the first summary needs while the app waits for its first request."""
+    start = time.perf_counter()
+    import pandas  # noqa: F401 (see valuation._group_sum)
+    startup.deferred("import_pandas", time.perf_counter() - start)
+
+@asynccontextmanager
+async def lifespan(app):
+    await leader_election.start()
+    startup.mark("lifespan")
+    print(startup.report())
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    yield
+    await leader_election.stop()
+    risk.shutdown()
+    price_history.flush()
+    market_data.last_known_good.flush()
+    symbol_metadata.flush()
+    data_manager.flush()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -23,8 +68,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# PORTFOLIO_PROFILING=1 allows ?profile=true on any request: a cProfile dump (.prof, open
+# with snakeviz / flameprof) is written to Documents/PortfolioManager/profiles.
+# Only the event-loop thread is profiled; sync endpoints run in the threadpool.
+PROFILING_ENABLED = os.environ.get("PORTFOLIO_PROFILING", "0") == "1"
+PROFILE_DIR = docs_dir / "profiles"
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Per-route latency histogram, plus the opt-in per-request profiler."""
+    profiler = None
+    if PROFILING_ENABLED and request.query_params.get("profile") in ("1", "true"):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        startup.first_response()
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route_path, status=str(status))
+        if profiler is not None:
+            profiler.disable()
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            name = route_path.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+            path = PROFILE_DIR / f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}.prof"
+            profiler.dump_stats(str(path))
+            print(f"Profile for {request.method} {request.url.path} ({elapsed * 1000:.1f} ms) written to {path}")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text format: spans, quote requests, cache hit/miss, storage writes, HTTP latency."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+if WORKERS > 1 and STORAGE_BACKEND == "json":
+    raise RuntimeError("Multiple workers need the SQLite storage (unset PORTFOLIO_STORAGE=json)")
+
 data_manager = DataManager()
+startup.mark("holdings")
 market_data = MarketData()
+# Multi-worker mode: a quote fetched by any worker is served to all of them
+shared_quotes = None
+if WORKERS > 1:
+    shared_quotes = SharedQuoteCache(docs_dir / "quote_cache.db")
+    use_shared_cache(shared_quotes)
+    # Only the leader refreshes stale quotes (see become_leader)
+    market_data.refresh_stale = False
+# Daily closes per symbol, fed by live quotes and CSV imports (realized vol, backfill)
+price_history = PriceHistoryStore(docs_dir / "prices")
+market_data.price_history = price_history
+# Last successful quote per symbol, served (marked stale) when every quote provider fails
+market_data.last_known_good = LastKnownGoodStore(docs_dir / "last_quotes.json")
+# Names, exchange, lot size and sector per symbol (filled from quotes and reference files)
+symbol_metadata = SymbolMetadataStore(docs_dir / "symbols.json")
+market_data.symbol_metadata = symbol_metadata
+if os.environ.get("PORTFOLIO_SYMBOL_FILE"):
+    with open(os.path.expanduser(os.environ["PORTFOLIO_SYMBOL_FILE"]), encoding="utf-8-sig") as f:
+        print(f"Loaded {symbol_metadata.load_reference(f.read())} symbols from {os.environ['PORTFOLIO_SYMBOL_FILE']}")
+startup.mark("caches")
 
 @app.get("/holdings", response_model=List[Holding])
 def get_holdings():
@@ -46,194 +152,296 @@ def delete_holding(holding_id: str):
     data_manager.delete_holding(holding_id)
     return {"status": "success"}
 
-@app.get("/portfolio/summary", response_model=PortfolioSummary)
-def get_portfolio_summary():
-    holdings = data_manager.get_holdings()
-    total_net_worth_hkd = 0.0
-    
-    summary_holdings = []
-    market_dist = {"US": 0, "HK": 0, "CN": 0, "Cash": 0}
-    sector_dist = {}
-    ticker_dist = {}
-
-    for h in holdings:
-        # 1. Get Current Price & FX
-        if h.asset_type == "Cash":
-            price = 1.0
-            # FX
-            currency = "HKD"
-            if h.market == "US": currency = "USD"
-            elif h.market == "CN": currency = "CNY"
-            fx = market_data.get_fx_rate(currency)
-            market_val_hkd = h.quantity * fx
-            
-            # Accumulate to total net worth
-            total_net_worth_hkd += market_val_hkd
-            
-            # Distribution
-            market_dist["Cash"] += market_val_hkd
-            
-            # Cost value in HKD
-            cost_value_hkd = h.cost_basis * h.quantity * fx
-            
-            summary_holdings.append({
-                **h.dict(),
-                "current_price": 1.0,
-                "market_value_hkd": market_val_hkd,
-                "cost_value_hkd": cost_value_hkd,
-                "sector": "Cash"
-            })
-            
-        elif h.asset_type == "Stock":
-            price = market_data.get_current_price(h.ticker, h.market)
-            currency = "HKD"
-            if h.market == "US": currency = "USD"
-            elif h.market == "CN": currency = "CNY"
-            fx = market_data.get_fx_rate(currency)
-            
-            # Handle None values from API
-            if price is None:
-                price = 0.0
-                print(f"Warning: Could not fetch price for {h.ticker} ({h.market})")
-            if fx is None:
-                fx = 1.0
-                print(f"Warning: Could not fetch FX rate for {currency}")
-            
-            market_val_hkd = h.quantity * price * fx
-            total_net_worth_hkd += market_val_hkd
-            
-            # Auto-fetch company name if not provided
-            if not h.company_name:
-                company_name = market_data.get_company_name(h.ticker, h.market)
-            else:
-                company_name = h.company_name
-            
-            # Sector - use custom_sector if provided, otherwise fetch
-            if h.custom_sector:
-                sector = h.custom_sector
-            else:
-                sector = market_data.get_sector(h.ticker, h.market)
-            
-            # Distributions
-            market_dist[h.market] = market_dist.get(h.market, 0) + market_val_hkd
-            sector_dist[sector] = sector_dist.get(sector, 0) + market_val_hkd
-            
-            # For ticker distribution: use company name for CN/HK, ticker code for US
-            ticker_key = h.ticker if h.market == "US" else (company_name or h.ticker)
-            ticker_dist[ticker_key] = ticker_dist.get(ticker_key, 0) + market_val_hkd
-            
-            # Calculate cost value in HKD for accurate P/L calculation
-            cost_value_hkd = h.cost_basis * h.quantity * fx
-            
-            summary_holdings.append({
-                **h.dict(),
-                "current_price": price,
-                "market_value_hkd": market_val_hkd,
-                "cost_value_hkd": cost_value_hkd,
-                "sector": sector,
-                "company_name": company_name
-            })
-
-        elif h.asset_type == "Option":
-            # Option Logic
-            # Price (Premium)
-            price = market_data.get_option_price(h.ticker, h.strike_price, h.expiry_date, h.option_type, h.market)
-            
-            currency = "HKD"
-            if h.market == "US": currency = "USD"
-            elif h.market == "CN": currency = "CNY"
-            fx = market_data.get_fx_rate(currency)
-            
-            # Handle None values
-            if price is None:
-                price = 0.0
-                print(f"Warning: Could not fetch option price for {h.ticker}")
-            if fx is None:
-                fx = 1.0
-                print(f"Warning: Could not fetch FX rate for {currency}")
-            
-            # Market Value of the option position itself (Premium * 100 * Contracts)
-            # If Short (Sell), value is negative debt, but for Net Worth it's usually (Cash received - Current Cost to Close)
-            # But simpler: Current Market Value = Price * 100 * Quantity.
-            # If I sold, I have -1 quantity. So Value is negative.
-            # Wait, user said "Sell Put", usually we track quantity as negative for short?
-            # Let's assume quantity is signed. -1 for Short.
-            
-            market_val_hkd = h.quantity * price * 100 * fx
-            total_net_worth_hkd += market_val_hkd
-            
-            # Margin / Exposure Calculation for Sell Put
-            # User Requirement: "Sell Put ... extra calculate Potential Exercise Value/Margin (Strike * 100 * Contracts)"
-            # And "add this to that company's proportion in summary"
-            
-            exposure_val_hkd = 0
-            if h.option_type == "Put" and h.quantity < 0:
-                # Sell Put
-                exposure_val_hkd = abs(h.quantity) * h.strike_price * 100 * fx
-            
-            # For distribution, user wants to see this exposure in Ticker Pie Chart?
-            # "In summary also count this to that company's proportion"
-            # So for Ticker Dist, we add exposure? Or just market value?
-            # "Pie Chart 3 (By Ticker): ... (Stock and sell put margin both count as position, but different transparency)"
-            # So yes, add exposure to ticker_dist.
-            
-            ticker_dist[h.ticker] = ticker_dist.get(h.ticker, 0) + exposure_val_hkd
-            
-            # What about Market Dist? Usually options count towards their market.
-            # Should we count exposure or market value? Usually market value for Net Worth.
-            # But for "Allocation", maybe exposure? 
-            # Let's stick to Market Value for Net Worth, but Exposure for "Allocation" charts if that's what user implies.
-            # User said "Pie Chart 1 ... Cash/HK/US/A".
-            # Let's add Market Value to Market Dist (because that's real money).
-            market_dist[h.market] = market_dist.get(h.market, 0) + market_val_hkd
-            
-            # Cost value in HKD for options
-            cost_value_hkd = h.cost_basis * abs(h.quantity) * 100 * fx
-            
-            summary_holdings.append({
-                **h.dict(),
-                "current_price": price,
-                "market_value_hkd": market_val_hkd,
-                "cost_value_hkd": cost_value_hkd,
-                "exposure_value_hkd": exposure_val_hkd,
-                "sector": "Option" # Or underlying sector?
-            })
-            
-            # If we want sector distribution to reflect exposure too?
-            # "Pie Chart 2 (By Sector)"
-            # Let's fetch underlying sector
-            sector = market_data.get_sector(h.ticker, h.market)
-            # Add exposure to sector dist? Or market value?
-            # Given the "Sell Put" emphasis, likely wants to see exposure.
-            # But mixing Market Value (Stocks) and Exposure (Options) in one pie chart is mathematically weird (sum > 100% net worth).
-            # But user asked for it.
-            sector_dist[sector] = sector_dist.get(sector, 0) + exposure_val_hkd
-
-    # Normalize distributions? Or just return values?
-    # Frontend can handle % calculation.
-    
-    return PortfolioSummary(
-        total_net_worth_hkd=total_net_worth_hkd,
-        holdings=summary_holdings,
-        market_distribution=market_dist,
-        sector_distribution=sector_dist,
-        ticker_distribution=ticker_dist
+async def compute_portfolio_summary(refresh=False):
+    """(summary, holdings_version the summary was computed from)."""
+    holdings, version = data_manager.get_holdings_versioned()
+    # Plan every symbol / FX pair the holdings need and fetch them in one batched,
+    # concurrent pass. After this every lookup is served from memory,
+    # so valuation makes no network calls and is safe on the event loop.
+    with span("quote_fetch"):
+        quotes = await QuoteContext(market_data).plan(holdings).afetch(refresh=refresh)
+    with span("valuation"):
+        return value_portfolio(holdings, quotes, market_data), version
+
+# Holding edits adjust the cached summary by the changed holding's delta only
+incremental_valuation = IncrementalValuation(market_data)
+data_manager.subscribe(incremental_valuation.on_holding_change)
+
+# Last computed summary, served instantly while holdings are unchanged (see SummaryCache)
+summary_cache = SummaryCache(compute_portfolio_summary, lambda: data_manager.holdings_version,
+                             incremental=incremental_valuation)
+
+async def run_scheduled_snapshot(market, day):
+    """Scheduled after-close valuation: skipped if nothing but cash is held in `market`."""
+    if not any(h.market == market and h.asset_type != "Cash" for h in data_manager.get_holdings()):
+        return
+    summary = await summary_cache.refresh()
+    snapshot = PortfolioSnapshot(
+        date=day,
+        total_net_worth_hkd=summary.total_net_worth_hkd,
+        holdings_snapshot=summary.holdings
     )
+    await run_in_threadpool(data_manager.save_snapshot, snapshot)
+    await run_in_threadpool(price_history.flush)
+    print(f"Scheduled {market} snapshot saved for {day}")
+
+# Opt-in: PORTFOLIO_SNAPSHOT_SCHEDULE="HK=16:15" (market local time, weekdays) saves one snapshot
+# per day after that close; each listed market adds its own daily snapshot. Off by default.
+snapshot_scheduler = SnapshotScheduler(
+    parse_schedule(os.environ.get("PORTFOLIO_SNAPSHOT_SCHEDULE", DEFAULT_SCHEDULE)),
+    run_scheduled_snapshot
+)
+
+async def refresh_held_quotes():
+    """Refetch every symbol / FX pair the holdings need (leader's quote refresher)."""
+    holdings = await run_in_threadpool(data_manager.get_holdings)
+    await QuoteContext(market_data).plan(holdings).afetch(refresh=True)
+
+quote_refresher = QuoteRefresher(refresh_held_quotes, shared_quotes) if shared_quotes is not None else None
+
+async def become_leader():
+    market_data.refresh_stale = True
+    snapshot_scheduler.start()
+    if quote_refresher is not None:
+        quote_refresher.start()
+
+async def resign_leadership():
+    await snapshot_scheduler.stop()
+    if quote_refresher is not None:
+        await quote_refresher.stop()
+
+# One process runs the background jobs, even with several workers (or app instances)
+leader_election = LeaderElection(LeaderLock(docs_dir / "leader.lock"), become_leader, resign_leadership)
+
+@app.get("/workers")
+def get_workers():
+    """This worker's pid, whether it is the elected leader, and the configured worker count."""
+    return {"workers": WORKERS, "pid": os.getpid(), "leader": leader_election.is_leader}
+
+@app.get("/startup")
+def get_startup():
+    """Boot phase timings, time to first response, and work deferred off the boot path."""
+    return startup.timings()
+
+@app.get("/quotes/status")
+def get_quote_status():
+    """Quote providers in fallback order with their circuit breaker state."""
+    return [{"provider": p.name, "state": p.breaker.state} for p in market_data.providers]
+
+@app.get("/symbols/{symbol}")
+def get_symbol(symbol: str):
+    """Cached metadata for a Tencent symbol (name, english_name, exchange, lot_size, sector)."""
+    entry = symbol_metadata.get(symbol)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Symbol not seen yet")
+    return {"symbol": symbol, **entry}
+
+@app.put("/symbols/{symbol}")
+def update_symbol(symbol: str, fields: dict):
+    """Set metadata fields for a symbol, e.g. {"sector": "Technology"}."""
+    try:
+        entry = symbol_metadata.update(symbol, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    summary_cache.invalidate()
+    return {"symbol": symbol, **entry}
+
+@app.post("/symbols/import")
+async def import_symbols(request: Request):
+    """Bulk load reference metadata: CSV with a `symbol` column, or a JSON object keyed by symbol."""
+    text = (await request.body()).decode("utf-8-sig")
+    try:
+        count = await run_in_threadpool(symbol_metadata.load_reference, text)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    summary_cache.invalidate()
+    return {"status": "success", "imported": count}
+
+# Encoded summary, reused while the summary cache keeps serving the same object
+_summary_body = {"summary": None, "body": None, "etag": None}
+
+@app.get("/portfolio/summary", response_model=PortfolioSummary)
+async def get_portfolio_summary(request: Request, fresh: bool = False):
+    """
+    Served from the hot summary cache; ?fresh=true forces a recomputation.
+    The ETag hashes the body (it depends on quotes as well as holdings), so a
+    recomputation that changed nothing still answers 304.
+    """
+    summary = await summary_cache.get(fresh=fresh)
+    if _summary_body["summary"] is not summary:
+        body = dumps(summary.dict())
+        _summary_body.update(summary=summary, body=body, etag=content_etag(body))
+    return json_response(request, body=_summary_body["body"], etag=_summary_body["etag"])
+
+async def compute_streamed_summary():
+    """
+    Stream refresher, keeps the hot summary cache warm. Only the leader fetches live
+    quotes every tick; other workers value from the shared quote cache it keeps current.
+    """
+    summary, version = await compute_portfolio_summary(refresh=leader_election.is_leader)
+    summary_cache.put(summary, version)
+    return summary
+
+summary_streamer = SummaryStreamer(compute_streamed_summary)
+
+@app.websocket("/ws/summary")
+async def stream_portfolio_summary(websocket: WebSocket):
+    """
+    Sends the full summary on connect, then {"type": "update"} messages containing
+    only changed holdings (plus removed ids, totals and distributions).
+    """
+    await summary_streamer.connect(websocket, await summary_cache.get())
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await summary_streamer.disconnect(websocket)
 
 @app.post("/snapshot")
-def create_snapshot():
-    summary = get_portfolio_summary()
+async def create_snapshot():
+    summary = await summary_cache.get(allow_stale=False)
     snapshot = PortfolioSnapshot(
         date=date.today(),
         total_net_worth_hkd=summary.total_net_worth_hkd,
         holdings_snapshot=summary.holdings
     )
-    data_manager.save_snapshot(snapshot)
+    await run_in_threadpool(data_manager.save_snapshot, snapshot)
     return {"status": "success", "snapshot": snapshot}
 
 @app.get("/history")
-def get_history():
-    return data_manager.get_history()
+def get_history(request: Request, start: Optional[date] = None, end: Optional[date] = None,
+                interval: Optional[str] = None, net_worth_only: bool = False):
+    """
+    Snapshot history. With no parameters returns every full snapshot.
+    - start / end: inclusive date range
+    - interval: 'daily' | 'weekly' | 'monthly' keeps the last snapshot per period
+    - net_worth_only: return only id, date and total_net_worth_hkd (for the chart)
+    Conditional: 304 while the snapshots are unchanged.
+    """
+    parts, last_modified = data_manager.validators("snapshots")
+    etag = version_etag(request, "history", *parts)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    try:
+        rows = data_manager.get_history(start, end, interval, net_worth_only)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(request, rows, etag=etag, last_modified=last_modified)
+
+# PerformanceSeries over the snapshot history, rebuilt only when snapshots change
+_performance = {"version": None, "series": None}
+
+def get_performance_series():
+    version = data_manager.snapshots_version
+    if _performance["version"] != version:
+        _performance["series"] = PerformanceSeries(data_manager.get_history())
+        _performance["version"] = version
+    return _performance["series"]
+
+@app.get("/analytics")
+def get_analytics(start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Performance over [start, end] of the snapshot history: time-weighted return,
+    annualized money-weighted return (IRR), max drawdown, annualized volatility,
+    net deposits/withdrawals and per-holding P/L attribution.
+    """
+    result = get_performance_series().summary(start, end)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No snapshots in range")
+    return result
+
+# Last risk report, reused while the holdings, the day and the parameters are unchanged
+_risk = {"key": None, "result": None}
+_risk_lock = asyncio.Lock()
+
+@app.get("/risk")
+async def get_risk(horizon_days: int = 1, paths: int = risk.RISK_PATHS, lookback: int = risk.RISK_LOOKBACK):
+    """
+    Value at Risk / CVaR (95%, 99%) of the current holdings over `horizon_days`:
+    historical simulation over the last `lookback` days of the local price store, and
+    a correlated Monte Carlo over `paths` scenarios, options fully revalued per path.
+    """
+    if not 1 <= horizon_days <= 250:
+        raise HTTPException(status_code=400, detail="horizon_days must be between 1 and 250")
+    if not 1000 <= paths <= 1_000_000:
+        raise HTTPException(status_code=400, detail="paths must be between 1000 and 1000000")
+    if not 2 <= lookback <= 5000:
+        raise HTTPException(status_code=400, detail="lookback must be between 2 and 5000")
+    async with _risk_lock:
+        key = (data_manager.holdings_version, date.today(), horizon_days, paths, lookback)
+        if _risk["key"] != key:
+            holdings = data_manager.get_holdings()
+            with span("quote_fetch"):
+                quotes = await QuoteContext(market_data).plan(holdings).afetch()
+            with span("risk"):
+                _risk["result"] = await run_in_threadpool(
+                    risk.risk_report, holdings, quotes, market_data, price_history,
+                    horizon_days=horizon_days, paths=paths, lookback=lookback)
+            _risk["key"] = key
+        return _risk["result"]
+
+@app.post("/scenarios")
+def evaluate_scenarios(request: Request, scenarios: List[Scenario], holdings: bool = False):
+    """
+    What-if evaluation of the current holdings under each scenario's market / sector /
+    ticker / FX shocks and option exercises, all in one batched pass over the cached
+    quotes (no network, nothing stored). Returns the unshocked "base" summary and one
+    summary-shaped result per scenario; ?holdings=true includes per-holding rows.
+    """
+    current = data_manager.get_holdings()
+    quotes = QuoteContext(market_data).plan(current).from_cache()
+    try:
+        with span("scenarios"):
+            book = ScenarioBook(current, quotes, market_data)
+            results = book.evaluate(scenarios, include_holdings=holdings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(request, {"base": book.base.dict(), "scenarios": results})
+
+@app.post("/history/backfill")
+async def backfill_history(start: date, end: Optional[date] = None):
+    """
+    Fill weekdays in [start, end] that have no snapshot by replaying holdings against
+    the local price store (no network). Created snapshots are marked source="backfill".
+    """
+    end = end or date.today() - timedelta(days=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    await run_in_threadpool(price_history.flush)
+    created = await run_in_threadpool(backfill_snapshots, price_history, market_data, data_manager, start, end)
+    return {"status": "success", "created": created}
+
+@app.get("/prices/{symbol}")
+def get_price_history(symbol: str, start: Optional[date] = None, end: Optional[date] = None):
+    """Stored daily closes for a Tencent symbol (e.g. usAAPL, hk00700, fx_susdhkd)."""
+    if not valid_symbol(symbol):
+        raise HTTPException(status_code=400, detail=f"Invalid symbol: {symbol}")
+    series = price_history.series(symbol)
+    days = [from_day(d) for d in series["day"]]
+    return [{"date": d, "close": float(c)} for d, c in zip(days, series["close"])
+            if (start is None or d >= start) and (end is None or d <= end)]
+
+@app.post("/prices/{symbol}/import")
+async def import_price_history(symbol: str, request: Request):
+    """Import daily closes from a CSV body with `date` and `close` columns."""
+    if not valid_symbol(symbol):
+        raise HTTPException(status_code=400, detail=f"Invalid symbol: {symbol}")
+    text = (await request.body()).decode("utf-8-sig")
+    try:
+        count = await run_in_threadpool(price_history.import_csv, symbol, text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "imported": count}
+
+@app.get("/history/{snapshot_id}")
+def get_history_snapshot(snapshot_id: str):
+    snapshot = data_manager.get_snapshot(snapshot_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return snapshot
 
 @app.delete("/history/{snapshot_id}")
 def delete_history_snapshot(snapshot_id: str):
@@ -247,22 +455,25 @@ def restore_snapshot(snapshot_id: str):
     Does NOT create a new snapshot - user must manually click 'Add Snapshot' after.
     """
     # Find the snapshot
-    history = data_manager.get_history()
-    snapshot = next((s for s in history if s.get('id') == snapshot_id), None)
+    snapshot = data_manager.get_snapshot(snapshot_id)
     
     if not snapshot:
         raise HTTPException(status_code=404, detail="Snapshot not found")
     
     # Replace current holdings with snapshot's holdings
-    data_manager.data["holdings"] = snapshot["holdings_snapshot"]
-    data_manager._save_data()
+    data_manager.replace_holdings(snapshot["holdings_snapshot"])
     
     return {"status": "success", "message": "Holdings restored from snapshot"}
 
 @app.get("/export")
-def export_data():
-    """Export all portfolio data as JSON"""
-    return data_manager.data
+def export_data(request: Request):
+    """Export all portfolio data as JSON (conditional: 304 while nothing changed)"""
+    parts, last_modified = data_manager.validators("holdings", "snapshots")
+    etag = version_etag(request, "export", *parts)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    return json_response(request, data_manager.export(), etag=etag, last_modified=last_modified)
 
 @app.post("/import")
 def import_data(data: dict, strategy: str = "current"):
@@ -275,8 +486,7 @@ def import_data(data: dict, strategy: str = "current"):
     try:
         if strategy == "full":
             # Full Overwrite: Replace everything
-            data_manager.data = data
-            data_manager._save_data()
+            data_manager.replace_all(data)
             return {"status": "success", "message": "Full import completed. All data replaced."}
         
         else: # strategy == 'current' (Default)
@@ -288,17 +498,62 @@ def import_data(data: dict, strategy: str = "current"):
                         new_holdings.append(Holding(**h))
                     except Exception as e:
                         print(f"Skipping invalid holding: {e}")
-                data_manager.data["holdings"] = [h.dict() for h in new_holdings]
+                # Do NOT create backup snapshot, do NOT modify existing snapshots
+                data_manager.replace_holdings([h.dict() for h in new_holdings])
                 print(f"Imported {len(new_holdings)} holdings as current")
             
-            # Do NOT create backup snapshot, do NOT modify existing snapshots
-            data_manager._save_data()
             return {"status": "success", "message": "Current holdings updated. Use 'Update Snapshot' button to save to history."}
     except Exception as e:
         print(f"CRITICAL IMPORT ERROR: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# Request bodies above this size are spooled to a temp file while streaming in
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+@app.get("/export/stream")
+def export_stream(format: str = "ndjson"):
+    """
+    Chunked export. ndjson: holdings then snapshots, one {"type": ...} record per line.
+    csv: current holdings only.
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    data = data_manager.export()
+    if format == "csv":
+        return StreamingResponse(export_csv(data), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=holdings.csv"})
+    return StreamingResponse(export_ndjson(data), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": "attachment; filename=portfolio.ndjson"})
+
+@app.post("/import/stream")
+async def import_stream(request: Request, format: str = "ndjson", strategy: str = "current"):
+    """
+    Streaming import of an NDJSON or CSV body (see /export/stream for the layout).
+    Rows are validated in batches; invalid rows are skipped and reported with their
+    line number and per-field reasons. Strategies match /import:
+    - 'current': replace current holdings only
+    - 'full': replace holdings and snapshot history
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    report = ImportReport()
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        text = io.TextIOWrapper(body, encoding="utf-8-sig", newline="")
+        # Validated batches go straight into storage; nothing is replaced unless a row was staged
+        staged = await run_in_threadpool(data_manager.import_batches, parse_import(text, format, report),
+                                         strategy == "full")
+
+    if not any(staged.values()):
+        # Nothing valid (or only snapshots with strategy=current): existing data was kept
+        raise HTTPException(status_code=400, detail={"message": "No valid rows to import", **report.as_dict()})
+    print(f"Streamed import: {staged['holdings']} holdings, {staged['snapshots']} snapshots stored, "
+          f"{report.error_count} errors")
+    return {"status": "success", **report.as_dict()}
+
 # Serve React App (for standalone/production)
 # Determine path to frontend/dist
 if getattr(sys, 'frozen', False):
@@ -319,6 +574,8 @@ if os.path.exists(frontend_dist):
         # For now, we just serve index.html for everything else to support React Routing
         return FileResponse(os.path.join(frontend_dist, "index.html"))
 
+startup.mark("routes")
+
 if __name__ == "__main__":
     # Open browser
     webbrowser.open("http://127.0.0.1:8000")
@@ -1,12 +1,155 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from .quote_cache import QuoteCache, STALE
+from .metrics import QUOTE_FALLBACKS, QUOTE_REQUESTS, QUOTE_SYMBOLS, span
+from .quote_sources import CircuitBreaker, FileQuoteProvider
+from .options import VOLATILITY_LOOKBACK, price_options, realized_volatility
+
+# Cache to avoid hitting API too frequently (quotes, FX and company names, see quote_cache.DEFAULT_TTLS)
+_QUOTE_CACHE = QuoteCache()
+
+# Overridable so benchmarks / offline runs can point at a local stand-in (see bench/mock_quote_server.py)
+TENCENT_QUOTE_URL = os.environ.get("PORTFOLIO_QUOTE_URL", "http://qt.gtimg.cn/q=")
+# Tencent accepts comma-separated symbols in one q= request; cap the batch so the URL stays short
+QUOTE_BATCH_SIZE = 60
+# Max upstream requests in flight at once (also the keep-alive pool size)
+QUOTE_MAX_CONCURRENCY = 8
+# (connect, read) timeout per upstream request, in seconds
+QUOTE_TIMEOUT = (3, 5)
+
+# Providers tried in order for symbols the previous ones could not price:
+# "tencent" and/or "file:/path/quotes.json" (see quote_sources.FileQuoteProvider)
+QUOTE_PROVIDERS = os.environ.get("PORTFOLIO_QUOTE_PROVIDERS", "tencent")
+
+# Shared keep-alive connection pool for every Tencent call
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=QUOTE_MAX_CONCURRENCY))
+# Blocking fetches (async callers, background refreshes) run here; bounded by QUOTE_MAX_CONCURRENCY
+_EXECUTOR = ThreadPoolExecutor(max_workers=QUOTE_MAX_CONCURRENCY, thread_name_prefix="quote")
+
+# Fallback to hardcoded approximate rates
+FALLBACK_FX_RATES = {
+    "USDHKD": 7.8,
+    "USDCNY": 7.2,
+    "CNYHKD": 1.08,
+    "HKDUSD": 0.128,
+    "HKDCNY": 0.92,
+    "CNYUSD": 0.139
+}
+
+
+def use_shared_cache(shared):
+    """Put a quote_cache.SharedQuoteCache behind the process-local cache (multi-worker mode)."""
+    _QUOTE_CACHE.shared = shared
+
+
+def parse_quotes(content):
+    """
+    Parse a (possibly multi-symbol) Tencent response in one pass.
+    Each line looks like: v_sh600519="1~name~code~price~...";
+    Unknown symbols come back as v_xxx=""; or, for a whole unmatched request, as
+    v_pv_none_match="1"; (a marker, not a symbol). Both are skipped.
+    Returns {symbol: [fields...]}
+    """
+    quotes = {}
+    for line in content.splitlines():
+        line = line.strip()
+        if not line.startswith("v_") or '="' not in line:
+            continue
+        key, data_str = line.split('="', 1)
+        data_str = data_str.rstrip('";')
+        if not data_str or key == "v_pv_none_match":
+            continue
+        quotes[key[2:]] = data_str.split('~')
+    return quotes
+
+
+def _positive_float(value):
+    try:
+        number = float(value.strip())
+    except (ValueError, AttributeError):
+        return 0.0
+    return number if number > 0 else 0.0
+
+
+def _batches(symbols):
+    return [symbols[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(symbols), QUOTE_BATCH_SIZE)]
+
+
+def _cache_kind(symbol):
+    return "fx" if symbol.startswith("fx_") else "quote"
+
+
+def _is_priced(quote):
+    """A price (or FX rate) above 0. Tencent answers unknown or suspended symbols with 0."""
+    try:
+        return float(quote.get("price") or quote.get("rate") or 0) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _quote_from_parts(symbol, parts):
+    """
+    Pick the fields we use out of a raw Tencent record.
+    - Stocks: parts[1] name (CN for CN/HK), parts[3] price, parts[46] English name (US)
+    - FX (fx_s...): parts[1] rate
+    """
+    if symbol.startswith("fx_"):
+        return {"rate": _positive_float(parts[1]) if len(parts) > 1 else 0.0}
+    return {
+        "name": parts[1] if len(parts) > 1 else None,
+        "price": _positive_float(parts[3]) if len(parts) > 3 else 0.0,
+        "english_name": parts[46].strip() if len(parts) > 46 else None,
+    }
+
+
+class TencentProvider:
+    """qt.gtimg.cn batch quotes; HTTP errors and timeouts raise so the circuit breaker sees them."""
+
+    name = "tencent"
+
+    def __init__(self, url=None):
+        self.url = url or TENCENT_QUOTE_URL
+        self.breaker = CircuitBreaker()
+
+    def fetch(self, symbols):
+        with span("quote_request"):
+            resp = _SESSION.get(self.url + ",".join(symbols), timeout=QUOTE_TIMEOUT)
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+        with span("quote_parse"):
+            parsed = parse_quotes(resp.text)
+            return {symbol: _quote_from_parts(symbol, parsed[symbol]) for symbol in symbols if symbol in parsed}
+
+
+def build_providers(spec):
+    providers = []
+    for item in (s.strip() for s in spec.split(",")):
+        if item == "tencent":
+            providers.append(TencentProvider())
+        elif item.startswith("file:"):
+            providers.append(FileQuoteProvider(item[len("file:"):]))
+        elif item:
+            raise ValueError(f"Unknown quote provider: {item}")
+    return providers
 
-# Cache to avoid hitting API too frequently
-_PRICE_CACHE = {}
-_FX_CACHE = {}
 
 class MarketData:
-    def __init__(self):
-        pass
+    def __init__(self, providers=None):
+        # Optional local price store (price_history.PriceHistoryStore): live quotes are
+        # recorded into it and option pricing reads realized volatility from it
+        self.price_history = None
+        # Optional quote_sources.LastKnownGoodStore: answers (marked stale) when every provider fails
+        self.last_known_good = None
+        # Optional symbol_metadata.SymbolMetadataStore: names / sectors without network calls
+        self.symbol_metadata = None
+        # Stale-while-revalidate refreshes; off in non-leader workers, where the
+        # elected refresher keeps the shared cache current (see backend/workers.py)
+        self.refresh_stale = True
+        self.providers = providers if providers is not None else build_providers(QUOTE_PROVIDERS)
 
     def get_ticker_symbol_tencent(self, ticker, market):
         """
@@ -28,128 +171,355 @@ class MarketData:
                 return f"sh{ticker}"  # 默认上海
         return ticker
 
-    def get_current_price(self, ticker, market):
+    def get_currency(self, market):
+        if market == "US":
+            return "USD"
+        elif market == "CN":
+            return "CNY"
+        return "HKD"
+
+    def get_fx_symbol(self, from_curr, to_curr="HKD"):
+        """Tencent FX format: fx_susdcny"""
+        return f"fx_s{from_curr.lower()}{to_curr.lower()}"
+
+    def get_quotes(self, symbols, refresh=False):
+        """
+        Batch quote fetch: packs many Tencent symbols into one q= request
+        (sh600519,hk00700,usAAPL,fx_susdhkd...) and parses every line in one pass.
+        Returns {symbol: {"price", "name", "english_name"}} for stocks and
+        {symbol: {"rate"}} for FX. Symbols that failed are simply missing.
+
+        Served from _QUOTE_CACHE when possible: stale entries are returned
+        immediately and refreshed in the background. refresh=True skips the
+        cache lookup and always fetches (the result still updates the cache).
+        """
+        quotes, missing = self._get_cached_quotes(symbols, refresh)
+        if missing:
+            batches = _batches(missing)
+            if len(batches) == 1:
+                quotes.update(self._fetch_batch(batches[0]))
+            else:
+                for batch_quotes in _EXECUTOR.map(self._fetch_batch, batches):
+                    quotes.update(batch_quotes)
+        if refresh:
+            self._fill_from_cache(quotes, missing)
+        self._fill_last_known_good(quotes, missing)
+        return quotes
+
+    async def aget_quotes(self, symbols, refresh=False):
+        """
+        Async get_quotes: every missing batch is fetched concurrently on the
+        shared pool (bounded by QUOTE_MAX_CONCURRENCY), so the wait is one
+        round trip regardless of how many batches are needed.
+        """
+        quotes, missing = self._get_cached_quotes(symbols, refresh)
+        if missing:
+            loop = asyncio.get_running_loop()
+            timeout = sum(QUOTE_TIMEOUT) + 1
+
+            async def fetch(batch):
+                try:
+                    return await asyncio.wait_for(loop.run_in_executor(_EXECUTOR, self._fetch_batch, batch), timeout)
+                except asyncio.TimeoutError:
+                    print(f"Tencent API timeout for {','.join(batch)}")
+                    return {}
+
+            for batch_quotes in await asyncio.gather(*(fetch(b) for b in _batches(missing))):
+                quotes.update(batch_quotes)
+        if refresh:
+            self._fill_from_cache(quotes, missing)
+        self._fill_last_known_good(quotes, missing)
+        return quotes
+
+    def _get_cached_quotes(self, symbols, refresh=False):
+        """Returns (cached quotes, missing symbols); schedules refresh for stale ones."""
+        quotes = {}
+        missing = []
+        stale = []
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        if refresh:
+            return quotes, symbols
+        for symbol in symbols:
+            quote, state = _QUOTE_CACHE.get(_cache_kind(symbol), symbol)
+            if quote is None:
+                missing.append(symbol)
+                continue
+            quotes[symbol] = quote
+            if state == STALE:
+                stale.append(symbol)
+        if stale and self.refresh_stale:
+            self._refresh_in_background(stale)
+        return quotes, missing
+
+    def get_cached_quotes(self, symbols):
+        """
+        get_quotes without the network: cached quotes (stale ones included, no
+        background refresh), then last-known-good. Symbols never seen are missing.
+        """
+        quotes = {}
+        for symbol in dict.fromkeys(s for s in symbols if s):
+            quote, _ = _QUOTE_CACHE.get(_cache_kind(symbol), symbol)
+            if quote is not None:
+                quotes[symbol] = quote
+        self._fill_last_known_good(quotes, symbols)
+        return quotes
+
+    def _fill_from_cache(self, quotes, symbols):
+        """After a forced refresh, keep the last cached value for anything the fetch missed."""
+        for symbol in symbols:
+            if symbol not in quotes:
+                quote, _ = _QUOTE_CACHE.get(_cache_kind(symbol), symbol)
+                if quote is not None:
+                    quotes[symbol] = quote
+
+    def _fill_last_known_good(self, quotes, symbols):
+        """Anything still unpriced gets its last good quote, marked {"stale": True, "as_of": ...}."""
+        if self.last_known_good is None:
+            return
+        for symbol in symbols:
+            if symbol not in quotes:
+                quote = self.last_known_good.get(symbol)
+                if quote is not None:
+                    quotes[symbol] = quote
+                    QUOTE_FALLBACKS.inc()
+
+    def _fetch_batch(self, symbols):
+        """
+        One request per provider, in order, for the symbols earlier providers missed
+        (no cache lookup). A provider whose circuit is open is skipped without waiting.
+        A record without a positive price counts as missed, so the next provider and then
+        last-known-good get their turn; only its name / metadata are kept.
+        Results are stored in _QUOTE_CACHE and the last-known-good store.
+        """
+        quotes = {}
+        unpriced = {}
+        remaining = list(symbols)
+        QUOTE_SYMBOLS.inc(len(symbols))
+        for provider in self.providers:
+            if not remaining:
+                break
+            if not provider.breaker.allow():
+                QUOTE_REQUESTS.inc(provider=provider.name, outcome="circuit_open")
+                continue
+            try:
+                fetched = provider.fetch(remaining)
+            except Exception as e:
+                provider.breaker.record_failure()
+                QUOTE_REQUESTS.inc(provider=provider.name, outcome="error")
+                print(f"Quote provider {provider.name} error for {','.join(remaining)}: {e}")
+                continue
+            provider.breaker.record_success()
+            QUOTE_REQUESTS.inc(provider=provider.name, outcome="ok")
+            for symbol, quote in fetched.items():
+                if _is_priced(quote):
+                    quotes[symbol] = quote
+                    unpriced.pop(symbol, None)
+                else:
+                    unpriced.setdefault(symbol, quote)
+            remaining = [s for s in remaining if s not in quotes]
+
+        if unpriced:
+            print(f"No price for {','.join(unpriced)} from any provider")
+        if self.last_known_good is not None:
+            self.last_known_good.record(quotes)
+        if self.symbol_metadata is not None:
+            self.symbol_metadata.record_quotes({**unpriced, **quotes})
+        if self.price_history is not None:
+            self.price_history.record_quotes(quotes)
+        entries = []
+        for symbol, quote in {**unpriced, **quotes}.items():
+            if symbol in quotes:
+                entries.append((_cache_kind(symbol), symbol, quote))
+            if quote.get("name"):
+                entries.append(("name", symbol, {"name": quote["name"], "english_name": quote.get("english_name")}))
+        if entries:
+            _QUOTE_CACHE.put_many(entries)
+        return quotes
+
+    def _refresh_in_background(self, symbols):
+        symbols = _QUOTE_CACHE.claim_refresh(symbols)
+        if not symbols:
+            return
+
+        def refresh(batch):
+            try:
+                self._fetch_batch(batch)
+            finally:
+                _QUOTE_CACHE.release_refresh(batch)
+
+        for batch in _batches(symbols):
+            _EXECUTOR.submit(refresh, batch)
+
+    def get_current_price(self, ticker, market, quotes=None):
         """
         Fetch current price from Tencent Finance API
         Returns CSV format: v_sh600519="1~name~code~price~..."
+        Pass `quotes` (from get_quotes) to read from an already fetched batch.
         """
         symbol = self.get_ticker_symbol_tencent(ticker, market)
-        
-        try:
-            url = f"http://qt.gtimg.cn/q={symbol}"
-            resp = requests.get(url, timeout=5)
-            if resp.status_code == 200:
-                content = resp.text.strip()
-                if '="' in content:
-                    data_str = content.split('="')[1].rstrip('";')
-                    parts = data_str.split('~')
-                    
-                    if len(parts) > 3:
-                        price_str = parts[3].strip()
-                        if price_str and price_str != "" and price_str != "0":
-                            try:
-                                price = float(price_str)
-                                if price > 0:
-                                    return price
-                            except ValueError:
-                                pass
-        except Exception as e:
-            print(f"Tencent API error for {symbol}: {e}")
-        
-        return 0.0
+        if quotes is None:
+            quotes = self.get_quotes([symbol])
+        return quotes.get(symbol, {}).get("price", 0.0)
 
     def get_sector(self, ticker, market):
         """
-        Sector classification - returns "Unknown" by default
-        User should select from dropdown in UI
+        Sector from the symbol metadata store (reference file / PUT /symbols/{symbol}),
+        "Unknown" otherwise. Users can still override per holding (custom_sector).
         """
+        if self.symbol_metadata is not None:
+            entry = self.symbol_metadata.get(self.get_ticker_symbol_tencent(ticker, market))
+            if entry and entry.get("sector"):
+                return entry["sector"]
         return "Unknown"
 
-    def get_company_name(self, ticker, market):
+    def get_company_name(self, ticker, market, quotes=None):
         """
         Get company name from Tencent API
         - US stocks: parts[46] contains English name (e.g., "Apple Inc.")
         - CN/HK stocks: parts[1] contains Chinese name
         """
         symbol = self.get_ticker_symbol_tencent(ticker, market)
-        
-        try:
-            url = f"http://qt.gtimg.cn/q={symbol}"
-            resp = requests.get(url, timeout=5)
-            if resp.status_code == 200:
-                content = resp.text.strip()
-                if '="' in content:
-                    data_str = content.split('="')[1].rstrip('";')
-                    parts = data_str.split('~')
-                    
-                    if market == "US" and len(parts) > 46:
-                        # parts[46] is English company name for US stocks
-                        english_name = parts[46].strip()
-                        if english_name and english_name != "":
-                            return english_name
-                    
-                    if len(parts) > 1:
-                        # parts[1] is company name (CN for CN/HK)
-                        return parts[1]
-        except Exception as e:
-            print(f"Error fetching company name for {symbol}: {e}")
-        
+        # Symbol metadata (persistent, seen once) first, then the fetched batch, then the name cache
+        quote = self.symbol_metadata.get(symbol) if self.symbol_metadata is not None else None
+        if not quote or not quote.get("name"):
+            quote = quotes.get(symbol) if quotes is not None else None
+        if not quote:
+            # Names rarely change: the name cache outlives the quote cache
+            quote, state = _QUOTE_CACHE.get("name", symbol)
+            if state == STALE and self.refresh_stale:
+                self._refresh_in_background([symbol])
+        if not quote and quotes is None:
+            quote = self.get_quotes([symbol]).get(symbol)
+        if quote:
+            if market == "US" and quote.get("english_name"):
+                return quote["english_name"]
+            if quote.get("name") is not None:
+                return quote["name"]
         return ticker
 
-    def get_fx_rate(self, from_curr, to_curr="HKD"):
+    def get_fx_rate(self, from_curr, to_curr="HKD", quotes=None):
         """
         Get forex rate from Tencent API or fallback to hardcoded rates
         """
         if from_curr == to_curr:
             return 1.0
-        
+
         pair_key = f"{from_curr}{to_curr}"
-        
-        if pair_key in _FX_CACHE:
-            return _FX_CACHE[pair_key]
-        
-        try:
-            # Tencent FX format: fx_susdcny
-            symbol = f"fx_s{from_curr.lower()}{to_curr.lower()}"
-            url = f"http://qt.gtimg.cn/q={symbol}"
-            resp = requests.get(url, timeout=5)
-            
-            if resp.status_code == 200:
-                content = resp.text.strip()
-                if '="' in content:
-                    data_str = content.split('="')[1].rstrip('";')
-                    parts = data_str.split('~')
-                    
-                    if len(parts) > 1:
-                        rate = float(parts[1])
-                        if rate > 0:
-                            _FX_CACHE[pair_key] = rate
-                            return rate
-        except Exception as e:
-            print(f"Error fetching FX rate {from_curr} to {to_curr}: {e}")
-        
-        # Fallback to hardcoded approximate rates
-        fallback_rates = {
-            "USDHKD": 7.8,
-            "USDCNY": 7.2,
-            "CNYHKD": 1.08,
-            "HKDUSD": 0.128,
-            "HKDCNY": 0.92,
-            "CNYUSD": 0.139
-        }
-        
-        return fallback_rates.get(pair_key, 1.0)
-
-    def get_option_price(self, ticker, strike, expiry, option_type, market):
-        """
-        Option pricing - not supported by free APIs
-        Return intrinsic value as estimation
-        """
-        underlying_price = self.get_current_price(ticker, market)
+        symbol = self.get_fx_symbol(from_curr, to_curr)
+        if quotes is None:
+            quotes = self.get_quotes([symbol])
+        rate = quotes.get(symbol, {}).get("rate", 0.0)
+        if rate > 0:
+            return rate
+
+        return FALLBACK_FX_RATES.get(pair_key, 1.0)
+
+    def get_realized_volatility(self, ticker, market):
+        """Annualized realized vol from the local price history, or None if unavailable."""
+        if self.price_history is None:
+            return None
+        symbol = self.get_ticker_symbol_tencent(ticker, market)
+        return realized_volatility(self.price_history.closes(symbol, limit=VOLATILITY_LOOKBACK))
+
+    def get_option_price(self, ticker, strike, expiry, option_type, market, quotes=None, implied_vol=None):
+        """
+        Option premium from the pricing engine (backend/options.py):
+        Black-Scholes for European, binomial tree for American contracts.
+        """
+        underlying_price = self.get_current_price(ticker, market, quotes=quotes)
         if not underlying_price:
             return 0.0
-        
-        if option_type == "Call":
-            return max(0, underlying_price - strike)
-        else:
-            return max(0, strike - underlying_price)
+        priced = price_options([underlying_price], [strike], [expiry], [option_type], [market],
+                               [self.get_currency(market)], [implied_vol],
+                               [self.get_realized_volatility(ticker, market)])
+        return float(priced["price"][0])
+
+    async def aget_current_price(self, ticker, market):
+        symbol = self.get_ticker_symbol_tencent(ticker, market)
+        return self.get_current_price(ticker, market, quotes=await self.aget_quotes([symbol]))
+
+    async def aget_company_name(self, ticker, market):
+        symbol = self.get_ticker_symbol_tencent(ticker, market)
+        return self.get_company_name(ticker, market, quotes=await self.aget_quotes([symbol]))
+
+    async def aget_fx_rate(self, from_curr, to_curr="HKD"):
+        if from_curr == to_curr:
+            return 1.0
+        symbol = self.get_fx_symbol(from_curr, to_curr)
+        return self.get_fx_rate(from_curr, to_curr, quotes=await self.aget_quotes([symbol]))
+
+    async def aget_option_price(self, ticker, strike, expiry, option_type, market, implied_vol=None):
+        symbol = self.get_ticker_symbol_tencent(ticker, market)
+        quotes = await self.aget_quotes([symbol])
+        return self.get_option_price(ticker, strike, expiry, option_type, market, quotes=quotes, implied_vol=implied_vol)
+
+
+class QuoteContext:
+    """
+    Request-scoped quote lookups for one summary computation.
+    plan() collects every symbol and FX pair the holdings need, fetch()/afetch()
+    gets them with a single batched call, then price / name / FX / option
+    lookups are served from memory (each distinct lookup is computed once).
+    """
+
+    def __init__(self, market_data, to_curr="HKD"):
+        self.market_data = market_data
+        self.to_curr = to_curr
+        self.symbols = {}  # ordered set of Tencent symbols
+        self.quotes = {}
+        self._memo = {}
+
+    def plan(self, holdings):
+        for h in holdings:
+            if h.asset_type in ("Stock", "Option"):
+                self.symbols[self.market_data.get_ticker_symbol_tencent(h.ticker, h.market)] = None
+            currency = self.market_data.get_currency(h.market)
+            if currency != self.to_curr:
+                self.symbols[self.market_data.get_fx_symbol(currency, self.to_curr)] = None
+        return self
+
+    def fetch(self, refresh=False):
+        self.quotes = self.market_data.get_quotes(list(self.symbols), refresh=refresh)
+        return self
+
+    async def afetch(self, refresh=False):
+        self.quotes = await self.market_data.aget_quotes(list(self.symbols), refresh=refresh)
+        return self
+
+    def from_cache(self):
+        """Offline fetch(): only what the quote cache / last-known-good store already hold."""
+        self.quotes = self.market_data.get_cached_quotes(list(self.symbols))
+        return self
+
+    def _lookup(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def price(self, ticker, market):
+        return self._lookup(("price", ticker, market),
+                            lambda: self.market_data.get_current_price(ticker, market, quotes=self.quotes))
+
+    def company_name(self, ticker, market):
+        return self._lookup(("name", ticker, market),
+                            lambda: self.market_data.get_company_name(ticker, market, quotes=self.quotes))
+
+    def fx_rate(self, from_curr):
+        return self._lookup(("fx", from_curr),
+                            lambda: self.market_data.get_fx_rate(from_curr, self.to_curr, quotes=self.quotes))
+
+    def option_price(self, ticker, strike, expiry, option_type, market, implied_vol=None):
+        return self._lookup(("option", ticker, strike, expiry, option_type, market, implied_vol),
+                            lambda: self.market_data.get_option_price(ticker, strike, expiry, option_type, market,
+                                                                      quotes=self.quotes, implied_vol=implied_vol))
+
+    def realized_volatility(self, ticker, market):
+        return self._lookup(("vol", ticker, market),
+                            lambda: self.market_data.get_realized_volatility(ticker, market))
+
+    def price_as_of(self, ticker, market):
+        """None for a live price; else when the last-known-good price was seen ("unavailable" if never)."""
+        quote = self.quotes.get(self.market_data.get_ticker_symbol_tencent(ticker, market))
+        if quote and quote.get("price") and not quote.get("stale"):
+            return None
+        return quote.get("as_of") if quote and quote.get("price") else "unavailable"
@@ -0,0 +1,129 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets (seconds) shared by every histogram
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    """Monotonic counter with optional labels, e.g. Counter("x_total", "...", ("kind",)).inc(kind="fx")."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _label_str(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with optional labels."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels.get(n, "") for n in self.labels))
+        return series[-1] if series else 0
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                out.append((f"{self.name}_bucket", _label_str(self.labels, key, (f'le="{_number(bound)}"',)), cumulative))
+            out.append((f"{self.name}_bucket", _label_str(self.labels, key, ('le="+Inf"',)), series[-1]))
+            out.append((f"{self.name}_sum", _label_str(self.labels, key), series[-2]))
+            out.append((f"{self.name}_count", _label_str(self.labels, key), series[-1]))
+        return out
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# Hot-path metrics (instrumented in market_data, quote_cache, storage and main)
+SPAN_SECONDS = Histogram("portfolio_span_seconds", "Duration of instrumented code spans", ("span",))
+QUOTE_REQUESTS = Counter("portfolio_quote_requests_total", "Quote provider requests by outcome (ok/error/circuit_open)",
+                         ("provider", "outcome"))
+QUOTE_FALLBACKS = Counter("portfolio_quote_fallbacks_total", "Symbols served from the last-known-good store")
+QUOTE_SYMBOLS = Counter("portfolio_quote_symbols_total", "Symbols requested from the upstream quote API")
+CACHE_LOOKUPS = Counter("portfolio_quote_cache_lookups_total", "Quote cache lookups by kind and result (fresh/stale/miss)",
+                        ("kind", "result"))
+STORAGE_WRITE_SECONDS = Histogram("portfolio_storage_write_seconds", "Storage write duration by backend and operation",
+                                  ("backend", "operation"))
+STORAGE_WRITE_BYTES = Counter("portfolio_storage_write_bytes_total", "Bytes serialized by storage writes", ("backend",))
+HTTP_REQUEST_SECONDS = Histogram("portfolio_http_request_seconds", "HTTP request latency by route",
+                                 ("method", "route", "status"))
+
+
+def span(name):
+    """with span("valuation"): ... -> observed in portfolio_span_seconds{span="valuation"}."""
+    return SPAN_SECONDS.time(span=name)
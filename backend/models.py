@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import date
 
 class Holding(BaseModel):
@@ -16,12 +16,14 @@ class Holding(BaseModel):
     strike_price: Optional[float] = None
     expiry_date: Optional[date] = None
     side: Optional[str] = None # "Long", "Short" (User said Sell Put/Call, so mostly Short)
+    implied_vol: Optional[float] = None  # User-set annualized vol (0.35 = 35%); otherwise estimated
 
 class PortfolioSnapshot(BaseModel):
     id: Optional[str] = None
     date: date
     total_net_worth_hkd: float
     holdings_snapshot: List[dict]
+    source: Optional[str] = None  # "backfill" for snapshots replayed from the price store
 
 class PortfolioSummary(BaseModel):
     total_net_worth_hkd: float
@@ -29,3 +31,13 @@ class PortfolioSummary(BaseModel):
     market_distribution: dict
     sector_distribution: dict
     ticker_distribution: dict
+    stale_tickers: List[str] = []  # tickers valued at a last-known-good (or no) price
+
+class Scenario(BaseModel):
+    """What-if shocks, as fractional moves (-0.10 = down 10%); prices compound market x sector x ticker."""
+    name: Optional[str] = None
+    market: Dict[str, float] = {}  # "HK": -0.10, applies to stocks and option underlyings
+    sector: Dict[str, float] = {}  # "Technology": -0.05 (the sector used in sector_distribution)
+    ticker: Dict[str, float] = {}  # "0700": 0.03 (the stored ticker), the stock and options on it
+    fx: Dict[str, float] = {}  # "USD": 0.01 = USDHKD up 1%
+    exercise: List[str] = []  # option holding ids settled into stock + cash at the strike
@@ -0,0 +1,278 @@
+import math
+import os
+from datetime import date, datetime
+import numpy as np
+
+OPTION_MULTIPLIER = 100
+# Annualized risk-free rates (continuous) per currency; approximate, adjust as needed
+RISK_FREE_RATES = {"USD": 0.045, "HKD": 0.04, "CNY": 0.018}
+# Used when neither a user-set implied vol nor enough price history is available
+DEFAULT_VOLATILITY = 0.30
+# US / HK single-stock options are American; CN exchange (ETF) options are European
+EXERCISE_STYLE = {"US": "American", "HK": "American", "CN": "European"}
+BINOMIAL_STEPS = 200
+# Minimum daily closes needed for a realized-vol estimate, and how many recent closes to use
+MIN_HISTORY = 20
+VOLATILITY_LOOKBACK = 63
+# Sell-put exposure in ticker/sector distributions:
+# "strike" = |qty| * strike * 100 (cash needed if assigned), "delta" = |qty| * |delta| * spot * 100
+EXPOSURE_MODE = os.environ.get("PORTFOLIO_OPTION_EXPOSURE", "strike")
+
+
+# W. J. Cody's rational approximations (Math. Comp. 1969, as in his CALERF routine):
+# erf on |x| <= 0.5, erfc on 0.5 < |x| <= 4 and |x| > 4; within ~2e-15 of math.erfc (relative)
+_ERF_A = (3.16112374387056560e00, 1.13864154151050156e02, 3.77485237685302021e02,
+          3.20937758913846947e03, 1.85777706184603153e-1)
+_ERF_B = (2.36012909523441209e01, 2.44024637934444173e02, 1.28261652607737228e03,
+          2.84423683343917062e03)
+_ERFC_C = (5.64188496988670089e-1, 8.88314979438837594e00, 6.61191906371416295e01,
+           2.98635138197400131e02, 8.81952221241769090e02, 1.71204761263407058e03,
+           2.05107837782607147e03, 1.23033935479799725e03, 2.15311535474403846e-8)
+_ERFC_D = (1.57449261107098347e01, 1.17693950891312499e02, 5.37181101862009858e02,
+           1.62138957456669019e03, 3.29079923573345963e03, 4.36261909014324716e03,
+           3.43936767414372164e03, 1.23033935480374942e03)
+_ERFC_P = (3.05326634961232344e-1, 3.60344899949804439e-1, 1.25781726111229246e-1,
+           1.60837851487422766e-2, 6.58749161529837803e-4, 1.63153871373020978e-2)
+_ERFC_Q = (2.56852019228982242e00, 1.87295284992346725e00, 5.27905102951428412e-1,
+           6.05183413124413191e-2, 2.33520497626869185e-3)
+_ERFC_MAX = 28.0
+# Elements per erfc block (32k doubles = 256 KB per temporary)
+_ERFC_BLOCK = 32768
+
+
+def _as_float(x):
+    return np.asarray(x, dtype=float)
+
+
+def _rational(y, num_coeffs, den_coeffs, lead):
+    """
+    Cody's rational form, Horner steps in place (no temporaries):
+    num = (((lead * y + n0) * y + n1) ...) * y, den = (((y + d0) * y + d1) ...) * y.
+    """
+    num = lead * y
+    den = y.copy()
+    for n, d in zip(num_coeffs, den_coeffs):
+        num += n
+        num *= y
+        den += d
+        den *= y
+    return num, den
+
+
+def _erfc_positive(y, out):
+    """
+    erfc for finite y >= 0 (one block, see erfc) into `out`. The |y| <= 4 formulas are
+    evaluated over the whole block and selected with np.where: boolean-mask gathers
+    cost more than the extra arithmetic. Only the rare |y| > 4 tail is gathered.
+    """
+    z = y * y
+    num, den = _rational(z, _ERF_A[:3], _ERF_B[:3], _ERF_A[4])
+    num += _ERF_A[3]
+    den += _ERF_B[3]
+    num *= y
+    num /= den
+    small = np.subtract(1.0, num, out=num)
+
+    num, den = _rational(y, _ERFC_C[:7], _ERFC_D[:7], _ERFC_C[8])
+    num += _ERFC_C[7]
+    den += _ERFC_D[7]
+    num /= den
+    # exp(-y^2) directly: the rounding of y^2 costs at most ~1e-15 relative for y <= 4
+    np.negative(z, out=den)
+    np.exp(den, out=den)
+    num *= den
+    np.copyto(out, np.where(y <= 0.5, small, num))
+
+    large = y > 4.0
+    if large.any():
+        yl = y[large]
+        z = 1.0 / (yl * yl)
+        num, den = _rational(z, _ERFC_P[:4], _ERFC_Q[:4], _ERFC_P[5])
+        tail = (1.0 / math.sqrt(math.pi) - z * (num + _ERFC_P[4]) / (den + _ERFC_Q[4])) / yl
+        # Split exponent (as in CALERF): y^2 rounding would cost up to ~1e-13 out here
+        head = np.trunc(yl * 16.0) / 16.0
+        out[large] = np.exp(-head * head) * np.exp(-(yl - head) * (yl + head)) * tail
+
+
+def erfc(x):
+    """
+    Complementary error function, vectorized in NumPy (no per-element Python calls).
+    Large arrays are done in cache-sized blocks: each polynomial step is a full pass
+    over its input, and passes over in-cache blocks run several times faster.
+    """
+    x = _as_float(x)
+    flat = x.ravel()
+    result = np.empty_like(flat)
+    with np.errstate(under="ignore", invalid="ignore"):
+        for start in range(0, len(flat), _ERFC_BLOCK):
+            block = flat[start:start + _ERFC_BLOCK]
+            out = result[start:start + _ERFC_BLOCK]
+            # erfc underflows to 0 before 28; clipping also keeps inf out of the arithmetic
+            _erfc_positive(np.minimum(np.abs(block), _ERFC_MAX), out)
+            # erfc(-y) = 2 - erfc(y); NaN in, NaN out
+            np.copyto(out, np.where(block < 0, 2.0 - out, out))
+            np.copyto(out, block, where=np.isnan(block))
+    return result.reshape(x.shape)
+
+
+def norm_cdf(x):
+    # Through erfc rather than 1 + erf, so deep out-of-the-money tails keep their precision
+    return 0.5 * erfc(-_as_float(x) / math.sqrt(2.0))
+
+
+def norm_pdf(x):
+    x = _as_float(x)
+    return np.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi)
+
+
+def year_fraction(expiry, today=None):
+    if expiry is None:
+        return 0.0
+    if isinstance(expiry, str):
+        expiry = date.fromisoformat(expiry[:10])
+    elif isinstance(expiry, datetime):
+        expiry = expiry.date()
+    return max((expiry - (today or date.today())).days, 0) / 365.0
+
+
+def realized_volatility(closes, periods_per_year=252):
+    """Annualized std of daily log returns; None if there is too little history."""
+    closes = _as_float(closes)
+    closes = closes[closes > 0]
+    if len(closes) < MIN_HISTORY:
+        return None
+    returns = np.diff(np.log(closes))
+    return float(np.std(returns, ddof=1) * math.sqrt(periods_per_year))
+
+
+def black_scholes(S, K, T, r, sigma, is_call):
+    """
+    Vectorized European Black-Scholes (no dividends).
+    Returns dict of arrays: price, delta, gamma, vega (per 1 vol point), theta (per calendar day).
+    Expired contracts (T <= 0) get intrinsic value and a 0/±1 delta.
+    """
+    S, K, T, r, sigma = (_as_float(x) for x in (S, K, T, r, sigma))
+    is_call = np.asarray(is_call, dtype=bool)
+    S, K, T, r, sigma, is_call = np.broadcast_arrays(S, K, T, r, sigma, is_call)
+    live = (T > 0) & (sigma > 0) & (S > 0) & (K > 0)
+
+    Tl = np.where(live, T, 1.0)
+    sl = np.where(live, sigma, 1.0)
+    Sl = np.where(live, S, 1.0)
+    Kl = np.where(live, K, 1.0)
+    sqrt_t = np.sqrt(Tl)
+    d1 = (np.log(Sl / Kl) + (r + 0.5 * sl * sl) * Tl) / (sl * sqrt_t)
+    d2 = d1 - sl * sqrt_t
+    disc = np.exp(-r * Tl)
+    nd1, nd2 = norm_cdf(d1), norm_cdf(d2)
+    pdf_d1 = norm_pdf(d1)
+
+    call = Sl * nd1 - Kl * disc * nd2
+    put = Kl * disc * (1 - nd2) - Sl * (1 - nd1)
+    price = np.where(is_call, call, put)
+    delta = np.where(is_call, nd1, nd1 - 1)
+    gamma = pdf_d1 / (Sl * sl * sqrt_t)
+    vega = Sl * pdf_d1 * sqrt_t / 100
+    theta_call = -Sl * pdf_d1 * sl / (2 * sqrt_t) - r * Kl * disc * nd2
+    theta_put = -Sl * pdf_d1 * sl / (2 * sqrt_t) + r * Kl * disc * (1 - nd2)
+    theta = np.where(is_call, theta_call, theta_put) / 365
+
+    intrinsic = np.where(is_call, np.maximum(S - K, 0), np.maximum(K - S, 0))
+    expired_delta = np.where(is_call, (S > K).astype(float), -(S < K).astype(float))
+    zero = np.zeros_like(S)
+    return {
+        "price": np.where(live, price, intrinsic),
+        "delta": np.where(live, delta, expired_delta),
+        "gamma": np.where(live, gamma, zero),
+        "vega": np.where(live, vega, zero),
+        "theta": np.where(live, theta, zero),
+    }
+
+
+def _binomial_tree(S, K, T, r, sigma, is_call, steps):
+    """CRR tree for American options, vectorized across contracts. Returns (price, delta, gamma, theta)."""
+    n = len(S)
+    dt = T / steps
+    u = np.exp(sigma * np.sqrt(dt))
+    d = 1 / u
+    disc = np.exp(-r * dt)
+    p = (np.exp(r * dt) - d) / (u - d)
+
+    j = np.arange(steps + 1)
+    # Node prices at step i: S * u^j * d^(i-j); start at maturity
+    spot = S[:, None] * np.exp(np.log(u)[:, None] * (2 * j[None, :] - steps))
+    sign = np.where(is_call, 1.0, -1.0)[:, None]
+    values = np.maximum(sign * (spot - K[:, None]), 0)
+    level = {}
+    for i in range(steps - 1, -1, -1):
+        values = disc[:, None] * (p[:, None] * values[:, 1:i + 2] + (1 - p[:, None]) * values[:, :i + 1])
+        # S u^j d^(i-j) = (S u^j d^(i+1-j)) * u, since d = 1/u
+        spot = spot[:, :i + 1] * u[:, None]
+        values = np.maximum(values, sign * (spot - K[:, None]))
+        if i <= 2:
+            level[i] = (values.copy(), spot)
+    price = level[0][0][:, 0]
+    (v1, s1), (v2, s2) = level[1], level[2]
+    delta = (v1[:, 1] - v1[:, 0]) / (s1[:, 1] - s1[:, 0])
+    delta_up = (v2[:, 2] - v2[:, 1]) / (s2[:, 2] - s2[:, 1])
+    delta_down = (v2[:, 1] - v2[:, 0]) / (s2[:, 1] - s2[:, 0])
+    gamma = (delta_up - delta_down) / (0.5 * (s2[:, 2] - s2[:, 0]))
+    theta = (v2[:, 1] - price) / (2 * dt) / 365
+    return price, delta, gamma, theta
+
+
+def binomial_american(S, K, T, r, sigma, is_call, steps=BINOMIAL_STEPS):
+    """
+    Vectorized American option prices and Greeks on a CRR binomial tree.
+    Same return shape as black_scholes; vega is a 1 vol point bump-and-reprice.
+    """
+    S, K, T, r, sigma = (_as_float(x) for x in (S, K, T, r, sigma))
+    is_call = np.asarray(is_call, dtype=bool)
+    S, K, T, r, sigma, is_call = (np.array(a) for a in np.broadcast_arrays(S, K, T, r, sigma, is_call))
+    result = black_scholes(S, K, T, r, sigma, is_call)  # also covers expired contracts
+    live = (T > 0) & (sigma > 0) & (S > 0) & (K > 0)
+    if not live.any():
+        return result
+    args = (S[live], K[live], T[live], r[live], sigma[live], is_call[live])
+    price, delta, gamma, theta = _binomial_tree(*args, steps)
+    bumped, _, _, _ = _binomial_tree(*args[:4], args[4] + 0.01, args[5], steps)
+    for key, value in (("price", price), ("delta", delta), ("gamma", gamma),
+                       ("theta", theta), ("vega", bumped - price)):
+        result[key] = result[key].copy()
+        result[key][live] = value
+    return result
+
+
+def price_options(spot, strike, expiry, option_type, market, currency, implied_vol=None,
+                  history_vol=None, today=None):
+    """
+    Price a batch of option contracts in one vectorized pass.
+    All arguments are equal-length sequences (implied_vol / history_vol entries may be None).
+    Volatility: user-set implied vol, else realized vol from local history, else DEFAULT_VOLATILITY.
+    European (Black-Scholes) and American (binomial) contracts are split by EXERCISE_STYLE.
+    `today` is the valuation date (defaults to date.today()).
+    Returns dict of arrays: price, delta, gamma, vega, theta, volatility.
+    """
+    n = len(spot)
+    S = _as_float(spot)
+    K = _as_float([k if k is not None else 0.0 for k in strike])
+    T = _as_float([year_fraction(e, today) for e in expiry])
+    r = _as_float([RISK_FREE_RATES.get(c, 0.0) for c in currency])
+    implied_vol = implied_vol if implied_vol is not None else [None] * n
+    history_vol = history_vol if history_vol is not None else [None] * n
+    sigma = _as_float([iv or hv or DEFAULT_VOLATILITY for iv, hv in zip(implied_vol, history_vol)])
+    is_call = np.array([t == "Call" for t in option_type], dtype=bool)
+    american = np.array([EXERCISE_STYLE.get(m, "American") == "American" for m in market], dtype=bool)
+
+    result = {key: np.zeros(n) for key in ("price", "delta", "gamma", "vega", "theta")}
+    for mask, model in ((~american, black_scholes), (american, binomial_american)):
+        if mask.any():
+            priced = model(S[mask], K[mask], T[mask], r[mask], sigma[mask], is_call[mask])
+            for key in result:
+                result[key][mask] = priced[key]
+    # No underlying price (quote failed): report 0 like the intrinsic-value estimate did
+    no_spot = S <= 0
+    for key in result:
+        result[key][no_spot] = 0.0
+    result["volatility"] = sigma
+    return result
@@ -0,0 +1,253 @@
+import csv
+import io
+import os
+import re
+import threading
+import time
+from datetime import date, timedelta
+import numpy as np
+from .models import Holding, PortfolioSnapshot
+from .options import VOLATILITY_LOOKBACK, realized_volatility
+from .valuation import value_portfolio
+
+# One record per trading day: days since 1970-01-01 and the close
+PRICE_DTYPE = np.dtype([("day", "<i4"), ("close", "<f8")])
+# Live quotes are buffered and merged into the files at most this often (seconds)
+FLUSH_INTERVAL = 60
+_EPOCH = date(1970, 1, 1)
+# Symbols become file names in the store directory: only Tencent-style symbols are accepted
+SYMBOL_PATTERN = re.compile(r"(us|hk|sh|sz|fx_s)[A-Za-z0-9.]+")
+
+
+def to_day(d):
+    return (d - _EPOCH).days
+
+
+def from_day(n):
+    return _EPOCH + timedelta(days=int(n))
+
+
+def valid_symbol(symbol):
+    return isinstance(symbol, str) and SYMBOL_PATTERN.fullmatch(symbol) is not None
+
+
+class PriceHistoryStore:
+    """
+    Local daily close history: one sorted .npy array per Tencent symbol
+    (sh600519.npy, usAAPL.npy, fx_susdhkd.npy...), memory-mapped on read.
+    Filled from CSV imports and from live quotes (last price of the day wins).
+    Live quotes only touch the file's tail (see _append); imports of older days rewrite it.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self._arrays = {}
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+
+    def _path(self, symbol):
+        if not valid_symbol(symbol):
+            raise ValueError(f"Invalid symbol {symbol!r} (expected a Tencent symbol such as usAAPL or hk00700)")
+        return os.path.join(self.directory, f"{symbol}.npy")
+
+    def series(self, symbol):
+        """Structured array (day, close) sorted by day; memory-mapped, read-only. Empty for invalid symbols."""
+        if not valid_symbol(symbol):
+            return np.empty(0, PRICE_DTYPE)
+        with self._lock:
+            if symbol not in self._arrays:
+                path = self._path(symbol)
+                self._arrays[symbol] = np.load(path, mmap_mode="r") if os.path.exists(path) else np.empty(0, PRICE_DTYPE)
+            return self._arrays[symbol]
+
+    def closes(self, symbol, end=None, limit=None):
+        """Closes up to and including `end` (a date), optionally only the last `limit`."""
+        arr = self.series(symbol)
+        if end is not None:
+            arr = arr[:np.searchsorted(arr["day"], to_day(end), side="right")]
+        if limit is not None:
+            arr = arr[-limit:]
+        return np.asarray(arr["close"])
+
+    def close_on(self, symbol, day):
+        """Last close on or before `day`, or None."""
+        arr = self.series(symbol)
+        i = np.searchsorted(arr["day"], to_day(day), side="right")
+        return float(arr["close"][i - 1]) if i else None
+
+    def symbols(self):
+        return sorted(f[:-4] for f in os.listdir(self.directory) if f.endswith(".npy"))
+
+    def write(self, symbol, days, closes):
+        """Merge (day, close) points into the symbol's file; new values win on the same day."""
+        new = np.empty(len(days), PRICE_DTYPE)
+        new["day"] = days
+        new["close"] = closes
+        with self._lock:
+            if len(new) and np.all(np.diff(new["day"]) > 0):
+                self._arrays.pop(symbol, None)  # re-map to pick up the new length
+                total = self._append(symbol, new)
+                if total is not None:
+                    return total
+            old = np.array(self.series(symbol))
+            self._arrays.pop(symbol, None)  # drop the mmap before replacing the file
+            merged = np.concatenate([new, old])  # new first: np.unique keeps the first occurrence
+            _, first = np.unique(merged["day"], return_index=True)
+            merged = merged[first]  # np.unique returns sorted days
+            tmp = self._path(symbol) + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, merged)
+            os.replace(tmp, self._path(symbol))
+        return len(merged)
+
+    def _append(self, symbol, new):
+        """
+        Write sorted `new` records in place when none is older than the file's last day:
+        a record for that day overwrites it, later days go after it, and the header's
+        shape is patched (np.save leaves room for it to grow). O(len(new)) instead of a
+        rewrite of the whole history. None when the file can't be patched this way.
+        """
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return None
+        fmt = np.lib.format
+        size = PRICE_DTYPE.itemsize
+        with open(path, "r+b") as f:
+            if fmt.read_magic(f) != (1, 0):
+                return None
+            shape, fortran_order, dtype = fmt.read_array_header_1_0(f)
+            if dtype != PRICE_DTYPE or len(shape) != 1:
+                return None
+            offset, count = f.tell(), shape[0]
+            start = count
+            if count:
+                f.seek(offset + (count - 1) * size)
+                last = np.frombuffer(f.read(size), PRICE_DTYPE)[0]["day"]
+                if new["day"][0] < last:
+                    return None
+                if new["day"][0] == last:
+                    start = count - 1
+            total = start + len(new)
+            header = io.BytesIO()
+            fmt.write_array_header_1_0(header, {"descr": fmt.dtype_to_descr(PRICE_DTYPE),
+                                                "fortran_order": False, "shape": (total,)})
+            if header.tell() != offset:
+                return None
+            # Records first: if we stop before the header, the old shape still reads back intact
+            f.seek(offset + start * size)
+            f.write(new.tobytes())
+            if total != count:
+                f.flush()
+                f.seek(0)
+                f.write(header.getvalue())
+        return total
+
+    def import_csv(self, symbol, text):
+        """CSV with a header row containing `date` and `close` columns (extra columns ignored)."""
+        days, closes = [], []
+        for row in csv.DictReader(io.StringIO(text)):
+            row = {k.strip().lower(): v for k, v in row.items() if k}
+            try:
+                days.append(to_day(date.fromisoformat(row["date"].strip()[:10])))
+                closes.append(float(row["close"]))
+            except (KeyError, ValueError):
+                continue
+        if not days:
+            raise ValueError("No valid date/close rows found")
+        self.write(symbol, days, closes)
+        return len(days)
+
+    def record_quotes(self, quotes, day=None):
+        """Accumulate live quotes ({symbol: {"price"} or {"rate"}}) as today's close."""
+        day = to_day(day or date.today())
+        with self._lock:
+            for symbol, quote in quotes.items():
+                value = quote.get("price") or quote.get("rate")
+                if value and valid_symbol(symbol):
+                    self._pending[symbol] = (day, value)
+            due = time.monotonic() - self._last_flush > FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered quotes: an in-place tail write per symbol, taking the lock per symbol."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        for symbol, (day, value) in pending.items():
+            self.write(symbol, [day], [value])
+
+
+class HistoricalQuotes:
+    """
+    QuoteContext stand-in that answers price / FX / vol lookups as of a past day
+    from the PriceHistoryStore, so value_portfolio can replay holdings over history.
+    """
+
+    def __init__(self, store, market_data, day, to_curr="HKD"):
+        self.store = store
+        self.market_data = market_data
+        self.day = day
+        self.to_curr = to_curr
+
+    def price(self, ticker, market):
+        return self.store.close_on(self.market_data.get_ticker_symbol_tencent(ticker, market), self.day) or 0.0
+
+    def price_as_of(self, ticker, market):
+        return None if self.price(ticker, market) else "unavailable"
+
+    def company_name(self, ticker, market):
+        return self.market_data.get_company_name(ticker, market, quotes={})
+
+    def fx_rate(self, from_curr):
+        """Rate on or before the day from the store; 0.0 without FX history (never today's live rate)."""
+        if from_curr == self.to_curr:
+            return 1.0
+        return self.store.close_on(self.market_data.get_fx_symbol(from_curr, self.to_curr), self.day) or 0.0
+
+    def realized_volatility(self, ticker, market):
+        symbol = self.market_data.get_ticker_symbol_tencent(ticker, market)
+        return realized_volatility(self.store.closes(symbol, end=self.day, limit=VOLATILITY_LOOKBACK))
+
+
+def backfill_snapshots(store, market_data, data_manager, start, end):
+    """
+    Replay holdings over [start, end] and create a "backfill" snapshot for every
+    weekday that has no snapshot yet. Holdings as of a day are those of the latest
+    snapshot on or before it (current holdings if there is none); prices, FX and
+    option inputs come from the local price store. Days where a held symbol has no
+    close yet, or a held currency no FX rate yet, are skipped. Returns the number of
+    snapshots created.
+    """
+    history = sorted(data_manager.get_history(), key=lambda s: str(s.get("date"))[:10])
+    existing = {str(s.get("date"))[:10] for s in history}
+    current = data_manager.get_holdings()
+
+    created = []
+    base_index = -1
+    day = start
+    while day <= end:
+        key = day.isoformat()
+        while base_index + 1 < len(history) and str(history[base_index + 1].get("date"))[:10] <= key:
+            base_index += 1
+        if day.weekday() < 5 and key not in existing:
+            if base_index >= 0:
+                holdings = [Holding(**h) for h in history[base_index]["holdings_snapshot"]]
+            else:
+                holdings = current
+            quotes = HistoricalQuotes(store, market_data, day)
+            if (all(quotes.price(h.ticker, h.market) > 0 for h in holdings if h.asset_type in ("Stock", "Option"))
+                    and all(quotes.fx_rate(c) > 0 for c in {market_data.get_currency(h.market) for h in holdings})):
+                summary = value_portfolio(holdings, quotes, market_data, as_of=day)
+                created.append(PortfolioSnapshot(
+                    date=day,
+                    total_net_worth_hkd=summary.total_net_worth_hkd,
+                    holdings_snapshot=summary.holdings,
+                    source="backfill"
+                ))
+        day += timedelta(days=1)
+
+    data_manager.save_snapshots(created)
+    return len(created)
@@ -0,0 +1,167 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from .metrics import CACHE_LOOKUPS
+
+# Per-kind (ttl, max_stale) in seconds.
+# - Within ttl an entry is FRESH and served as-is.
+# - Between ttl and max_stale it is STALE: served immediately, caller refreshes in background.
+# - After max_stale it is treated as missing and must be refetched.
+DEFAULT_TTLS = {
+    "quote": (15, 60 * 60),
+    "fx": (10 * 60, 24 * 60 * 60),
+    "name": (7 * 24 * 60 * 60, 30 * 24 * 60 * 60),
+}
+DEFAULT_MAX_ENTRIES = 4096
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+class QuoteCache:
+    """
+    Thread-safe bounded LRU cache with per-kind TTL and stale-while-revalidate.
+    Keys are (kind, symbol); kind is one of DEFAULT_TTLS ("quote", "fx", "name").
+    """
+
+    def __init__(self, ttls=None, max_entries=DEFAULT_MAX_ENTRIES, clock=time.monotonic):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        # Optional SharedQuoteCache (multi-worker mode): consulted on local misses and
+        # stale entries, written through on put
+        self.shared = None
+
+    def _local(self, kind, key):
+        """(value, age) from this process's LRU, or (None, None)."""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None:
+                return None, None
+            self._entries.move_to_end((kind, key))
+            return entry[0], self._clock() - entry[1]
+
+    def get(self, kind, key):
+        """Returns (value, FRESH | STALE) or (None, None) when missing/expired."""
+        ttl, max_stale = self.ttls[kind]
+        value, age = self._local(kind, key)
+        if self.shared is not None and (value is None or age > ttl):
+            # Another worker may have fetched it since
+            shared_value, shared_age = self.shared.get(kind, key)
+            if shared_value is not None and (value is None or shared_age < age):
+                value, age = shared_value, shared_age
+                self._store([(kind, key, value)], age)
+        if value is None or age > max_stale:
+            if value is not None:
+                with self._lock:
+                    self._entries.pop((kind, key), None)
+            CACHE_LOOKUPS.inc(kind=kind, result="miss")
+            return None, None
+        state = FRESH if age <= ttl else STALE
+        CACHE_LOOKUPS.inc(kind=kind, result=state)
+        return value, state
+
+    def _store(self, entries, age=0.0):
+        stored_at = self._clock() - age
+        with self._lock:
+            for kind, key, value in entries:
+                self._entries[(kind, key)] = (value, stored_at)
+                self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, kind, key, value):
+        self.put_many([(kind, key, value)])
+
+    def put_many(self, entries):
+        """Store [(kind, key, value), ...] (one shared-cache transaction for the batch)."""
+        self._store(entries)
+        if self.shared is not None:
+            self.shared.put_many(entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def claim_refresh(self, keys):
+        """Mark keys as being refreshed; returns only those not already in flight."""
+        with self._lock:
+            claimed = [k for k in keys if k not in self._refreshing]
+            self._refreshing.update(claimed)
+            return claimed
+
+    def release_refresh(self, keys):
+        with self._lock:
+            self._refreshing.difference_update(keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedQuoteCache:
+    """
+    Quote cache in a SQLite file shared by every worker process (multi-worker mode),
+    behind each process's QuoteCache: one worker's fetch serves all of them.
+    Ages use wall-clock time so they compare across processes. Reads are also
+    recorded (throttled) so the elected refresher knows whether anyone is polling.
+    """
+
+    # Seconds between last_read updates from one process
+    TOUCH_INTERVAL = 5.0
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS quotes (
+            kind TEXT,
+            key TEXT,
+            value TEXT NOT NULL,
+            stored_at REAL NOT NULL,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL);
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = str(path)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A cache: losing the last writes on power failure is fine
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.executescript(self.SCHEMA)
+        self._touched = 0.0
+
+    def get(self, kind, key):
+        """(value, age in seconds) or (None, None)."""
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM quotes WHERE kind = ? AND key = ?",
+                                     (kind, key)).fetchone()
+            if now - self._touched >= self.TOUCH_INTERVAL:
+                self._touched = now
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_read', ?)", (now,))
+        if row is None:
+            return None, None
+        return json.loads(row[0]), max(0.0, now - row[1])
+
+    def put_many(self, entries):
+        now = self._clock()
+        rows = [(kind, key, json.dumps(value), now) for kind, key, value in entries]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO quotes VALUES (?, ?, ?, ?)", rows)
+
+    def idle_seconds(self):
+        """Seconds since any worker last read from the cache (inf if never)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'last_read'").fetchone()
+        return self._clock() - row[0] if row else float("inf")
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM quotes")
@@ -0,0 +1,126 @@
+import csv
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from .storage import JsonFileMap
+
+# Consecutive failures that open a provider's circuit, and seconds before a trial request
+BREAKER_FAILURES = int(os.environ.get("PORTFOLIO_BREAKER_FAILURES", "3"))
+BREAKER_RESET = float(os.environ.get("PORTFOLIO_BREAKER_RESET", "30"))
+# Seconds the last-known-good store waits for more updates before rewriting its file
+LAST_GOOD_DEBOUNCE = 5.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failures` consecutive errors; while open every call fails
+    fast. After `reset_timeout` seconds one trial call is let through (half-open):
+    success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_timeout=BREAKER_RESET, clock=time.monotonic):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._consecutive = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or self._consecutive >= self.failures:
+                if self.state != OPEN:
+                    print(f"Quote circuit opened after {self._consecutive} failure(s)")
+                self.state = OPEN
+                self._opened_at = self._clock()
+
+
+class FileQuoteProvider:
+    """
+    Quotes from a local file, re-read when it changes (offline use and tests).
+    JSON: {"usAAPL": 190.1, "fx_susdhkd": {"rate": 7.8}, "hk00700": {"price": 400, "name": "..."}}
+    CSV:  header row with `symbol` and `price` (or `rate`) columns, optional `name`.
+    """
+
+    def __init__(self, path):
+        self.name = f"file:{path}"
+        self.path = os.path.expanduser(str(path))
+        self.breaker = CircuitBreaker()
+        self._mtime = None
+        self._quotes = {}
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return self._quotes
+        with open(self.path, "r", encoding="utf-8-sig") as f:
+            if self.path.lower().endswith(".csv"):
+                rows = {r["symbol"].strip(): {k: v for k, v in r.items() if k != "symbol" and v not in (None, "")}
+                        for r in csv.DictReader(f)}
+            else:
+                rows = json.load(f)
+        quotes = {}
+        for symbol, value in rows.items():
+            quote = dict(value) if isinstance(value, dict) else {"price": value}
+            for field in ("price", "rate"):
+                if field in quote:
+                    quote[field] = float(quote[field])
+            if symbol.startswith("fx_") and "rate" not in quote and "price" in quote:
+                quote = {"rate": quote["price"]}
+            quotes[symbol] = quote
+        self._quotes, self._mtime = quotes, mtime
+        return quotes
+
+    def fetch(self, symbols):
+        quotes = self._load()
+        return {s: quotes[s] for s in symbols if s in quotes}
+
+
+class LastKnownGoodStore(JsonFileMap):
+    """
+    Last successful quote per symbol with its timestamp, persisted across restarts.
+    Used when every provider fails: returned quotes carry "stale": True and "as_of".
+    """
+
+    def __init__(self, path, debounce=LAST_GOOD_DEBOUNCE):
+        super().__init__(path, debounce)
+
+    def record(self, quotes):
+        as_of = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            for symbol, quote in quotes.items():
+                if quote.get("price") or quote.get("rate"):
+                    self._items[symbol] = {**{k: v for k, v in quote.items() if k not in ("stale", "as_of")}, "as_of": as_of}
+                    self._mark_dirty()
+
+    def get(self, symbol):
+        quote = self._items.get(symbol)
+        return {**quote, "stale": True} if quote else None
@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Response
+
+# Optional: orjson (compact encoder, ~5-10x faster than json) and brotli (smaller than gzip)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Compressed bodies kept per (etag, encoding), so repeated full GETs skip re-encoding
+BODY_CACHE_SIZE = 16
+
+_body_cache = OrderedDict()
+_body_cache_lock = threading.Lock()
+
+
+def dumps(content):
+    """Compact JSON bytes. Dates become ISO strings, anything unknown goes through str()."""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def version_etag(request, *parts):
+    """
+    Weak ETag from version parts plus the request's query string (filters, formats).
+    The parts must identify the data across processes and restarts (DataManager.validators).
+    """
+    query = zlib.crc32(request.url.query.encode("utf-8"))
+    return 'W/"' + "-".join([*map(str, parts), f"{query:x}"]) + '"'
+
+
+def content_etag(body):
+    return 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _validators(etag, last_modified):
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def _is_current(request, etag, last_modified):
+    """If-None-Match wins; If-Modified-Since is only consulted without it (RFC 9110 13.2.2)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    A 304 Response when the client's cached copy is current, else None. Call it
+    before building the body so unchanged polls cost no serialization at all.
+    """
+    if _is_current(request, etag, last_modified):
+        return Response(status_code=304, headers=_validators(etag, last_modified))
+    return None
+
+
+def _accepted(accept_encoding):
+    accepted = set()
+    for token in accept_encoding.split(","):
+        name, *params = token.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+
+def json_response(request, content=None, body=None, etag=None, last_modified=None):
+    """
+    JSON Response for already-validated data: skips jsonable_encoder and response_model
+    validation, uses the compact encoder, adds ETag / Last-Modified (a content hash
+    when no etag is given), answers 304 for current clients, and compresses bodies
+    over COMPRESS_MIN_SIZE with brotli or gzip, whichever the client accepts.
+    Pass `body` (from dumps) to reuse an encoding the caller already holds.
+    """
+    if body is None:
+        body = dumps(content)
+    if etag is None:
+        etag = content_etag(body)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    headers = _validators(etag, last_modified)
+    encoding = None
+    if len(body) >= COMPRESS_MIN_SIZE:
+        accepted = _accepted(request.headers.get("accept-encoding", ""))
+        encoding = "br" if brotli is not None and "br" in accepted else "gzip" if "gzip" in accepted else None
+    if encoding is not None:
+        key = (etag, encoding)
+        with _body_cache_lock:
+            cached = _body_cache.get(key)
+            if cached is not None:
+                _body_cache.move_to_end(key)
+        if cached is None:
+            cached = _compress(body, encoding)
+            with _body_cache_lock:
+                _body_cache[key] = cached
+                while len(_body_cache) > BODY_CACHE_SIZE:
+                    _body_cache.popitem(last=False)
+        body = cached
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
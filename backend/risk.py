@@ -0,0 +1,303 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import numpy as np
+from .options import (DEFAULT_VOLATILITY, EXERCISE_STYLE, MIN_HISTORY, OPTION_MULTIPLIER, RISK_FREE_RATES,
+                      norm_cdf, year_fraction)
+from .valuation import value_portfolio
+
+# Monte Carlo paths per request, and paths per chunk (one process-pool task each)
+RISK_PATHS = int(os.environ.get("PORTFOLIO_RISK_PATHS", "100000"))
+RISK_CHUNK = 20000
+# Cap on chunk size x revalued columns, so memory stays bounded for large books
+MAX_CHUNK_CELLS = 4_000_000
+# Processes for the simulation; 0 or 1 runs it in-process
+RISK_PROCESSES = int(os.environ.get("PORTFOLIO_RISK_PROCESSES", str(os.cpu_count() or 1)))
+# Daily closes used for historical scenarios and the covariance estimate (~2 years)
+RISK_LOOKBACK = 504
+CONFIDENCE_LEVELS = (0.95, 0.99)
+# Fixed seed: the same book and history give the same Monte Carlo figures
+RISK_SEED = 20240101
+# Annualized vol for factors without enough history (FX pairs are far calmer than stocks)
+FX_FALLBACK_VOLATILITY = 0.05
+TRADING_DAYS = 252
+
+_POOL = None
+
+
+def build_positions(holdings, quotes, market_data):
+    """
+    Holdings -> risk factors (one per underlying symbol and non-HKD currency) and
+    position arrays for revaluation:
+    - linear: HKD value per (price factor, FX factor) pair, stocks and cash aggregated
+    - options: one entry per contract, revalued in full
+    Factor index -1 means "no factor" (HKD, or cash). Unpriced holdings are skipped
+    and reported.
+    """
+    factors = {}
+    kinds = []
+
+    def factor(symbol, kind):
+        if symbol not in factors:
+            factors[symbol] = len(factors)
+            kinds.append(kind)
+        return factors[symbol]
+
+    linear = {}
+    options = {key: [] for key in ("factor", "fx", "spot", "strike", "expiry", "rate", "sigma", "call", "american", "units")}
+    unpriced = []
+    for h in holdings:
+        currency = market_data.get_currency(h.market)
+        fx = quotes.fx_rate(currency)
+        fx_index = factor(market_data.get_fx_symbol(currency), "fx") if currency != "HKD" else -1
+        if h.asset_type == "Cash":
+            key = (-1, fx_index)
+            amount = h.quantity * fx
+        elif h.asset_type in ("Stock", "Option"):
+            spot = quotes.price(h.ticker, h.market)
+            if not spot:
+                unpriced.append(h.ticker)
+                continue
+            price_index = factor(market_data.get_ticker_symbol_tencent(h.ticker, h.market), "price")
+            if h.asset_type == "Stock":
+                key = (price_index, fx_index)
+                amount = h.quantity * spot * fx
+            else:
+                key = None
+                for name, item in (("factor", price_index), ("fx", fx_index), ("spot", spot),
+                                   ("strike", h.strike_price or 0.0), ("expiry", year_fraction(h.expiry_date)),
+                                   ("rate", RISK_FREE_RATES.get(currency, 0.0)),
+                                   ("sigma", h.implied_vol or quotes.realized_volatility(h.ticker, h.market)
+                                    or DEFAULT_VOLATILITY),
+                                   ("call", h.option_type == "Call"),
+                                   ("american", EXERCISE_STYLE.get(h.market, "American") == "American"),
+                                   ("units", h.quantity * OPTION_MULTIPLIER * fx)):
+                    options[name].append(item)
+        else:
+            continue
+        if key is not None:
+            linear[key] = linear.get(key, 0.0) + amount
+
+    positions = {
+        "linear_factor": np.array([k[0] for k in linear], dtype=int),
+        "linear_fx": np.array([k[1] for k in linear], dtype=int),
+        "linear_value": np.array(list(linear.values()), dtype=float),
+        "option_factor": np.array(options["factor"], dtype=int),
+        "option_fx": np.array(options["fx"], dtype=int),
+        "option_spot": np.array(options["spot"], dtype=float),
+        "option_strike": np.array(options["strike"], dtype=float),
+        "option_expiry": np.array(options["expiry"], dtype=float),
+        "option_rate": np.array(options["rate"], dtype=float),
+        "option_sigma": np.array(options["sigma"], dtype=float),
+        "option_call": np.array(options["call"], dtype=bool),
+        "option_american": np.array(options["american"], dtype=bool),
+        "option_units": np.array(options["units"], dtype=float),
+    }
+    return list(factors), kinds, positions, unpriced
+
+
+def _option_values(positions, spot, expiry):
+    """
+    Black-Scholes price per contract for a (paths x contracts) spot matrix. American
+    contracts are floored at intrinsic value: the binomial tree used for display is
+    too slow for 100k paths. Only differences within this model are used (see revalue);
+    the value reported is the summary's.
+    """
+    K = positions["option_strike"]
+    r = positions["option_rate"]
+    sigma = positions["option_sigma"]
+    call = positions["option_call"]
+    intrinsic = np.where(call, np.maximum(spot - K, 0.0), np.maximum(K - spot, 0.0))
+    live = (expiry > 0) & (sigma > 0) & (K > 0)
+    T = np.where(live, expiry, 1.0)
+    s = np.where(live, sigma, 1.0)
+    Kl = np.where(live, K, 1.0)
+    sqrt_t = np.sqrt(T)
+    with np.errstate(divide="ignore"):
+        d1 = (np.log(spot / Kl) + (r + 0.5 * s * s) * T) / (s * sqrt_t)
+    d2 = d1 - s * sqrt_t
+    disc = np.exp(-r * T)
+    nd1, nd2 = norm_cdf(d1), norm_cdf(d2)
+    price = np.where(call, spot * nd1 - Kl * disc * nd2, Kl * disc * (1 - nd2) - spot * (1 - nd1))
+    price = np.where(positions["option_american"], np.maximum(price, intrinsic), price)
+    return np.where(live, price, intrinsic)
+
+
+def revalue(positions, returns, horizon_days):
+    """
+    P&L in HKD of the book for each row of `returns` (log returns per factor over the
+    horizon): linear positions by exp(price + FX return) - 1, options fully repriced at
+    the shocked spot with `horizon_days` less to expiry, converted at the shocked FX rate.
+    Option P&L is shocked minus unshocked price under the same model, so its pricing
+    error against the summary's binomial value cancels out.
+    """
+    n = len(returns)
+    # Trailing zero column: factor index -1 (HKD / no price factor) reads a zero return
+    shocks = np.concatenate([returns, np.zeros((n, 1))], axis=1)
+    pnl = np.zeros(n)
+    if len(positions["linear_value"]):
+        moves = shocks[:, positions["linear_factor"]] + shocks[:, positions["linear_fx"]]
+        pnl += np.expm1(moves) @ positions["linear_value"]
+    if len(positions["option_units"]):
+        spot = positions["option_spot"]
+        expiry = positions["option_expiry"]
+        before = _option_values(positions, spot[None, :], expiry)[0]
+        after = _option_values(positions, spot * np.exp(shocks[:, positions["option_factor"]]),
+                               np.maximum(expiry - horizon_days / 365.0, 0.0))
+        after = after * np.exp(shocks[:, positions["option_fx"]])
+        pnl += (after - before) @ positions["option_units"]
+    return pnl
+
+
+def factor_returns(price_history, symbols, lookback=RISK_LOOKBACK):
+    """
+    Daily log returns (days x factors) over the last `lookback` trading days, on the
+    union of days any factor traded (closes forward-filled, NaN before a factor's
+    first close). Also returns the number of valid returns per factor.
+    """
+    series = [price_history.series(s) for s in symbols]
+    days = np.unique(np.concatenate([np.asarray(s["day"]) for s in series] or [np.zeros(0, dtype=int)]))
+    days = days[-(lookback + 1):]
+    closes = np.full((len(days), len(symbols)), np.nan)
+    for j, s in enumerate(series):
+        if not len(s):
+            continue
+        index = np.searchsorted(s["day"], days, side="right") - 1
+        valid = index >= 0
+        closes[valid, j] = np.asarray(s["close"])[index[valid]]
+    closes[closes <= 0] = np.nan
+    returns = np.diff(np.log(closes), axis=0)
+    return returns, np.sum(np.isfinite(returns), axis=0)
+
+
+def horizon_returns(daily, horizon_days):
+    """Overlapping `horizon_days` sums of daily log returns (missing returns count as 0)."""
+    daily = np.nan_to_num(daily)
+    if horizon_days <= 1 or len(daily) < horizon_days:
+        return daily if horizon_days <= 1 else np.zeros((0, daily.shape[1]))
+    cumulative = np.vstack([np.zeros((1, daily.shape[1])), np.cumsum(daily, axis=0)])
+    return cumulative[horizon_days:] - cumulative[:-horizon_days]
+
+
+def covariance(daily, counts, kinds):
+    """
+    Daily covariance of the factors: pairwise over overlapping history, with an assumed
+    vol and zero correlation for factors with fewer than MIN_HISTORY returns.
+    """
+    import pandas as pd  # deferred, see valuation._group_sum
+
+    n = len(kinds)
+    cov = pd.DataFrame(daily).cov(min_periods=MIN_HISTORY).to_numpy() if len(daily) else np.full((n, n), np.nan)
+    for j, kind in enumerate(kinds):
+        if counts[j] < MIN_HISTORY or not np.isfinite(cov[j, j]):
+            cov[j, :] = cov[:, j] = 0.0
+            vol = FX_FALLBACK_VOLATILITY if kind == "fx" else DEFAULT_VOLATILITY
+            cov[j, j] = vol * vol / TRADING_DAYS
+    return np.nan_to_num(cov)
+
+
+def cholesky(cov):
+    """Cholesky factor; pairwise estimates can be slightly indefinite, so clip eigenvalues if needed."""
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        w, v = np.linalg.eigh(cov)
+        repaired = (v * np.clip(w, 1e-12, None)) @ v.T
+        return np.linalg.cholesky(repaired + np.eye(len(cov)) * 1e-14)
+
+
+def _simulate_chunk(args):
+    """One Monte Carlo chunk (runs in a pool process): correlated normal shocks -> P&L."""
+    positions, chol, seed, paths, horizon_days = args
+    rng = np.random.default_rng(seed)
+    returns = rng.standard_normal((paths, len(chol))) @ chol.T
+    return revalue(positions, returns, horizon_days)
+
+
+def _pool():
+    global _POOL
+    if _POOL is None:
+        # spawn: forking a process that runs server threads can deadlock
+        _POOL = ProcessPoolExecutor(max_workers=RISK_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _POOL
+
+
+def shutdown():
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(cancel_futures=True)
+        _POOL = None
+
+
+def monte_carlo(positions, cov, horizon_days, paths=RISK_PATHS, seed=RISK_SEED):
+    """P&L of `paths` correlated scenarios, chunked across the process pool."""
+    chol = cholesky(cov * horizon_days)
+    columns = len(positions["linear_value"]) + 2 * len(positions["option_units"]) + len(chol)
+    chunk = max(256, min(RISK_CHUNK, MAX_CHUNK_CELLS // max(columns, 1)))
+    sizes = [min(chunk, paths - start) for start in range(0, paths, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(positions, chol, s, size, horizon_days) for s, size in zip(seeds, sizes)]
+    if RISK_PROCESSES > 1 and len(tasks) > 1:
+        results = _pool().map(_simulate_chunk, tasks)
+    else:
+        results = map(_simulate_chunk, tasks)
+    return np.concatenate(list(results))
+
+
+def var_cvar(pnl, levels=CONFIDENCE_LEVELS):
+    """{level: (VaR, CVaR)} as positive HKD losses; CVaR is the mean loss beyond VaR."""
+    out = {}
+    for level in levels:
+        if not len(pnl):
+            out[level] = (None, None)
+            continue
+        cutoff = np.quantile(pnl, 1 - level)
+        tail = pnl[pnl <= cutoff]
+        out[level] = (float(-cutoff) + 0.0, float(-tail.mean()) + 0.0)
+    return out
+
+
+def _figures(pnl, levels):
+    figures = var_cvar(pnl, levels)
+    return {
+        "var": {f"{level:g}": v for level, (v, _) in figures.items()},
+        "cvar": {f"{level:g}": c for level, (_, c) in figures.items()},
+    }
+
+
+def risk_report(holdings, quotes, market_data, price_history, horizon_days=1, paths=RISK_PATHS,
+                lookback=RISK_LOOKBACK, levels=CONFIDENCE_LEVELS):
+    """
+    Historical-simulation and Monte Carlo VaR / CVaR of the current holdings over
+    `horizon_days`, from the local price store (no network beyond the quotes given).
+    The portfolio value is value_portfolio's, i.e. the summary net worth.
+    """
+    start = time.perf_counter()
+    value = value_portfolio(holdings, quotes, market_data).total_net_worth_hkd
+    symbols, kinds, positions, unpriced = build_positions(holdings, quotes, market_data)
+    daily, counts = factor_returns(price_history, symbols, lookback)
+    scenarios = horizon_returns(daily, horizon_days)
+    historical = revalue(positions, scenarios, horizon_days) if len(symbols) else np.zeros(len(scenarios))
+    cov = covariance(daily, counts, kinds)
+    mc_start = time.perf_counter()
+    simulated = monte_carlo(positions, cov, horizon_days, paths) if len(symbols) else np.zeros(paths)
+    mc_seconds = time.perf_counter() - mc_start
+
+    return {
+        "as_of": date.today(),
+        "horizon_days": horizon_days,
+        "portfolio_value_hkd": value,
+        "historical": {"scenarios": len(scenarios), **_figures(historical, levels)},
+        "monte_carlo": {"paths": paths, "seconds": mc_seconds, **_figures(simulated, levels)},
+        "factors": [
+            {"symbol": s, "kind": k, "history_days": int(c),
+             "volatility": math.sqrt(cov[j, j] * TRADING_DAYS) if len(cov) else None}
+            for j, (s, k, c) in enumerate(zip(symbols, kinds, counts))
+        ],
+        "missing_history": [s for s, c in zip(symbols, counts) if c < MIN_HISTORY],
+        "unpriced": unpriced,
+        "seconds": time.perf_counter() - start,
+    }
@@ -0,0 +1,204 @@
+import numpy as np
+from .options import EXPOSURE_MODE, OPTION_MULTIPLIER, price_options
+from .valuation import GREEK_FIELDS, holding_contributions, stale_tickers, value_portfolio
+
+# Scenarios accepted per request
+MAX_SCENARIOS = 1000
+BASE_MARKETS = ("US", "HK", "CN", "Cash")
+
+
+def _codes(values):
+    """(code per value, distinct values in first-appearance order)."""
+    index = {}
+    codes = np.array([index.setdefault(v, len(index)) for v in values], dtype=int)
+    return codes, list(index)
+
+
+def _multipliers(scenarios, field, keys):
+    """
+    (scenarios x keys) price/rate multipliers 1 + shock; keys no scenario shocks stay at 1.
+    A shocked key that matches nothing in the book is an error (most likely a typo, e.g.
+    "00700" for the stored "0700"), reported with every other unmatched key of the field.
+    """
+    out = np.ones((len(scenarios), len(keys)))
+    position = {k: j for j, k in enumerate(keys) if k is not None}
+    unmatched = []
+    for i, scenario in enumerate(scenarios):
+        for key, shock in getattr(scenario, field).items():
+            if shock <= -1:
+                raise ValueError(f"{field} shock for {key} must be above -1 (a move of -100% or more)")
+            if key in position:
+                out[i, position[key]] = 1.0 + shock
+            elif key not in unmatched:
+                unmatched.append(key)
+    if unmatched:
+        raise ValueError(f"{field} shocks match nothing in the portfolio: {', '.join(unmatched)} "
+                         f"(known: {', '.join(sorted(position)) or 'none'})")
+    return out
+
+
+class ScenarioBook:
+    """
+    The current holdings valued once against one quote snapshot (value_portfolio),
+    laid out as per-row arrays, so a batch of what-if scenarios is evaluated as
+    (scenarios x holdings) matrices: every stock, cash and FX position in a few
+    array operations, every option contract in one price_options call.
+    Stored holdings and the quotes are never modified.
+    """
+
+    def __init__(self, holdings, quotes, market_data):
+        self.base = value_portfolio(holdings, quotes, market_data)
+        rows = self.base.holdings
+        self.rows = rows
+        n = len(rows)
+        asset_type = np.array([r["asset_type"] for r in rows], dtype=object)
+        self.is_cash = asset_type == "Cash"
+        self.is_option = asset_type == "Option"
+        self.quantity = np.array([r["quantity"] for r in rows], dtype=float)
+        currency = [market_data.get_currency(r["market"]) for r in rows]
+        self.currency_code, self.currencies = _codes(currency)
+        self.fx = np.array([quotes.fx_rate(c) for c in self.currencies], dtype=float)[self.currency_code]
+        # The price vector: underlying spot per row (1 for cash)
+        self.spot = np.array([1.0 if r["asset_type"] == "Cash" else quotes.price(r["ticker"], r["market"]) or 0.0
+                              for r in rows], dtype=float)
+
+        # Distribution keys per row, by the same rules as value_portfolio
+        market_key, sector_key, ticker_key = [], [], []
+        for r in rows:
+            keys = {name: key for name, key, _ in holding_contributions(r, market_data)}
+            market_key.append(keys["market_distribution"])
+            sector_key.append(keys.get("sector_distribution"))
+            ticker_key.append(keys.get("ticker_distribution"))
+        self.markets = list(dict.fromkeys([*BASE_MARKETS, *market_key]))
+        self.market_code = np.array([self.markets.index(k) for k in market_key], dtype=int)
+        self.sector_code, self.sectors = _codes(sector_key)
+        self.ticker_code, self.tickers = _codes(ticker_key)
+        # Shock lookups: a row's market (none for cash), distribution sector and ticker code
+        self.shock_market_code, self.shock_markets = _codes([None if c else r["market"] for r, c in zip(rows, self.is_cash)])
+        self.shock_ticker_code, self.shock_tickers = _codes([None if c else r["ticker"] for r, c in zip(rows, self.is_cash)])
+
+        option_idx = np.flatnonzero(self.is_option)
+        self.option_idx = option_idx
+        opts = [rows[i] for i in option_idx]
+        self.option_args = dict(
+            strike=[r["strike_price"] for r in opts],
+            expiry=[r["expiry_date"] for r in opts],
+            option_type=[r["option_type"] for r in opts],
+            market=[r["market"] for r in opts],
+            currency=[currency[i] for i in option_idx],
+            implied_vol=[r.get("implied_vol") for r in opts],
+            history_vol=[quotes.realized_volatility(r["ticker"], r["market"]) for r in opts],
+        )
+        self.strike = np.array([r["strike_price"] or 0.0 for r in opts], dtype=float)
+        self.is_call = np.array([r["option_type"] == "Call" for r in opts], dtype=bool)
+        self.is_sell_put = ~self.is_call & (self.quantity[option_idx] < 0)
+        self.option_ids = {r.get("id"): k for k, r in enumerate(opts)}
+        self.n = n
+
+    def _exercise_mask(self, scenarios):
+        mask = np.zeros((len(scenarios), len(self.option_idx)), dtype=bool)
+        for i, scenario in enumerate(scenarios):
+            for holding_id in scenario.exercise:
+                if holding_id not in self.option_ids:
+                    raise ValueError(f"exercise: {holding_id} is not an option holding")
+                mask[i, self.option_ids[holding_id]] = True
+        return mask
+
+    def evaluate(self, scenarios, include_holdings=False):
+        """
+        One PortfolioSummary-shaped dict per scenario, plus "name" and "change_hkd"
+        (net worth change against the unshocked book). Holding rows are only built
+        with include_holdings, otherwise "holdings" is empty.
+        """
+        if len(scenarios) > MAX_SCENARIOS:
+            raise ValueError(f"At most {MAX_SCENARIOS} scenarios per request")
+        m = len(scenarios)
+        exercise = self._exercise_mask(scenarios)
+        price_shock = (_multipliers(scenarios, "market", self.shock_markets)[:, self.shock_market_code]
+                       * _multipliers(scenarios, "sector", self.sectors)[:, self.sector_code]
+                       * _multipliers(scenarios, "ticker", self.shock_tickers)[:, self.shock_ticker_code])
+        fx_shock = _multipliers(scenarios, "fx", self.currencies)[:, self.currency_code]
+        spot = np.where(self.is_cash, 1.0, self.spot * price_shock)  # (m, n)
+        fx = self.fx * fx_shock
+
+        # Stocks and cash: quantity x price x FX (price 1 for cash)
+        price = spot.copy()
+        market_value = self.quantity * spot * fx
+        cash_value = np.zeros((m, self.n))  # exercised options' settlement, goes to "Cash"
+        dist_value = market_value.copy()
+        greeks = {}
+        k = len(self.option_idx)
+        if k:
+            idx = self.option_idx
+            q = self.quantity[idx]
+            option_spot = spot[:, idx]
+            option_fx = fx[:, idx]
+            priced = price_options(spot=option_spot.ravel(), **{name: values * m for name, values in self.option_args.items()})
+            greeks = {f: priced[f].reshape(m, k) for f in GREEK_FIELDS}
+            option_price = priced["price"].reshape(m, k)
+            value = q * option_price * OPTION_MULTIPLIER * option_fx
+            if EXPOSURE_MODE == "delta":
+                exposure = np.abs(q) * np.abs(greeks["delta"]) * option_spot * OPTION_MULTIPLIER * option_fx
+            else:
+                exposure = np.broadcast_to(np.abs(q) * self.strike * OPTION_MULTIPLIER, (m, k)) * option_fx
+            exposure = np.where(self.is_sell_put, exposure, 0.0)
+            # Exercise: shares delivered (+) or taken (-) at the strike, settled in cash
+            shares = q * OPTION_MULTIPLIER * np.where(self.is_call, 1.0, -1.0)
+            delivered = np.where(exercise, shares * option_spot * option_fx, 0.0)
+            settlement = np.where(exercise, -shares * self.strike * option_fx, 0.0)
+            price[:, idx] = option_price
+            market_value[:, idx] = np.where(exercise, delivered, value)
+            cash_value[:, idx] = settlement
+            dist_value[:, idx] = np.where(exercise, delivered, exposure)
+
+        total = market_value.sum(axis=1) + cash_value.sum(axis=1)
+        market_dist = _one_hot_sum(market_value, self.market_code, len(self.markets))
+        market_dist[:, self.markets.index("Cash")] += cash_value.sum(axis=1)
+        non_cash = ~self.is_cash
+        sector_dist = _one_hot_sum(dist_value[:, non_cash], self.sector_code[non_cash], len(self.sectors))
+        ticker_dist = _one_hot_sum(dist_value[:, non_cash], self.ticker_code[non_cash], len(self.tickers))
+        sectors = [(j, s) for j, s in enumerate(self.sectors) if s is not None]
+        tickers = [(j, t) for j, t in enumerate(self.tickers) if t is not None]
+        base_total = self.base.total_net_worth_hkd
+        stale = stale_tickers(self.rows)
+
+        results = []
+        for i, scenario in enumerate(scenarios):
+            results.append({
+                "name": scenario.name,
+                "change_hkd": float(total[i]) - base_total,
+                "total_net_worth_hkd": float(total[i]),
+                "holdings": self._rows(i, price, market_value, cash_value, dist_value, fx, fx_shock, greeks, exercise)
+                            if include_holdings else [],
+                "market_distribution": dict(zip(self.markets, market_dist[i].tolist())),
+                "sector_distribution": {s: float(sector_dist[i, j]) for j, s in sectors},
+                "ticker_distribution": {t: float(ticker_dist[i, j]) for j, t in tickers},
+                "stale_tickers": stale,
+            })
+        return results
+
+    def _rows(self, i, price, market_value, cash_value, dist_value, fx, fx_shock, greeks, exercise):
+        rows = []
+        option_pos = {j: k for k, j in enumerate(self.option_idx)}
+        for j, base in enumerate(self.rows):
+            row = {**base, "current_price": float(price[i, j]),
+                   "market_value_hkd": float(market_value[i, j] + cash_value[i, j])}
+            if "cost_value_hkd" in base:
+                row["cost_value_hkd"] = base["cost_value_hkd"] * float(fx_shock[i, j])
+            k = option_pos.get(j)
+            if k is not None:
+                row.update({f: float(greeks[f][i, k]) for f in greeks})
+                if exercise[i, k]:
+                    row["exercised"] = True
+                    row["exposure_value_hkd"] = 0
+                else:
+                    row["exposure_value_hkd"] = float(dist_value[i, j]) if self.is_sell_put[k] else 0
+            rows.append(row)
+        return rows
+
+
+def _one_hot_sum(values, codes, size):
+    """(scenarios x rows) values summed into (scenarios x keys) by each row's key code."""
+    one_hot = np.zeros((len(codes), size))
+    one_hot[np.arange(len(codes)), codes] = 1.0
+    return values @ one_hot
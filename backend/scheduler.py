@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Local exchange timezone and a default "after close" run time per market
+MARKET_TIMEZONES = {
+    "US": "America/New_York",
+    "HK": "Asia/Hong_Kong",
+    "CN": "Asia/Shanghai",
+}
+# Off unless PORTFOLIO_SNAPSHOT_SCHEDULE opts in: every scheduled run adds a history point
+DEFAULT_SCHEDULE = "off"
+# Max age (seconds) of the hot summary before it is recomputed in the background
+SUMMARY_MAX_AGE = float(os.environ.get("PORTFOLIO_SUMMARY_MAX_AGE", "60"))
+# Upper bound on one sleep, so laptop sleep / clock changes are noticed promptly
+MAX_SLEEP = 300
+
+
+def parse_schedule(spec):
+    """
+    "US=16:15,HK=16:15" -> {"US": (16, 15), "HK": (16, 15)} in each market's local time.
+    Empty or "off" disables the scheduler.
+    """
+    schedule = {}
+    if not spec or spec.strip().lower() == "off":
+        return schedule
+    for item in spec.split(","):
+        market, _, hhmm = item.strip().partition("=")
+        market = market.strip().upper()
+        if market not in MARKET_TIMEZONES:
+            raise ValueError(f"Unknown market in snapshot schedule: {market}")
+        hour, minute = (int(x) for x in hhmm.split(":"))
+        schedule[market] = (hour, minute)
+    return schedule
+
+
+def next_run(market, hour, minute, now=None):
+    """Next weekday at hour:minute in the market's timezone (as an aware datetime)."""
+    tz = ZoneInfo(MARKET_TIMEZONES[market])
+    now = (now or datetime.now(tz)).astimezone(tz)
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= now:
+        run += timedelta(days=1)
+    while run.weekday() >= 5:
+        run += timedelta(days=1)
+    return run
+
+
+class SummaryCache:
+    """
+    Hot PortfolioSummary cache keyed on DataManager.holdings_version.
+    - Same holdings and younger than max_age: served as-is.
+    - Same holdings but older: served as-is while a background recompute runs.
+    - Holdings changed, nothing cached, or fresh=True: recomputed before returning,
+      unless an `incremental` model (valuation.IncrementalValuation) already applied
+      the change, in which case its delta-updated summary is served.
+    `compute` returns (summary, holdings_version it was computed from).
+    """
+
+    def __init__(self, compute, version, max_age=SUMMARY_MAX_AGE, incremental=None):
+        self._compute = compute
+        self._version = version
+        self._incremental = incremental
+        self.max_age = max_age
+        self._summary = None
+        self._summary_version = None
+        self._computed_at = 0.0
+        self._refresh_task = None
+        self._lock = asyncio.Lock()
+
+    def put(self, summary, version):
+        self._summary = summary
+        self._summary_version = version
+        self._computed_at = time.monotonic()
+        # Holdings edited during the compute: the incremental model may already have
+        # applied that edit, so only seed it from a summary that is still current
+        if self._incremental is not None and version == self._version():
+            self._incremental.reset(summary, version)
+
+    def invalidate(self):
+        """Force a recompute on the next read (e.g. sector metadata changed; holdings did not)."""
+        self._summary_version = None
+        if self._incremental is not None:
+            self._incremental.invalidate()
+
+    def _sync_incremental(self):
+        """Adopt the incremental model's summary if it tracked the latest holdings change."""
+        if self._incremental is None or self._summary is None:
+            return
+        version = self._version()
+        if self._summary_version != version:
+            summary = self._incremental.summary_for(version)
+            if summary is not None:
+                self._summary = summary
+                self._summary_version = version
+
+    def _is_current(self):
+        return (self._summary is not None and self._summary_version == self._version()
+                and time.monotonic() - self._computed_at <= self.max_age)
+
+    async def refresh(self, force=True):
+        async with self._lock:
+            # Concurrent callers queue on the lock; only the first one recomputes
+            if not force and self._is_current():
+                return self._summary
+            summary, version = await self._compute()
+            self.put(summary, version)
+            return summary
+
+    async def get(self, fresh=False, allow_stale=True):
+        if fresh:
+            return await self.refresh()
+        self._sync_incremental()
+        if self._summary is None or self._summary_version != self._version():
+            return await self.refresh(force=False)
+        if time.monotonic() - self._computed_at > self.max_age:
+            if not allow_stale:
+                return await self.refresh(force=False)
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self.refresh(force=False))
+        return self._summary
+
+
+class SnapshotScheduler:
+    """
+    In-process scheduler: after each configured market close, values the portfolio,
+    stores the result in the SummaryCache and persists a snapshot.
+    """
+
+    def __init__(self, schedule, run_snapshot):
+        self.schedule = schedule
+        self._run_snapshot = run_snapshot
+        self._task = None
+
+    def start(self):
+        if self.schedule and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            print(f"Snapshot scheduler: {', '.join(f'{m} {h:02d}:{mi:02d}' for m, (h, mi) in self.schedule.items())}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        runs = {m: next_run(m, h, mi) for m, (h, mi) in self.schedule.items()}
+        while True:
+            market, run_at = min(runs.items(), key=lambda item: item[1])
+            delay = (run_at - datetime.now(run_at.tzinfo)).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(min(delay, MAX_SLEEP))
+                continue
+            try:
+                await self._run_snapshot(market, run_at.date())
+            except Exception as e:
+                print(f"Scheduled snapshot for {market} failed: {e}")
+            hour, minute = self.schedule[market]
+            runs[market] = next_run(market, hour, minute, run_at)
@@ -0,0 +1,45 @@
+import time
+
+# Boot timing, measured from the first import of this module (the first import in main.py)
+_started = time.perf_counter()
+_last = _started
+# (phase, seconds) in boot order, e.g. ("imports", 0.61), ("holdings", 0.004)
+PHASES = []
+# Work moved off the boot path, recorded once it has run: name -> seconds
+DEFERRED = {}
+_first_response = None
+
+
+def mark(name):
+    """Close the boot phase ending now: mark("imports") after the import block, and so on."""
+    global _last
+    now = time.perf_counter()
+    PHASES.append((name, now - _last))
+    _last = now
+
+
+def deferred(name, seconds):
+    DEFERRED[name] = seconds
+
+
+def first_response():
+    """Called for every response; only the first one is recorded (time-to-first-response)."""
+    global _first_response
+    if _first_response is None:
+        _first_response = time.perf_counter() - _started
+
+
+def timings():
+    return {
+        "phases": {name: seconds for name, seconds in PHASES},
+        "boot_seconds": _last - _started,
+        "first_response_seconds": _first_response,
+        "deferred": dict(DEFERRED),
+    }
+
+
+def report():
+    lines = ["Startup timing:"]
+    lines += [f"  {name:<16} {seconds * 1000:8.1f} ms" for name, seconds in PHASES]
+    lines.append(f"  {'total':<16} {(_last - _started) * 1000:8.1f} ms")
+    return "\n".join(lines)
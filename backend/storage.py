@@ -0,0 +1,496 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from .history import encode_holdings, decode_holdings
+from .metrics import STORAGE_WRITE_BYTES, STORAGE_WRITE_SECONDS
+from . import startup
+
+# Seconds a JSON write waits for further mutations before the file is rewritten
+WRITE_DEBOUNCE = float(os.environ.get("PORTFOLIO_WRITE_DEBOUNCE", "0.5"))
+# ...but never longer than this after the first unwritten change, however steady the edits
+WRITE_MAX_DELAY = float(os.environ.get("PORTFOLIO_WRITE_MAX_DELAY", "5"))
+# Data whose changes are counted by storage.versions() (HTTP validators)
+VERSIONED = ("holdings", "snapshots")
+
+
+def write_atomic(path, text):
+    """Write to a temp file, fsync and rename over `path`: readers see the old or the new file, never half of one."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class JsonFileMap:
+    """
+    {key: dict} held in memory and persisted to one JSON file (caches such as
+    last-known-good quotes and symbol metadata). Changes are written by a
+    debounced atomic rewrite on a timer thread; flush() writes immediately.
+    """
+
+    def __init__(self, path, debounce=WRITE_DEBOUNCE):
+        self.path = str(path)
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+        self._items = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self._items = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable cache file {self.path}: {e}")
+
+    def __len__(self):
+        return len(self._items)
+
+    def _mark_dirty(self):
+        """Call with self._lock held after changing self._items."""
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            text = json.dumps(self._items, separators=(",", ":"), default=str)
+            self._dirty = False
+        write_atomic(self.path, text)
+
+
+class JsonStorage:
+    """
+    Original storage: the whole data dict in one JSON file.
+    Writes are write-behind: a mutation only marks the data dirty, and a background
+    writer rewrites the file once mutations have paused for `debounce` seconds,
+    so a burst of edits costs one atomic rewrite off the request thread. A change
+    is written at most `max_delay` seconds after it was made, even if edits never pause.
+    flush() (called on shutdown and at exit) writes any pending change immediately.
+    """
+
+    def __init__(self, path, debounce=WRITE_DEBOUNCE, max_delay=WRITE_MAX_DELAY):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._data = None
+        self._pending = None
+        self._pending_since = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._timer = None
+        # Single process, so in-memory counters; the start time keeps a restart from repeating them
+        self._versions = {name: (0, time.time()) for name in VERSIONED}
+        atexit.register(self.flush)
+
+    @property
+    def location(self):
+        return self.path
+
+    def exists(self):
+        return self._pending is not None or os.path.exists(self.path)
+
+    def load(self, snapshots=True):
+        # One JSON document: holdings can't be read without parsing the history too.
+        # Single process, so once loaded the in-memory copy is current (writes may be pending).
+        if self._data is None:
+            with open(self.path, "r") as f:
+                self._data = json.load(f)
+        return self._data
+
+    def data_version(self):
+        return 0  # single process only: nothing else writes the file
+
+    def versions(self):
+        return dict(self._versions)
+
+    def _changed(self, *names):
+        now = time.time()
+        for name in names:
+            self._versions[name] = (self._versions[name][0] + 1, now)
+
+    def load_snapshots(self, holdings=True):
+        return (self._data if self._data is not None else self.load()).get("snapshots", [])
+
+    def save_all(self, data):
+        self._changed(*VERSIONED)
+        self._write_behind(data)
+
+    def _write_behind(self, data):
+        self._data = data
+        # Shallow copy of the top-level lists so later appends/removals don't race the writer
+        pending = {k: list(v) if isinstance(v, list) else v for k, v in data.items()}
+        with self._lock:
+            now = time.monotonic()
+            if self._pending is None:
+                self._pending_since = now
+            self._pending = pending
+            if self._timer is not None:
+                self._timer.cancel()
+            delay = min(self.debounce, max(self._pending_since + self.max_delay - now, 0.0))
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if pending is not None:
+                start = time.perf_counter()
+                text = json.dumps(pending, default=str, indent=4)
+                write_atomic(self.path, text)
+                STORAGE_WRITE_SECONDS.observe(time.perf_counter() - start, backend="json", operation="flush")
+                STORAGE_WRITE_BYTES.inc(len(text), backend="json")
+
+    def _save(self, changed):
+        self._changed(changed)
+        self._write_behind(self._data)
+
+    def upsert_holding(self, holding):
+        self._save("holdings")
+
+    def delete_holding(self, holding_id):
+        self._save("holdings")
+
+    def replace_holdings(self, holdings):
+        self._save("holdings")
+
+    def add_snapshot(self, snapshot):
+        self._save("snapshots")
+
+    def add_snapshots(self, snapshots):
+        self._save("snapshots")
+
+    def delete_snapshot(self, snapshot_id):
+        self._save("snapshots")
+
+    def begin_import(self, history):
+        return JsonImport(self, history)
+
+
+class JsonImport:
+    """
+    Bulk replacement for JsonStorage (see SqliteImport). The whole document lives in
+    memory with this backend anyway, so rows simply collect until commit().
+    """
+
+    def __init__(self, storage, history):
+        self.storage = storage
+        self.history = history
+        self.rows = {"holdings": [], "snapshots": []}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.rows = None
+
+    @property
+    def counts(self):
+        return {name: len(rows) for name, rows in self.rows.items()}
+
+    def add(self, name, rows):
+        self.rows[name].extend(rows)
+
+    def commit(self):
+        current = self.storage.load()
+        data = {"holdings": self.rows["holdings"],
+                "snapshots": self.rows["snapshots"] if self.history else current.get("snapshots", [])}
+        self.storage.save_all(data)
+
+
+class SqliteImport:
+    """
+    Bulk replacement for SqliteStorage: rows are written batch by batch into TEMP
+    tables of the storage connection as they arrive, and commit() swaps them into
+    the main tables in one transaction (holdings, plus snapshots when `history`).
+    Memory stays at one batch whatever the size of the import; readers and other
+    workers see the old data until the swap. One import at a time per storage.
+    """
+
+    def __init__(self, storage, history):
+        self.storage = storage
+        self.history = history
+        self.counts = {"holdings": 0, "snapshots": 0}
+
+    def __enter__(self):
+        self.storage._import_lock.acquire()
+        try:
+            with self.storage._lock, self.storage._conn as conn:
+                for name in VERSIONED:
+                    conn.execute(f"DROP TABLE IF EXISTS temp.import_{name}")
+                    conn.execute(f"CREATE TEMP TABLE import_{name} AS SELECT * FROM main.{name} WHERE 0")
+        except BaseException:
+            self.storage._import_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            with self.storage._lock, self.storage._conn as conn:
+                for name in VERSIONED:
+                    conn.execute(f"DROP TABLE IF EXISTS temp.import_{name}")
+        finally:
+            self.storage._import_lock.release()
+
+    def add(self, name, rows):
+        if name == "holdings":
+            values = [self.storage._holding_row(h) for h in rows]
+            sql = "INSERT INTO temp.import_holdings VALUES (?, ?, ?, ?)"
+        else:
+            values = [self.storage._snapshot_row(s) for s in rows]
+            sql = "INSERT INTO temp.import_snapshots VALUES (?, ?, ?, ?, ?)"
+        with self.storage._lock, self.storage._conn as conn:
+            conn.executemany(sql, values)
+        self.counts[name] += len(rows)
+
+    def commit(self):
+        names = VERSIONED if self.history else ("holdings",)
+        with self.storage._write("import", *names):
+            for name in names:
+                self.storage._conn.execute(f"DELETE FROM main.{name}")
+                self.storage._conn.execute(f"INSERT OR REPLACE INTO main.{name} SELECT * FROM temp.import_{name}")
+        self.storage._existed = True
+
+
+class SqliteStorage:
+    """
+    Holdings and snapshots in indexed SQLite tables (WAL mode).
+    Each mutation is a single-row upsert/delete in its own transaction,
+    so editing one holding no longer rewrites the whole history.
+    Snapshot holdings are stored columnar + zlib-compressed (see history.encode_holdings).
+    """
+
+    # PRAGMA user_version; bump with a step in _migrate()
+    SCHEMA_VERSION = 1
+    # Snapshot rows converted per transaction by the background migration
+    MIGRATE_BATCH = 200
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS holdings (
+            id TEXT PRIMARY KEY,
+            ticker TEXT,
+            market TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_holdings_ticker ON holdings (market, ticker);
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id TEXT PRIMARY KEY,
+            date TEXT,
+            total_net_worth_hkd REAL,
+            data TEXT NOT NULL,
+            holdings BLOB
+        );
+        CREATE INDEX IF NOT EXISTS idx_snapshots_date ON snapshots (date);
+        CREATE TABLE IF NOT EXISTS versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            modified REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._existed = os.path.exists(path)
+        self._lock = threading.Lock()
+        self._import_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO versions VALUES (?, 0, ?)",
+                                   [(name, time.time()) for name in VERSIONED])
+        self.migration = None
+        self._migrate()
+
+    def _migrate(self):
+        """
+        Cheap schema changes run here; row rewrites run on a background thread in small
+        transactions, so startup doesn't wait on them. Reads handle unconverted rows, and
+        an interrupted migration resumes on the next start.
+        """
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        if not self._existed:
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            return
+        if version < 1:
+            # v0 kept holdings_snapshot inline in the JSON `data` column
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(snapshots)")]
+            if "holdings" not in columns:
+                with self._conn:
+                    self._conn.execute("ALTER TABLE snapshots ADD COLUMN holdings BLOB")
+        self.migration = threading.Thread(target=self._migrate_rows, name="sqlite-migration", daemon=True)
+        self.migration.start()
+
+    def _migrate_rows(self):
+        start = time.perf_counter()
+        converted = 0
+        while True:
+            with self._write("migrate"):
+                rows = self._conn.execute("SELECT rowid, data FROM snapshots WHERE holdings IS NULL LIMIT ?",
+                                          (self.MIGRATE_BATCH,)).fetchall()
+                for rowid, data in rows:
+                    snapshot = json.loads(data)
+                    self._conn.execute("UPDATE snapshots SET data = ?, holdings = ? WHERE rowid = ?",
+                                       self._snapshot_row(snapshot)[3:] + (rowid,))
+                if len(rows) < self.MIGRATE_BATCH:
+                    self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            converted += len(rows)
+            if len(rows) < self.MIGRATE_BATCH:
+                break
+        elapsed = time.perf_counter() - start
+        startup.deferred("sqlite_migration", elapsed)
+        print(f"Storage migration to schema v{self.SCHEMA_VERSION}: {converted} snapshots in {elapsed:.2f}s")
+
+    @property
+    def location(self):
+        return self.path
+
+    def exists(self):
+        return self._existed
+
+    def data_version(self):
+        """Changes whenever another connection (e.g. another worker process) commits."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def versions(self):
+        """{"holdings" | "snapshots": (version, modified)}, shared by every process using the file."""
+        with self._lock:
+            return {name: (version, modified)
+                    for name, version, modified in self._conn.execute("SELECT name, version, modified FROM versions")}
+
+    @contextmanager
+    def _write(self, operation, *changed):
+        """
+        Locked transaction, timed into portfolio_storage_write_seconds. The `changed`
+        version rows ("holdings", "snapshots") are bumped in the same transaction.
+        """
+        start = time.perf_counter()
+        with self._lock, self._conn:
+            yield
+            if changed:
+                self._conn.execute(f"UPDATE versions SET version = version + 1, modified = ? "
+                                   f"WHERE name IN ({', '.join('?' * len(changed))})", (time.time(), *changed))
+        STORAGE_WRITE_SECONDS.observe(time.perf_counter() - start, backend="sqlite", operation=operation)
+
+    def load(self, snapshots=True):
+        """Holdings, plus the snapshot history unless snapshots=False (see load_snapshots)."""
+        with self._lock:
+            holdings = [json.loads(row[0]) for row in self._conn.execute("SELECT data FROM holdings ORDER BY rowid")]
+        data = {"holdings": holdings}
+        if snapshots:
+            data["snapshots"] = self.load_snapshots()
+        return data
+
+    def load_snapshots(self, holdings=True):
+        """holdings=False skips decoding holdings_snapshot (net-worth-only reads)."""
+        columns = "data, holdings" if holdings else "data, NULL"
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {columns} FROM snapshots ORDER BY rowid").fetchall()
+        return [self._snapshot_from_row(data, blob) for data, blob in rows]
+
+    def save_all(self, data):
+        with self._write("save_all", "holdings", "snapshots"):
+            self._conn.execute("DELETE FROM holdings")
+            self._conn.execute("DELETE FROM snapshots")
+            self._conn.executemany("INSERT OR REPLACE INTO holdings VALUES (?, ?, ?, ?)",
+                                   [self._holding_row(h) for h in data.get("holdings", [])])
+            self._conn.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                                   [self._snapshot_row(s) for s in data.get("snapshots", [])])
+        self._existed = True
+
+    def upsert_holding(self, holding):
+        with self._write("upsert_holding", "holdings"):
+            self._conn.execute(
+                "INSERT INTO holdings VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET ticker=excluded.ticker, market=excluded.market, data=excluded.data",
+                self._holding_row(holding))
+
+    def delete_holding(self, holding_id):
+        with self._write("delete_holding", "holdings"):
+            self._conn.execute("DELETE FROM holdings WHERE id = ?", (holding_id,))
+
+    def replace_holdings(self, holdings):
+        with self._write("replace_holdings", "holdings"):
+            self._conn.execute("DELETE FROM holdings")
+            self._conn.executemany("INSERT OR REPLACE INTO holdings VALUES (?, ?, ?, ?)",
+                                   [self._holding_row(h) for h in holdings])
+
+    def add_snapshot(self, snapshot):
+        with self._write("add_snapshot", "snapshots"):
+            self._conn.execute("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)", self._snapshot_row(snapshot))
+
+    def add_snapshots(self, snapshots):
+        with self._write("add_snapshots", "snapshots"):
+            self._conn.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                                   [self._snapshot_row(s) for s in snapshots])
+
+    def flush(self):
+        pass  # every operation is committed immediately
+
+    def begin_import(self, history):
+        """Staged bulk replacement of holdings (and snapshots when `history`), see SqliteImport."""
+        return SqliteImport(self, history)
+
+    def delete_snapshot(self, snapshot_id):
+        with self._write("delete_snapshot", "snapshots"):
+            self._conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+
+    @staticmethod
+    def _holding_row(holding):
+        data = json.dumps(holding, default=str)
+        STORAGE_WRITE_BYTES.inc(len(data), backend="sqlite")
+        return (holding.get("id"), holding.get("ticker"), holding.get("market"), data)
+
+    @staticmethod
+    def _snapshot_row(snapshot):
+        # Keep a None placeholder so key order survives the round trip
+        meta = {k: (None if k == "holdings_snapshot" else v) for k, v in snapshot.items()}
+        data = json.dumps(meta, default=str)
+        holdings = encode_holdings(snapshot.get("holdings_snapshot") or [])
+        STORAGE_WRITE_BYTES.inc(len(data) + len(holdings), backend="sqlite")
+        return (snapshot.get("id"), str(snapshot.get("date")), snapshot.get("total_net_worth_hkd"), data, holdings)
+
+    @staticmethod
+    def _snapshot_from_row(data, holdings):
+        snapshot = json.loads(data)
+        if holdings is not None:  # None: v0 row with inline holdings, not migrated yet
+            snapshot["holdings_snapshot"] = decode_holdings(holdings)
+        return snapshot
+
+
+def create_storage(kind, json_path, sqlite_path):
+    """
+    kind: "sqlite" (default) or "json".
+    On first use of SQLite, an existing JSON data file is migrated once and
+    renamed to *.migrated.json so it is kept as a backup.
+    """
+    if kind == "json":
+        return JsonStorage(json_path)
+
+    storage = SqliteStorage(sqlite_path)
+    if not storage.exists() and os.path.exists(json_path):
+        print(f"Migrating {json_path} -> {sqlite_path}")
+        storage.save_all(JsonStorage(json_path).load())
+        os.replace(json_path, os.path.splitext(json_path)[0] + ".migrated.json")
+    return storage
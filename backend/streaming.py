@@ -0,0 +1,76 @@
+import asyncio
+import os
+from fastapi.encoders import jsonable_encoder
+
+# Seconds between upstream refreshes while at least one client is connected
+STREAM_INTERVAL = float(os.environ.get("PORTFOLIO_STREAM_INTERVAL", "1.0"))
+
+SUMMARY_FIELDS = ("total_net_worth_hkd", "market_distribution", "sector_distribution", "ticker_distribution",
+                  "stale_tickers")
+
+
+def diff_summary(previous, current):
+    """
+    Holdings whose price/value changed (or are new) plus ids that disappeared.
+    Returns None when nothing visible changed.
+    """
+    previous_rows = {h.get("id"): h for h in previous.holdings} if previous else {}
+    changed = [h for h in current.holdings if previous_rows.get(h.get("id")) != h]
+    current_ids = {h.get("id") for h in current.holdings}
+    removed = [i for i in previous_rows if i not in current_ids]
+    totals_changed = previous is None or any(getattr(previous, f) != getattr(current, f) for f in SUMMARY_FIELDS)
+    if not changed and not removed and not totals_changed:
+        return None
+    message = {"type": "update", "holdings": changed, "removed": removed}
+    message.update({f: getattr(current, f) for f in SUMMARY_FIELDS})
+    return message
+
+
+class SummaryStreamer:
+    """
+    Server push for /ws/summary. One refresher loop (started with the first client,
+    stopped with the last) re-values the portfolio every STREAM_INTERVAL seconds and
+    broadcasts only what changed, so upstream load does not grow with client count.
+    """
+
+    def __init__(self, compute, interval=STREAM_INTERVAL):
+        self._compute = compute  # async () -> current PortfolioSummary
+        self.interval = interval
+        self.clients = set()
+        self._last = None
+        self._task = None
+
+    async def connect(self, websocket, summary):
+        await websocket.accept()
+        await websocket.send_json(jsonable_encoder({"type": "summary", **summary.dict()}))
+        self.clients.add(websocket)
+        if self._task is None or self._task.done():
+            self._last = summary
+            self._task = asyncio.create_task(self._loop())
+
+    async def disconnect(self, websocket):
+        self.clients.discard(websocket)
+        if not self.clients and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _broadcast(self, message):
+        payload = jsonable_encoder(message)
+        clients = list(self.clients)
+        results = await asyncio.gather(*(ws.send_json(payload) for ws in clients), return_exceptions=True)
+        for ws, result in zip(clients, results):
+            if isinstance(result, Exception):
+                self.clients.discard(ws)
+
+    async def _loop(self):
+        while self.clients:
+            await asyncio.sleep(self.interval)
+            try:
+                summary = await self._compute()
+            except Exception as e:
+                print(f"Summary stream refresh failed: {e}")
+                continue
+            message = diff_summary(self._last, summary)
+            self._last = summary
+            if message:
+                await self._broadcast(message)
@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+import time
+from .storage import JsonFileMap
+
+# Entries older than this are refreshed from the next quote response that includes the symbol
+METADATA_TTL = 30 * 24 * 60 * 60
+FIELDS = ("name", "english_name", "exchange", "lot_size", "sector")
+# Board lot by symbol prefix where it is fixed; HK lots vary per stock (load them from a reference file)
+DEFAULT_LOT_SIZES = {"sh": 100, "sz": 100, "us": 1}
+EXCHANGES = {"sh": "SSE", "sz": "SZSE", "hk": "HKEX", "us": "US"}
+
+
+def lot_size(value):
+    """A board lot as a positive whole number ("100", 100.0); ValueError otherwise."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not number.is_integer() or number <= 0:
+        raise ValueError(f"lot_size must be a positive whole number, got {value!r}")
+    return int(number)
+
+
+class SymbolMetadataStore(JsonFileMap):
+    """
+    Persistent per-symbol metadata keyed by Tencent symbol (sh600519, hk00700, usAAPL):
+    name, english_name, exchange, lot_size, sector. Filled lazily from quote responses
+    the app already fetches, and in bulk from reference files. Reference values
+    (and sectors) are never overwritten by quote data.
+    """
+
+    def __init__(self, path, ttl=METADATA_TTL, clock=time.time):
+        super().__init__(path)
+        self.ttl = ttl
+        self._clock = clock
+
+    def get(self, symbol):
+        return self._items.get(symbol)
+
+    def is_fresh(self, symbol):
+        entry = self._items.get(symbol)
+        return entry is not None and self._clock() - entry.get("updated_at", 0) <= self.ttl
+
+    def update(self, symbol, fields, overwrite=True):
+        """
+        Merge `fields` into the symbol's entry; with overwrite=False existing values win.
+        Raises ValueError (nothing changed) for an invalid lot_size.
+        """
+        fields = {k: v for k, v in fields.items() if k in FIELDS and v not in (None, "")}
+        if "lot_size" in fields:
+            fields["lot_size"] = lot_size(fields["lot_size"])
+        with self._lock:
+            entry = dict(self._items.get(symbol) or {})
+            for key, value in fields.items():
+                if overwrite or entry.get(key) in (None, ""):
+                    entry[key] = value
+            entry.setdefault("exchange", EXCHANGES.get(symbol[:2]))
+            if symbol[:2] in DEFAULT_LOT_SIZES:
+                entry.setdefault("lot_size", DEFAULT_LOT_SIZES[symbol[:2]])
+            entry["updated_at"] = self._clock()
+            self._items[symbol] = entry
+            self._mark_dirty()
+        return entry
+
+    def record_quotes(self, quotes):
+        """Pick up names from a live quote batch (FX symbols and fresh entries are skipped)."""
+        for symbol, quote in quotes.items():
+            if symbol.startswith("fx_") or not quote.get("name") or self.is_fresh(symbol):
+                continue
+            # Names from a reference file win; quote-derived names are replaced after the TTL
+            reference = (self.get(symbol) or {}).get("reference", False)
+            self.update(symbol, {"name": quote["name"], "english_name": quote.get("english_name")},
+                        overwrite=not reference)
+
+    def load_reference(self, text):
+        """
+        Bulk load a CSV (header: symbol,name,english_name,exchange,lot_size,sector) or a JSON
+        object {symbol: {fields}}. Reference entries win over quote-derived names.
+        Every row is checked before any is stored: a bad one raises ValueError naming it.
+        Returns the number of symbols loaded.
+        """
+        text = text.strip()
+        if text.startswith("{"):
+            rows = [(symbol, fields, symbol) for symbol, fields in json.loads(text).items()]
+        else:
+            rows = []
+            # Header is line 1, so the first data row is line 2
+            for number, r in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+                symbol = (r.get("symbol") or "").strip()
+                rows.append((symbol, r, f"line {number} ({symbol})"))
+        rows = [row for row in rows if row[0]]
+        for symbol, fields, where in rows:
+            if not isinstance(fields, dict):
+                raise ValueError(f"{where}: expected an object of fields")
+            if fields.get("lot_size") not in (None, ""):
+                try:
+                    lot_size(fields["lot_size"])
+                except ValueError as e:
+                    raise ValueError(f"{where}: {e}") from None
+        count = 0
+        for symbol, fields, _ in rows:
+            self.update(symbol, fields)
+            with self._lock:
+                self._items[symbol]["reference"] = True
+            count += 1
+        if not count:
+            raise ValueError("No symbols found (expected a `symbol` column or a JSON object keyed by symbol)")
+        return count
@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+from typing import List
+from pydantic import TypeAdapter, ValidationError
+from .models import Holding, PortfolioSnapshot
+
+FORMATS = ("ndjson", "csv")
+# Rows validated per TypeAdapter call on import / serialized per chunk on export
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_ROWS = 500
+# Only the first N row errors are listed in the report (the count is always exact)
+MAX_REPORTED_ERRORS = 1000
+
+HOLDING_FIELDS = list(Holding.model_fields)
+_HOLDINGS = TypeAdapter(List[Holding])
+_SNAPSHOTS = TypeAdapter(List[PortfolioSnapshot])
+
+
+def _json_line(record):
+    return json.dumps(record, default=str, separators=(",", ":")) + "\n"
+
+
+def export_ndjson(data):
+    """
+    Yield NDJSON chunks: one {"type": "holding", ...} line per holding, then one
+    {"type": "snapshot", ...} line per snapshot.
+    """
+    rows = [{"type": "holding", **h} for h in data.get("holdings", [])]
+    for i in range(0, len(rows), EXPORT_CHUNK_ROWS):
+        yield "".join(_json_line(r) for r in rows[i:i + EXPORT_CHUNK_ROWS])
+    snapshots = data.get("snapshots", [])
+    for i in range(0, len(snapshots), EXPORT_CHUNK_ROWS):
+        yield "".join(_json_line({"type": "snapshot", **s}) for s in snapshots[i:i + EXPORT_CHUNK_ROWS])
+
+
+def export_csv(data):
+    """Yield CSV chunks of current holdings (snapshots do not fit a flat table; use NDJSON)."""
+    holdings = data.get("holdings", [])
+    for i in range(0, max(len(holdings), 1), EXPORT_CHUNK_ROWS):
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=HOLDING_FIELDS, extrasaction="ignore")
+        if i == 0:
+            writer.writeheader()
+        writer.writerows(holdings[i:i + EXPORT_CHUNK_ROWS])
+        yield buf.getvalue()
+
+
+class ImportReport:
+    """Counts of valid rows plus the first per-row errors ({"line", "errors": [{"field", "message"}]})."""
+
+    def __init__(self):
+        self.counts = {"holdings": 0, "snapshots": 0}
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "imported": dict(self.counts),
+            "error_count": self.error_count,
+            "errors": sorted(self.errors, key=lambda e: e["line"]),
+        }
+
+
+def _validate_batch(adapter, batch, report):
+    """
+    Validate a batch of (line, record) with one TypeAdapter call and return the valid
+    rows as dicts. Rows named in the ValidationError are reported and dropped; the
+    rest are re-validated as a batch.
+    """
+    if not batch:
+        return []
+    records = [r for _, r in batch]
+    try:
+        models = adapter.validate_python(records)
+    except ValidationError as e:
+        bad = {}
+        for err in e.errors():
+            index, *field = err["loc"]
+            bad.setdefault(index, []).append({"field": ".".join(str(f) for f in field), "message": err["msg"]})
+        for index, errors in sorted(bad.items()):
+            report.add_error(batch[index][0], errors)
+        batch = [item for i, item in enumerate(batch) if i not in bad]
+        models = adapter.validate_python([r for _, r in batch])
+    return [m.dict() for m in models]
+
+
+def _ndjson_records(lines, report):
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            report.add_error(number, [{"field": "", "message": f"Invalid JSON: {e}"}])
+            continue
+        if not isinstance(record, dict):
+            report.add_error(number, [{"field": "", "message": "Expected a JSON object"}])
+            continue
+        kind = record.pop("type", None) or ("snapshot" if "holdings_snapshot" in record else "holding")
+        yield number, kind, record
+
+
+def _csv_records(lines):
+    # Header is line 1, so the first data row is line 2
+    for number, row in enumerate(csv.DictReader(lines), start=2):
+        yield number, "holding", {k: (v if v != "" else None) for k, v in row.items() if k}
+
+
+def parse_import(stream, fmt, report):
+    """
+    Incrementally parse and validate an NDJSON or CSV import from a text stream,
+    yielding ("holdings" | "snapshots", rows) batches of validated rows (see
+    DataManager.import_batches). Only one batch per record type is held at a time;
+    `report` keeps just the row counts and the first MAX_REPORTED_ERRORS errors.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    records = _ndjson_records(stream, report) if fmt == "ndjson" else _csv_records(stream)
+    targets = {"holding": ("holdings", _HOLDINGS), "snapshot": ("snapshots", _SNAPSHOTS)}
+    batches = {"holding": [], "snapshot": []}
+
+    def validated(kind):
+        name, adapter = targets[kind]
+        rows = _validate_batch(adapter, batches[kind], report)
+        batches[kind] = []
+        report.counts[name] += len(rows)
+        return name, rows
+
+    for number, kind, record in records:
+        if kind not in batches:
+            report.add_error(number, [{"field": "type", "message": f"Unknown record type: {kind}"}])
+            continue
+        batches[kind].append((number, record))
+        if len(batches[kind]) >= IMPORT_BATCH_SIZE:
+            yield validated(kind)
+    for kind in list(batches):
+        if batches[kind]:
+            yield validated(kind)
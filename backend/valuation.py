@@ -0,0 +1,332 @@
+import threading
+import numpy as np
+from .models import Holding, PortfolioSummary
+from .market_data import QuoteContext
+from .options import EXPOSURE_MODE, OPTION_MULTIPLIER, price_options
+
+GREEK_FIELDS = ("delta", "gamma", "vega", "theta", "volatility")
+
+
+def _group_sum(keys, values, dist=None):
+    """
+    Group-by sum of `values` by `keys` into `dist` (insertion order = first appearance).
+    Uses np.add.at, which accumulates in row order, so results match a sequential loop exactly.
+    """
+    import pandas as pd  # deferred: ~0.25s of import time, not needed to boot
+
+    dist = {} if dist is None else dist
+    if len(keys) == 0:
+        return dist
+    codes, uniques = pd.factorize(np.asarray(keys, dtype=object), sort=False)
+    sums = np.zeros(len(uniques))
+    np.add.at(sums, codes, values)
+    for key, total in zip(uniques, sums.tolist()):
+        dist[key] = dist.get(key, 0) + total
+    return dist
+
+
+def value_portfolio(holdings, quotes, market_data, as_of=None):
+    """
+    Vectorized valuation of all holdings against a fetched QuoteContext.
+    Holdings are loaded into columnar arrays, joined against per-symbol price and
+    per-currency FX vectors, and the distributions are built with group-by reductions.
+    Returns the same PortfolioSummary as the original per-row loop.
+    `as_of` values options at a past date (snapshot backfill); defaults to today.
+    """
+    import pandas as pd  # deferred, see _group_sum
+
+    rows = [h.dict() for h in holdings if h.asset_type in ("Cash", "Stock", "Option")]
+    market_dist = {"US": 0, "HK": 0, "CN": 0, "Cash": 0}
+    if not rows:
+        return PortfolioSummary(total_net_worth_hkd=0.0, holdings=[], market_distribution=market_dist,
+                                sector_distribution={}, ticker_distribution={})
+
+    df = pd.DataFrame.from_records(rows, columns=list(rows[0].keys()))
+    asset_type = df["asset_type"].to_numpy(dtype=object)
+    market = df["market"].to_numpy(dtype=object)
+    is_cash = asset_type == "Cash"
+    is_stock = asset_type == "Stock"
+    is_option = asset_type == "Option"
+    quantity = df["quantity"].to_numpy(dtype=float)
+    cost_basis = df["cost_basis"].to_numpy(dtype=float)
+    strike = pd.to_numeric(df["strike_price"]).fillna(0.0).to_numpy(dtype=float)
+
+    # FX: one lookup per distinct currency, broadcast back to rows
+    currency = df["market"].map(market_data.get_currency)
+    fx_by_currency = {c: quotes.fx_rate(c) for c in currency.unique()}
+    fx = currency.map(fx_by_currency).to_numpy(dtype=float)
+
+    # Price vector: one lookup per distinct stock symbol / option contract
+    price = np.ones(len(df))
+    stock_idx = np.flatnonzero(is_stock)
+    if len(stock_idx):
+        keys = df.loc[stock_idx, ["ticker", "market"]]
+        codes, uniques = pd.factorize(pd.MultiIndex.from_frame(keys), sort=False)
+        price[stock_idx] = np.array([quotes.price(t, m) for t, m in uniques], dtype=float)[codes]
+    # Options: every contract priced in one vectorized call (Black-Scholes / binomial, see options.py)
+    option_idx = np.flatnonzero(is_option)
+    greeks = {}
+    if len(option_idx):
+        opts = [rows[i] for i in option_idx]
+        priced = price_options(
+            spot=[quotes.price(r["ticker"], r["market"]) for r in opts],
+            strike=[r["strike_price"] for r in opts],
+            expiry=[r["expiry_date"] for r in opts],
+            option_type=[r["option_type"] for r in opts],
+            market=[r["market"] for r in opts],
+            currency=[market_data.get_currency(r["market"]) for r in opts],
+            implied_vol=[r.get("implied_vol") for r in opts],
+            history_vol=[quotes.realized_volatility(r["ticker"], r["market"]) for r in opts],
+            today=as_of,
+        )
+        price[option_idx] = priced["price"]
+        spot = np.zeros(len(df))
+        delta = np.zeros(len(df))
+        spot[option_idx] = [quotes.price(r["ticker"], r["market"]) for r in opts]
+        delta[option_idx] = priced["delta"]
+        greeks = {i: {f: float(priced[f][k]) for f in GREEK_FIELDS} for k, i in enumerate(option_idx)}
+
+    # Values (operation order mirrors the original formulas so floats match exactly)
+    abs_quantity = np.abs(quantity)
+    market_value = np.where(is_cash, quantity * fx,
+                   np.where(is_option, quantity * price * OPTION_MULTIPLIER * fx, quantity * price * fx))
+    cost_value = np.where(is_option, cost_basis * abs_quantity * OPTION_MULTIPLIER * fx, cost_basis * quantity * fx)
+    is_sell_put = is_option & (df["option_type"].to_numpy(dtype=object) == "Put") & (quantity < 0)
+    if EXPOSURE_MODE == "delta" and len(option_idx):
+        # Stock-equivalent exposure of the short put
+        exposure = np.where(is_sell_put, abs_quantity * np.abs(delta) * spot * OPTION_MULTIPLIER * fx, 0.0)
+    else:
+        exposure = np.where(is_sell_put, abs_quantity * strike * OPTION_MULTIPLIER * fx, 0.0)
+
+    # Names and sectors (per distinct symbol)
+    company_name = df["company_name"].to_numpy(dtype=object).copy()
+    for i in stock_idx:
+        if not company_name[i]:
+            company_name[i] = quotes.company_name(rows[i]["ticker"], market[i])
+    underlying_sector = {}
+    for i in np.flatnonzero(is_stock | is_option):
+        key = (rows[i]["ticker"], market[i])
+        if key not in underlying_sector:
+            underlying_sector[key] = market_data.get_sector(*key)
+    sector = np.empty(len(df), dtype=object)
+    dist_sector = np.empty(len(df), dtype=object)
+    for i in range(len(df)):
+        if is_cash[i]:
+            sector[i] = dist_sector[i] = "Cash"
+        elif is_stock[i]:
+            custom = rows[i]["custom_sector"]
+            sector[i] = dist_sector[i] = custom if custom else underlying_sector[(rows[i]["ticker"], market[i])]
+        else:
+            sector[i] = "Option"
+            dist_sector[i] = underlying_sector[(rows[i]["ticker"], market[i])]
+
+    # For ticker distribution: company name for CN/HK stocks, ticker code for US stocks and options
+    ticker = df["ticker"].to_numpy(dtype=object)
+    ticker_key = np.where(is_stock & (market != "US"), company_name, ticker)
+    ticker_key = np.where(pd.isna(ticker_key) | (ticker_key == ""), ticker, ticker_key)
+
+    # Distributions: Market Value for stocks/options by market, Exposure (Sell Put) for option sector/ticker
+    total_net_worth_hkd = float(np.cumsum(market_value)[-1])
+    _group_sum(np.where(is_cash, "Cash", market), market_value, market_dist)
+    non_cash = ~is_cash
+    dist_value = np.where(is_option, exposure, market_value)[non_cash]
+    sector_dist = _group_sum(dist_sector[non_cash], dist_value)
+    ticker_dist = _group_sum(ticker_key[non_cash], dist_value)
+
+    # Prices that are not live (last-known-good fallback, or never fetched) are flagged per row
+    price_as_of = {}
+    for i in np.flatnonzero(is_stock | is_option):
+        key = (rows[i]["ticker"], market[i])
+        if key not in price_as_of:
+            price_as_of[key] = quotes.price_as_of(*key)
+
+    summary_holdings = []
+    current_price = price.tolist()
+    market_value = market_value.tolist()
+    cost_value = cost_value.tolist()
+    exposure = exposure.tolist()
+    for i, row in enumerate(rows):
+        item = {**row, "current_price": current_price[i], "market_value_hkd": market_value[i], "cost_value_hkd": cost_value[i]}
+        if is_option[i]:
+            item["exposure_value_hkd"] = exposure[i] if is_sell_put[i] else 0
+            item.update(greeks[i])
+        item["sector"] = sector[i]
+        if is_stock[i]:
+            item["company_name"] = company_name[i]
+        as_of = price_as_of.get((row["ticker"], market[i])) if not is_cash[i] else None
+        if as_of is not None:
+            item["price_stale"] = True
+            item["price_as_of"] = as_of
+        summary_holdings.append(item)
+
+    return PortfolioSummary(
+        total_net_worth_hkd=total_net_worth_hkd,
+        holdings=summary_holdings,
+        market_distribution=market_dist,
+        sector_distribution=sector_dist,
+        ticker_distribution=ticker_dist,
+        stale_tickers=stale_tickers(summary_holdings)
+    )
+
+
+def stale_tickers(rows):
+    """Distinct tickers (in row order) whose price is a last-known-good fallback or missing."""
+    return list(dict.fromkeys(r["ticker"] for r in rows if r and r.get("price_stale")))
+
+
+def holding_contributions(row, market_data):
+    """
+    (distribution, key, value) triples one summary row adds to the distributions,
+    following the same rules as value_portfolio.
+    """
+    asset_type = row.get("asset_type")
+    if asset_type == "Cash":
+        return [("market_distribution", "Cash", row["market_value_hkd"])]
+    if asset_type == "Stock":
+        value = row["market_value_hkd"]
+        ticker_key = row["ticker"] if row["market"] == "US" else (row.get("company_name") or row["ticker"])
+        return [("market_distribution", row["market"], value),
+                ("sector_distribution", row["sector"], value),
+                ("ticker_distribution", ticker_key, value)]
+    if asset_type == "Option":
+        exposure = row.get("exposure_value_hkd", 0)
+        return [("market_distribution", row["market"], row["market_value_hkd"]),
+                ("sector_distribution", market_data.get_sector(row["ticker"], row["market"]), exposure),
+                ("ticker_distribution", row["ticker"], exposure)]
+    return []
+
+
+class QuoteMiss(Exception):
+    """A quote the incremental model needs is not in the quote cache."""
+
+
+class IncrementalValuation:
+    """
+    Keeps the last full PortfolioSummary decomposed into per-holding contributions,
+    and applies DataManager change events by the delta of the changed holding only
+    (one single-holding valuation from cached quotes, never the network).
+    Replacing all holdings, missing an event, or a quote cache miss drops the state
+    so the next read falls back to a full revaluation.
+    """
+
+    def __init__(self, market_data):
+        self.market_data = market_data
+        self.version = None
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._rows = {}  # holding id -> summary row (dict keeps display order)
+        self._total = 0.0
+        self._dists = {}
+        self._key_counts = {}
+
+    def reset(self, summary, version):
+        with self._lock:
+            self._reset_state()
+            self._dists = {
+                "market_distribution": {"US": 0, "HK": 0, "CN": 0, "Cash": 0},
+                "sector_distribution": {},
+                "ticker_distribution": {},
+            }
+            for row in summary.holdings:
+                self._add_row(row)
+            # Start from the exact full-valuation figures rather than the re-accumulated ones
+            self._total = summary.total_net_worth_hkd
+            for name in self._dists:
+                self._dists[name] = dict(getattr(summary, name))
+            self.version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._reset_state()
+            self.version = None
+
+    def summary_for(self, version):
+        """Current summary if the model is in sync with holdings `version`, else None."""
+        with self._lock:
+            if self.version is None or self.version != version:
+                return None
+            rows = list(self._rows.values())
+            return PortfolioSummary(
+                total_net_worth_hkd=self._total,
+                holdings=rows,
+                stale_tickers=stale_tickers(rows),
+                market_distribution=dict(self._dists["market_distribution"]),
+                sector_distribution=dict(self._dists["sector_distribution"]),
+                ticker_distribution=dict(self._dists["ticker_distribution"])
+            )
+
+    def on_holding_change(self, event, old, new, version):
+        """DataManager listener: event is "add" | "update" | "delete" | "replace"."""
+        if self.version is None:
+            return
+        if event == "replace" or self.version != version - 1:
+            self.invalidate()
+            return
+        try:
+            new_row = self._value_one(new) if new is not None else None
+        except QuoteMiss:
+            self.invalidate()
+            return
+        except Exception as e:
+            print(f"Incremental valuation failed, falling back to full revaluation: {e}")
+            self.invalidate()
+            return
+        with self._lock:
+            if self.version != version - 1:
+                self._reset_state()
+                self.version = None
+                return
+            emptied = []
+            if old is not None and old.get("id") in self._rows:
+                emptied = self._remove_row(old["id"], keep_position=new_row is not None and new_row.get("id") == old.get("id"))
+            if new_row is not None:
+                self._add_row(new_row)
+            # Drop distribution keys no holding contributes to any more (after the add,
+            # so an updated holding keeps its key's position)
+            for name, key in emptied:
+                if self._key_counts.get((name, key), 0) <= 0:
+                    self._dists[name].pop(key, None)
+                    self._key_counts.pop((name, key), None)
+            self.version = version
+
+    def _value_one(self, holding_dict):
+        """
+        Summary row of one holding, valued from cached quotes only: this runs on the
+        thread making the edit, so it must not wait on upstream. Raises QuoteMiss when
+        a quote is missing or only a last-known-good fallback.
+        """
+        holding = Holding(**holding_dict)
+        quotes = QuoteContext(self.market_data).plan([holding]).from_cache()
+        for symbol in quotes.symbols:
+            quote = quotes.quotes.get(symbol)
+            if quote is None or quote.get("stale"):
+                raise QuoteMiss(symbol)
+        rows = value_portfolio([holding], quotes, self.market_data).holdings
+        return rows[0] if rows else None
+
+    def _add_row(self, row):
+        self._rows[row.get("id")] = row
+        self._total += row["market_value_hkd"]
+        for name, key, value in holding_contributions(row, self.market_data):
+            dist = self._dists.setdefault(name, {})
+            dist[key] = dist.get(key, 0) + value
+            self._key_counts[(name, key)] = self._key_counts.get((name, key), 0) + 1
+
+    def _remove_row(self, holding_id, keep_position=False):
+        row = self._rows[holding_id]
+        if keep_position:
+            self._rows[holding_id] = None  # placeholder, overwritten in place by _add_row
+        else:
+            del self._rows[holding_id]
+        self._total -= row["market_value_hkd"]
+        emptied = []
+        for name, key, value in holding_contributions(row, self.market_data):
+            dist = self._dists[name]
+            dist[key] = dist.get(key, 0) - value
+            count = self._key_counts.get((name, key), 1) - 1
+            self._key_counts[(name, key)] = count
+            if count <= 0 and not (name == "market_distribution" and key in ("US", "HK", "CN", "Cash")):
+                emptied.append((name, key))
+        return emptied
@@ -0,0 +1,147 @@
+import asyncio
+import os
+
+# Worker processes serving the app (launcher.py --workers N sets this for every worker).
+# With more than one, workers share the SQLite data file (DataManager.sync picks up
+# each other's writes) and a SQLite quote cache, and one elected leader runs the
+# background jobs: scheduled snapshots and the quote refresher.
+WORKERS = int(os.environ.get("PORTFOLIO_WORKERS", "1"))
+# Seconds between a follower's attempts to take over from a leader that exited
+LEADER_RETRY = 5.0
+# Seconds between leader refreshes of every held symbol into the shared quote cache
+QUOTE_REFRESH_INTERVAL = float(os.environ.get("PORTFOLIO_QUOTE_REFRESH", "15"))
+# The refresher pauses once no worker has read a quote for this many seconds
+REFRESH_IDLE = 300.0
+
+
+class LeaderLock:
+    """
+    Exclusive, non-blocking lock on a file. One process holds it at a time and the
+    OS releases it when that process exits, so a crashed leader is replaced on a
+    follower's next attempt.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def try_acquire(self):
+        if self._file is not None:
+            return True
+        f = open(self.path, "a+")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class LeaderElection:
+    """
+    Runs the async `on_elected()` in whichever worker holds the leader lock; the
+    others retry every `retry` seconds. stop() calls `on_resign()` and releases
+    the lock. A single worker is elected immediately.
+    """
+
+    def __init__(self, lock, on_elected, on_resign, retry=LEADER_RETRY):
+        self.lock = lock
+        self._on_elected = on_elected
+        self._on_resign = on_resign
+        self.retry = retry
+        self._task = None
+
+    @property
+    def is_leader(self):
+        return self.lock.held
+
+    async def start(self):
+        if self.lock.try_acquire():
+            await self._elected()
+        else:
+            self._task = asyncio.create_task(self._wait())
+
+    async def _elected(self):
+        print(f"Worker {os.getpid()} elected leader (runs the background jobs)")
+        await self._on_elected()
+
+    async def _wait(self):
+        while not self.lock.try_acquire():
+            await asyncio.sleep(self.retry)
+        await self._elected()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.lock.held:
+            await self._on_resign()
+            self.lock.release()
+
+
+class QuoteRefresher:
+    """
+    Leader-only loop: every `interval` seconds, refetch every symbol the holdings
+    need into the shared quote cache, while any worker is still reading quotes.
+    Followers then serve fresh quotes without touching the upstream API.
+    """
+
+    def __init__(self, refresh, shared_cache, interval=QUOTE_REFRESH_INTERVAL, idle=REFRESH_IDLE):
+        self._refresh = refresh  # async () -> None
+        self.shared_cache = shared_cache
+        self.interval = interval
+        self.idle = idle
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.shared_cache.idle_seconds() > self.idle:
+                continue
+            try:
+                await self._refresh()
+            except Exception as e:
+                print(f"Quote refresh failed: {e}")
@@ -0,0 +1,114 @@
+"""
+Local stand-in for qt.gtimg.cn: answers /q=sym1,sym2 with synthetic
+v_sym="..."; lines in Tencent's layout, with configurable latency and failures.
+
+    python -m bench.mock_quote_server --port 8765 --latency 0.05 --fail-rate 0.02
+    PORTFOLIO_QUOTE_URL=http://127.0.0.1:8765/q= python launcher.py
+"""
+import argparse
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+# Tencent records have ~88 "~"-separated fields; the backend reads 1 (name), 3 (price), 46 (English name)
+FIELD_COUNT = 88
+FX_RATES = {"USDHKD": 7.8, "USDCNY": 7.2, "CNYHKD": 1.08, "HKDUSD": 0.128, "HKDCNY": 0.92, "CNYUSD": 0.139}
+
+
+def base_price(symbol):
+    """Deterministic per-symbol price in [5, 505)."""
+    return 5 + zlib.crc32(symbol.encode()) % 50000 / 100
+
+
+def quote_line(symbol, jitter=0.0):
+    if symbol.startswith("fx_s"):
+        rate = FX_RATES.get(symbol[4:].upper(), 1.0)
+        return f'v_{symbol}="{symbol[4:].upper()}~{rate:.4f}~{rate:.4f}";'
+    fields = [""] * FIELD_COUNT
+    fields[0] = "1"
+    fields[1] = f"Name {symbol}"
+    fields[2] = symbol[2:]
+    fields[3] = f"{base_price(symbol) * (1 + jitter):.3f}"
+    fields[46] = f"{symbol[2:]} Corp"
+    return f'v_{symbol}="{"~".join(fields)}";'
+
+
+class MockQuoteServer:
+    """
+    Threaded HTTP server on 127.0.0.1.
+    - latency: seconds slept before every response
+    - fail_rate: fraction of requests answered with 503
+    - volatility: relative std of per-request price noise (0 = constant prices)
+    """
+
+    def __init__(self, port=0, latency=0.0, fail_rate=0.0, volatility=0.001, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.volatility = volatility
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/q="
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    fail = server._random.random() < server.fail_rate
+                    noise = server._random.gauss(0, server.volatility) if server.volatility else 0.0
+                    if fail:
+                        server.failures += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if fail:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                symbols = unquote(self.path.split("q=", 1)[-1]).split(",")
+                body = "\n".join(quote_line(s, noise) for s in symbols if s).encode("gbk")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=GBK")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Tencent quote server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of 503 responses")
+    args = parser.parse_args()
+    server = MockQuoteServer(args.port, args.latency, args.fail_rate).start()
+    print(f"Mock quote server at {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,230 @@
+"""
+Benchmark suite: runs the FastAPI app in-process against a local mock quote server
+with synthetic portfolios, and writes latency / throughput / peak memory to JSON.
+
+    python -m bench.run                                   # default sizes
+    python -m bench.run --sizes 10,1000 --output out.json
+    python -m bench.run --baseline bench_results.json     # exit 1 on regressions
+
+Runs in a throwaway HOME, so the real ~/Documents/PortfolioManager data is never touched.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from .mock_quote_server import MockQuoteServer
+
+DEFAULT_SIZES = "10,1000,10000,100000"
+MARKETS = ("US", "HK", "CN")
+
+
+def synthetic_holdings(count, symbols, seed=0):
+    """`count` holdings over a universe of `symbols` tickers: ~80% stocks, ~15% options, ~5% cash."""
+    rng = random.Random(seed)
+    holdings = []
+    for i in range(count):
+        market = MARKETS[i % 3]
+        n = rng.randrange(symbols)
+        ticker = {"US": f"S{n:05d}", "HK": f"{n % 100000:05d}", "CN": f"{600000 + n % 100000}"}[market]
+        kind = rng.random()
+        row = {"id": f"h{i}", "ticker": ticker, "market": market, "asset_type": "Stock",
+               "quantity": float(rng.randint(1, 1000)), "cost_basis": round(rng.uniform(5, 500), 2)}
+        if kind < 0.05:
+            row.update(ticker={"US": "USD", "HK": "HKD", "CN": "CNY"}[market], asset_type="Cash", cost_basis=1.0)
+        elif kind < 0.20:
+            row.update(asset_type="Option", quantity=-float(rng.randint(1, 10)), cost_basis=round(rng.uniform(1, 20), 2),
+                       option_type=rng.choice(("Call", "Put")), strike_price=round(rng.uniform(5, 500), 1),
+                       expiry_date=str(date.today() + timedelta(days=rng.randint(7, 365))))
+        holdings.append(row)
+    return holdings
+
+
+def synthetic_snapshots(count, holdings, seed=0):
+    """One snapshot per weekday going back from today, each carrying `holdings` with valuation fields."""
+    rng = random.Random(seed)
+    rows = [{**h, "current_price": 100.0, "market_value_hkd": h["quantity"] * 100.0,
+             "cost_value_hkd": h["quantity"] * h["cost_basis"], "sector": "Unknown"} for h in holdings]
+    snapshots = []
+    day = date.today()
+    value = 1_000_000.0
+    while len(snapshots) < count:
+        day -= timedelta(days=1)
+        if day.weekday() >= 5:
+            continue
+        value *= 1 + rng.gauss(0.0003, 0.01)
+        snapshots.append({"id": f"s{len(snapshots)}", "date": str(day), "total_net_worth_hkd": value,
+                          "holdings_snapshot": rows})
+    snapshots.reverse()
+    return snapshots
+
+
+def measure(fn, repeat):
+    """Latency stats (ms) and throughput over `repeat` calls."""
+    timings = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t) * 1000)
+    timings.sort()
+    return {
+        "count": repeat,
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "max_ms": timings[-1],
+        "ops_per_sec": 1000 * repeat / sum(timings) if sum(timings) else None,
+    }
+
+
+def peak_memory(fn):
+    """Peak Python heap allocated during one call (tracemalloc), in MB."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def run_size(main, client, size, args):
+    from backend import market_data as md
+
+    symbols = max(1, min(size // 2, args.symbols))
+    holdings = synthetic_holdings(size, symbols, args.seed)
+    snapshots = synthetic_snapshots(args.snapshots, holdings[:args.snapshot_holdings], args.seed)
+    repeat = max(3, min(args.repeat, 100_000 // size))
+    scenarios = {}
+
+    def scenario(name, fn, count=repeat, memory=True):
+        stats = measure(fn, count)
+        if memory and not args.no_memory:
+            stats["peak_mb"] = peak_memory(fn)
+        scenarios[name] = stats
+        print(f"  {name:<24} p50 {stats['p50_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms"
+              + (f"  peak {stats['peak_mb']:8.1f} MB" if "peak_mb" in stats else ""))
+
+    ndjson = "".join(json.dumps({"type": "holding", **h}) + "\n" for h in holdings)
+    scenario("import_stream", lambda: _check(client.post("/import/stream", params={"strategy": "current"},
+                                                          content=ndjson)), count=min(repeat, 3))
+    main.data_manager.replace_all({"holdings": [dict(h) for h in holdings], "snapshots": list(snapshots)})
+
+    def cold_summary():
+        md._QUOTE_CACHE.clear()
+        _check(client.get("/portfolio/summary", params={"fresh": True}))
+
+    scenario("summary_cold", cold_summary, count=min(repeat, 5))
+    scenario("summary_fresh", lambda: _check(client.get("/portfolio/summary", params={"fresh": True})))
+    scenario("summary_cached", lambda: _check(client.get("/portfolio/summary")))
+    scenario("history_net_worth", lambda: _check(client.get("/history", params={"net_worth_only": True})))
+    scenario("history_full", lambda: _check(client.get("/history")), count=min(repeat, 5))
+    scenario("snapshot", lambda: _check(client.post("/snapshot")), count=min(repeat, 5), memory=False)
+
+    counter = iter(range(10**9))
+
+    def mutate():
+        i = next(counter)
+        holding = {"ticker": f"M{i}", "market": "US", "asset_type": "Stock", "quantity": 1, "cost_basis": 1}
+        main.data_manager.add_holding(main.Holding(**holding))
+        added = main.data_manager.get_holdings()[-1]
+        added.quantity = 2
+        main.data_manager.update_holding(added)
+        main.data_manager.delete_holding(added.id)
+
+    scenario("datamanager_mutation", mutate, count=max(repeat, 20), memory=False)
+    return {"size": size, "symbols": symbols, "snapshots": len(snapshots), "scenarios": scenarios}
+
+
+def compare(results, baseline, tolerance):
+    """(size, scenario, old p50, new p50) for every p50 more than `tolerance` slower than the baseline."""
+    old = {(r["size"], name): s["p50_ms"] for r in baseline["results"] for name, s in r["scenarios"].items()}
+    regressions = []
+    for r in results:
+        for name, stats in r["scenarios"].items():
+            before = old.get((r["size"], name))
+            if before and stats["p50_ms"] > before * (1 + tolerance):
+                regressions.append((r["size"], name, before, stats["p50_ms"]))
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portfolio Manager benchmark suite")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated holdings counts")
+    parser.add_argument("--symbols", type=int, default=20000, help="max distinct tickers per portfolio")
+    parser.add_argument("--snapshots", type=int, default=1000, help="snapshot history length")
+    parser.add_argument("--snapshot-holdings", type=int, default=200, help="holdings stored per snapshot")
+    parser.add_argument("--repeat", type=int, default=20, help="iterations per scenario (fewer for big sizes)")
+    parser.add_argument("--latency", type=float, default=0.02, help="mock quote server latency (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="mock quote server 503 rate")
+    parser.add_argument("--storage", default="sqlite", choices=("sqlite", "json"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc peak-memory passes")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare p50 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    server = MockQuoteServer(latency=args.latency, fail_rate=args.fail_rate, seed=args.seed).start()
+    home = tempfile.mkdtemp(prefix="portfolio-bench-")
+    # Must be set before the backend is imported (data dir, quote URL and scheduler are read at import)
+    os.environ.update(HOME=home, USERPROFILE=home, PORTFOLIO_QUOTE_URL=server.url,
+                      PORTFOLIO_STORAGE=args.storage, PORTFOLIO_SNAPSHOT_SCHEDULE="off")
+    from fastapi.testclient import TestClient
+    from backend import main as app_main
+
+    results = []
+    with TestClient(app_main.app) as client:
+        for size in (int(s) for s in args.sizes.split(",")):
+            print(f"== {size} holdings")
+            results.append(run_size(app_main, client, size, args))
+    app_main.data_manager.flush()
+    server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+            "mock_requests": server.requests,
+            "mock_failures": server.failures,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for size, name, before, after in regressions:
+            print(f"REGRESSION {name} @ {size}: p50 {before:.2f} -> {after:.2f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -53,6 +53,8 @@ def build():
         "--hidden-import", "uvicorn.protocols",
         "--hidden-import", "uvicorn.protocols.http",
         "--hidden-import", "uvicorn.protocols.http.auto",
+        "--hidden-import", "uvicorn.protocols.websockets",
+        "--hidden-import", "uvicorn.protocols.websockets.auto",
         "--hidden-import", "uvicorn.lifespan",
         "--hidden-import", "uvicorn.lifespan.on",
         "launcher.py"
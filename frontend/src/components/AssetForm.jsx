@@ -17,6 +17,7 @@ export default function AssetForm({ onSave, onClose, initialData, lang = 'en' })
             side: '方向',
             strikePrice: '行权价',
             expiryDate: '到期日',
+            impliedVol: '隐含波动率 (可选, 如 0.35)',
             cancel: '取消',
             save: '保存',
             stock: '股票',
@@ -41,6 +42,7 @@ export default function AssetForm({ onSave, onClose, initialData, lang = 'en' })
             side: 'Side',
             strikePrice: 'Strike Price',
             expiryDate: 'Expiry Date',
+            impliedVol: 'Implied Vol (optional, e.g. 0.35)',
             cancel: 'Cancel',
             save: 'Save',
             stock: 'Stock',
@@ -64,6 +66,7 @@ export default function AssetForm({ onSave, onClose, initialData, lang = 'en' })
         option_type: 'Put',
         strike_price: 0,
         expiry_date: '',
+        implied_vol: '',
         side: 'Short' // Default to Short for Sell Put
     });
 
@@ -94,9 +97,12 @@ export default function AssetForm({ onSave, onClose, initialData, lang = 'en' })
             payload.strike_price = null;
             payload.expiry_date = null;
             payload.side = null;
+            payload.implied_vol = null;
         } else {
             // For options, ensure fields are valid
             if (!payload.expiry_date) payload.expiry_date = null;
+            // Empty implied vol: backend estimates it from price history
+            payload.implied_vol = payload.implied_vol ? parseFloat(payload.implied_vol) : null;
         }
 
         // Remove id from payload if it's empty/null to avoid backend confusion (though backend ignores it for add)
@@ -205,6 +211,10 @@ export default function AssetForm({ onSave, onClose, initialData, lang = 'en' })
                                 <input type="date" name="expiry_date" value={formData.expiry_date} onChange={handleChange} required />
                             </div>
                         </div>
+                        <div>
+                            <label className="text-sm text-gray">{t[lang].impliedVol}</label>
+                            <input type="number" name="implied_vol" value={formData.implied_vol ?? ''} onChange={handleChange} step="any" min="0" />
+                        </div>
                     </>
                 )}
 
@@ -114,7 +114,8 @@ export default function Dashboard() {
         try {
             const sum = await api.getSummary();
             setSummary(sum);
-            const hist = await api.getHistory();
+            // Chart and history list only need date + net worth; full snapshots are fetched on view
+            const hist = await api.getHistory({ net_worth_only: true });
             setHistory(hist);
         } catch (e) {
             console.error("Failed to fetch data", e);
@@ -127,6 +128,32 @@ export default function Dashboard() {
         fetchData();
     }, []);
 
+    // Live price updates pushed by the server (only changed holdings are sent)
+    useEffect(() => {
+        const applyUpdate = (prev, msg) => {
+            if (msg.type === 'summary' || !prev) {
+                const { type, ...full } = msg;
+                return full;
+            }
+            const changed = new Map(msg.holdings.map(h => [h.id, h]));
+            const removed = new Set(msg.removed);
+            const holdings = prev.holdings
+                .filter(h => !removed.has(h.id))
+                .map(h => changed.get(h.id) || h);
+            const known = new Set(holdings.map(h => h.id));
+            msg.holdings.forEach(h => { if (!known.has(h.id)) holdings.push(h); });
+            return {
+                ...prev,
+                holdings,
+                total_net_worth_hkd: msg.total_net_worth_hkd,
+                market_distribution: msg.market_distribution,
+                sector_distribution: msg.sector_distribution,
+                ticker_distribution: msg.ticker_distribution
+            };
+        };
+        return api.subscribeSummary((msg) => setSummary(prev => applyUpdate(prev, msg)));
+    }, []);
+
     const handleSave = () => {
         setShowForm(false);
         setEditingAsset(null);
@@ -363,7 +390,7 @@ export default function Dashboard() {
                             onRefresh={fetchData}
                             onClose={() => setShowHistory(false)}
                             setLoading={setLoading}
-                            onView={(snapshot) => setSelectedSnapshot(snapshot)}
+                            onView={async (snapshot) => setSelectedSnapshot(await api.getSnapshot(snapshot.id))}
                             lang={lang}
                         />
                     </div>
@@ -30,7 +30,9 @@ export default function HoldingsList({ holdings, onEdit, onRefresh, lang = 'en',
             call: '看涨',
             addAsset: '添加资产',
             updateSnapshot: '添加快照',
-            deleteAll: '清空所有'
+            deleteAll: '清空所有',
+            stalePrice: '报价不可用，显示最后有效价格',
+            asOf: '时间'
         },
         en: {
             edit: 'Edit',
@@ -59,7 +61,9 @@ export default function HoldingsList({ holdings, onEdit, onRefresh, lang = 'en',
             call: 'Call',
             addAsset: 'Add Asset',
             updateSnapshot: 'Add Snapshot',
-            deleteAll: 'Delete All'
+            deleteAll: 'Delete All',
+            stalePrice: 'Quote unavailable, showing last known price',
+            asOf: 'as of'
         }
     };
 
@@ -129,7 +133,10 @@ export default function HoldingsList({ holdings, onEdit, onRefresh, lang = 'en',
                                     </td>
                                     <td>{h.quantity}</td>
                                     <td>{h.cost_basis?.toFixed(2)}</td>
-                                    <td>{h.current_price?.toFixed(2)}</td>
+                                    <td>
+                                        {h.current_price?.toFixed(2)}
+                                        {h.price_stale && <span title={`${t[lang].stalePrice} (${t[lang].asOf} ${h.price_as_of})`} style={{ color: '#f59e0b', marginLeft: 4 }}>⚠</span>}
+                                    </td>
                                     <td>{h.market_value_hkd?.toFixed(2)}</td>
                                     <td style={{ color: profitColor, fontWeight: 600 }}>
                                         {totalCost > 0 ? (profitLoss >= 0 ? '+' : '') + profitLoss.toFixed(2) : '-'}
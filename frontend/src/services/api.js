@@ -27,6 +27,13 @@ export const api = {
     });
     return res.json();
   },
+  // Live summary over WebSocket: onMessage gets {type: 'summary', ...} then {type: 'update', ...} diffs.
+  // Returns a function that closes the stream.
+  subscribeSummary: (onMessage) => {
+    const ws = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/ws/summary`);
+    ws.onmessage = (event) => onMessage(JSON.parse(event.data));
+    return () => ws.close();
+  },
   getSummary: async () => {
     const res = await fetch(`${API_BASE_URL}/portfolio/summary`);
     return res.json();
@@ -37,8 +44,19 @@ export const api = {
     });
     return res.json();
   },
-  getHistory: async () => {
-    const res = await fetch(`${API_BASE_URL}/history`);
+  getHistory: async (params = {}) => {
+    const query = new URLSearchParams(params).toString();
+    const res = await fetch(`${API_BASE_URL}/history${query ? `?${query}` : ''}`);
+    return res.json();
+  },
+  // Returns over a date range: twr, mwr_annualized, max_drawdown, volatility_annualized, attribution...
+  getAnalytics: async (params = {}) => {
+    const query = new URLSearchParams(params).toString();
+    const res = await fetch(`${API_BASE_URL}/analytics${query ? `?${query}` : ''}`);
+    return res.json();
+  },
+  getSnapshot: async (id) => {
+    const res = await fetch(`${API_BASE_URL}/history/${id}`);
     return res.json();
   },
   deleteHistory: async (id) => {
@@ -1,27 +1,40 @@
 import sys
 import os
+import argparse
+import multiprocessing
 import uvicorn
 import webbrowser
 import time
-from backend.main import app
 
 if __name__ == "__main__":
+    # Worker processes of a frozen (PyInstaller) build re-enter here
+    multiprocessing.freeze_support()
     try:
+        parser = argparse.ArgumentParser(description="Portfolio Manager")
+        parser.add_argument("--workers", type=int, default=int(os.environ.get("PORTFOLIO_WORKERS", "1")),
+                            help="worker processes (shared SQLite state, one elected leader)")
+        args = parser.parse_args()
         print("Starting Portfolio Manager...")
-        
+
         # Use a fixed port or find an available one? Fixed for now.
         port = 8000
         host = "127.0.0.1"
-        
+
         url = f"http://{host}:{port}"
         print(f"Opening browser at {url}")
-        
+
         # Open browser
         webbrowser.open(url)
-        
+
         print(f"Starting server on {host}:{port}")
         # Run server
-        uvicorn.run(app, host=host, port=port)
+        if args.workers > 1:
+            # Each worker imports the app itself and reads this to enable shared state
+            os.environ["PORTFOLIO_WORKERS"] = str(args.workers)
+            uvicorn.run("backend.main:app", host=host, port=port, workers=args.workers)
+        else:
+            from backend.main import app
+            uvicorn.run(app, host=host, port=port)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
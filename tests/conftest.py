@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# backend.data_manager creates its data directory under ~/Documents on import:
+# point HOME at a scratch directory before any test imports the backend.
+os.environ["HOME"] = tempfile.mkdtemp(prefix="portfolio-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
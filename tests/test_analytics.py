@@ -0,0 +1,21 @@
+import pytest
+from backend.analytics import irr
+
+
+def test_single_period():
+    assert irr([0, 1], [-100, 110]) == pytest.approx(0.10, abs=1e-9)
+
+
+def test_matches_npv_root():
+    times = [0, 0.5, 1.25, 2.0]
+    flows = [-1000, -200, 300, 1100]
+    rate = irr(times, flows)
+    assert sum(f / (1 + rate) ** t for t, f in zip(times, flows)) == pytest.approx(0, abs=1e-6)
+
+
+def test_negative_return():
+    assert irr([0, 2], [-100, 81]) == pytest.approx(-0.10, abs=1e-9)
+
+
+def test_no_sign_change_has_no_root():
+    assert irr([0, 1], [100, 50]) is None
@@ -0,0 +1,88 @@
+import os
+import json
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.metrics import HTTP_REQUEST_SECONDS
+from backend.models import PortfolioSnapshot
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_history_revalidates_with_304(client):
+    first = client.get("/history")
+    etag = first.headers["etag"]
+    again = client.get("/history", headers={"If-None-Match": etag})
+
+    assert again.status_code == 304 and again.content == b""
+    assert client.get("/history?interval=weekly", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_new_snapshot_changes_etag(client):
+    etag = client.get("/history").headers["etag"]
+    export_etag = client.get("/export").headers["etag"]
+    main.data_manager.save_snapshot(PortfolioSnapshot(date=date(2024, 2, 1), total_net_worth_hkd=1.0,
+                                                      holdings_snapshot=[]))
+
+    changed = client.get("/history", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert client.get("/export", headers={"If-None-Match": export_etag}).status_code == 200
+
+
+def test_unknown_scenario_key_is_a_400(client):
+    response = client.post("/scenarios", json=[{"ticker": {"NOSUCH": 0.1}}])
+    assert response.status_code == 400 and "NOSUCH" in response.json()["detail"]
+
+
+def test_bad_lot_size_is_a_400(client):
+    response = client.put("/symbols/hk00700", json={"lot_size": "abc"})
+    assert response.status_code == 400 and "lot_size" in response.json()["detail"]
+    response = client.post("/symbols/import", content="symbol,lot_size\nhk00700,abc\n")
+    assert response.status_code == 400 and "line 2 (hk00700)" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("symbol", ["..%2F..%2Fx", "us..%5C..%5Cx", "evil", "hk"])
+def test_price_routes_reject_invalid_symbols(client, symbol):
+    # 404 when the encoded separator splits the path, 400 from the symbol check otherwise
+    assert client.get(f"/prices/{symbol}").status_code in (400, 404)
+    response = client.post(f"/prices/{symbol}/import", content="date,close\n2024-01-02,1\n")
+    assert response.status_code in (400, 404)
+    parent = os.path.dirname(main.price_history.directory)
+    assert not [name for name in os.listdir(parent) if name.endswith(".npy")]
+
+
+def test_snapshots_only_import_with_current_strategy_is_a_400(client):
+    before = client.get("/holdings").json()
+    body = json.dumps({"type": "snapshot", "date": "2024-03-01", "total_net_worth_hkd": 1.0,
+                       "holdings_snapshot": []}) + "\n"
+    response = client.post("/import/stream?strategy=current", content=body)
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["message"] == "No valid rows to import"
+    assert client.get("/holdings").json() == before
+
+
+def test_summary_websocket_sends_the_summary_on_connect(client):
+    with client.websocket_connect("/ws/summary") as websocket:
+        message = websocket.receive_json()
+        assert main.summary_streamer.clients
+    assert message["type"] == "summary"
+    assert {h["id"] for h in message["holdings"]} == {h.id for h in main.data_manager.get_holdings()}
+
+
+def test_metrics_count_requests(client):
+    before = HTTP_REQUEST_SECONDS.count(method="GET", route="/holdings", status="200")
+    client.get("/holdings")
+    client.get("/holdings")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert HTTP_REQUEST_SECONDS.count(method="GET", route="/holdings", status="200") == before + 2
+    lines = response.text.splitlines()
+    assert "# TYPE portfolio_http_request_seconds histogram" in lines
+    assert f'portfolio_http_request_seconds_count{{method="GET",route="/holdings",status="200"}} {float(before + 2)}' in lines
@@ -0,0 +1,110 @@
+import json
+from datetime import date
+from backend.data_manager import DataManager
+from backend.models import PortfolioSnapshot
+from backend.storage import JsonStorage, SqliteStorage
+
+
+def _snapshot(day, total):
+    return PortfolioSnapshot(date=date(2024, 1, day), total_net_worth_hkd=total, holdings_snapshot=[])
+
+
+def _manager(path, snapshots=3):
+    """A fresh DataManager over a database that already holds `snapshots` snapshots."""
+    DataManager(SqliteStorage(path)).save_snapshots([_snapshot(i + 1, float(i)) for i in range(snapshots)])
+    return DataManager(SqliteStorage(path))
+
+
+def _count_loads(manager, monkeypatch, during_load=None):
+    """Record load_snapshots(holdings=...) calls; `during_load` runs inside the first full load."""
+    calls = []
+    load = manager.storage.load_snapshots
+
+    def counting(holdings=True):
+        calls.append(holdings)
+        rows = load(holdings=holdings)
+        if during_load is not None and holdings and calls.count(True) == 1:
+            during_load()
+        return rows
+
+    monkeypatch.setattr(manager.storage, "load_snapshots", counting)
+    return calls
+
+
+def test_holdings_requests_do_not_load_snapshots(tmp_path, monkeypatch):
+    manager = _manager(str(tmp_path / "portfolio.db"))
+    calls = _count_loads(manager, monkeypatch)
+    holding = manager.get_holdings()[0]
+    holding.quantity += 1
+    manager.update_holding(holding)
+    manager.get_holdings()
+
+    assert calls == [] and not manager._snapshots_loaded
+
+
+def test_net_worth_history_stays_lazy(tmp_path, monkeypatch):
+    manager = _manager(str(tmp_path / "portfolio.db"))
+    calls = _count_loads(manager, monkeypatch)
+    history = manager.get_history(net_worth_only=True)
+
+    assert [point["total_net_worth_hkd"] for point in history] == [0.0, 1.0, 2.0]
+    assert calls == [False] and not manager._snapshots_loaded
+    assert len(manager.get_history()) == 3 and calls == [False, True]
+
+
+def test_snapshot_saved_during_lazy_load_is_kept(tmp_path, monkeypatch):
+    manager = _manager(str(tmp_path / "portfolio.db"))
+    calls = _count_loads(manager, monkeypatch, lambda: manager.save_snapshot(_snapshot(20, 20.0)))
+    history = manager.get_history()
+
+    # The first load predates the write, so it is dropped and read again
+    assert calls == [True, True]
+    assert [s["total_net_worth_hkd"] for s in history] == [0.0, 1.0, 2.0, 20.0]
+
+
+def test_sync_during_lazy_load_leaves_a_consistent_history(tmp_path, monkeypatch):
+    path = str(tmp_path / "portfolio.db")
+    manager = _manager(path)
+    other = DataManager(SqliteStorage(path))
+
+    def other_worker_writes():
+        other.save_snapshot(_snapshot(21, 21.0))
+        manager.sync()
+
+    calls = _count_loads(manager, monkeypatch, other_worker_writes)
+    history = manager.get_history()
+
+    assert calls == [True, True]
+    assert [s["total_net_worth_hkd"] for s in history] == [0.0, 1.0, 2.0, 21.0]
+    assert len({s["id"] for s in history}) == 4
+
+
+def test_id_backfill_does_not_modify_loaded_rows(tmp_path):
+    path = tmp_path / "portfolio.json"
+    path.write_text(json.dumps({"holdings": [], "snapshots": [
+        {"date": "2024-01-02", "total_net_worth_hkd": 1.0, "holdings_snapshot": []}]}))
+    manager = DataManager(JsonStorage(str(path)))
+    row = manager.data["snapshots"][0]
+    history = manager.get_history()
+
+    assert history[0]["id"] and "id" not in row
+    manager.flush()
+
+
+def test_sync_picks_up_another_workers_commit(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    manager = _manager(path)
+    other = DataManager(SqliteStorage(path))
+    events = []
+    manager.subscribe(lambda event, old, new, version: events.append((event, version)))
+    version = manager.holdings_version
+
+    holding = other.get_holdings()[0]
+    holding.quantity = 42
+    other.update_holding(holding)
+    manager.sync()
+
+    assert events == [("replace", version + 1)]
+    assert manager.get_holdings()[0].quantity == 42
+    manager.sync()
+    assert len(events) == 1  # nothing new committed
@@ -0,0 +1,20 @@
+from backend.history import decode_holdings, encode_holdings
+
+
+def test_round_trip_mixed_key_sets():
+    holdings = [
+        {"id": "a", "ticker": "USD", "market": "US", "asset_type": "Cash", "quantity": 10000.0},
+        {"id": "b", "ticker": "0700", "market": "HK", "asset_type": "Stock", "quantity": 1000, "custom_sector": None},
+        {"id": "c", "ticker": "AAPL", "market": "US", "asset_type": "Option", "quantity": -2,
+         "option_type": "Put", "strike_price": 150.5, "expiry_date": "2025-01-17"},
+        {"id": "d", "ticker": "9988", "market": "HK", "asset_type": "Stock", "quantity": 500, "custom_sector": "Tech"},
+    ]
+    decoded = decode_holdings(encode_holdings(holdings))
+
+    assert decoded == holdings
+    assert [list(row) for row in decoded] == [list(row) for row in holdings]  # key order kept
+
+
+def test_empty():
+    assert decode_holdings(encode_holdings([])) == []
+    assert decode_holdings(None) == []
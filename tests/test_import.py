@@ -0,0 +1,71 @@
+import io
+import json
+from backend import transfer
+from backend.data_manager import DataManager
+from backend.storage import JsonStorage, SqliteStorage
+from backend.transfer import ImportReport, parse_import
+
+
+def _ndjson(holdings, snapshots, bad=0):
+    lines = [{"type": "holding", "ticker": f"T{i}", "market": "US", "asset_type": "Stock",
+              "quantity": i + 1, "cost_basis": 1.0} for i in range(holdings)]
+    lines += [{"type": "snapshot", "date": f"2024-01-{i % 28 + 1:02d}", "total_net_worth_hkd": float(i),
+               "holdings_snapshot": []} for i in range(snapshots)]
+    lines += [{"type": "holding", "ticker": "BAD", "market": "US", "asset_type": "Stock",
+               "quantity": "many", "cost_basis": 1.0}] * bad
+    return io.StringIO("".join(json.dumps(line) + "\n" for line in lines))
+
+
+def _import(manager, stream, history):
+    report = ImportReport()
+    staged = manager.import_batches(parse_import(stream, "ndjson", report), history)
+    return report, staged
+
+
+def test_import_streams_batches_into_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer, "IMPORT_BATCH_SIZE", 7)
+    monkeypatch.setattr(transfer, "MAX_REPORTED_ERRORS", 3)
+    path = str(tmp_path / "portfolio.db")
+    manager = DataManager(SqliteStorage(path))
+    report, staged = _import(manager, _ndjson(20, 30, bad=5), history=True)
+
+    assert staged == {"holdings": 20, "snapshots": 30}
+    result = report.as_dict()
+    assert result["imported"] == {"holdings": 20, "snapshots": 30}
+    assert result["error_count"] == 5 and len(result["errors"]) == 3
+    assert [h.ticker for h in manager.get_holdings()] == [f"T{i}" for i in range(20)]
+    assert len(manager.get_history()) == 30
+    assert all(h.id for h in manager.get_holdings())
+    # Another worker on the same database sees the swapped-in data
+    other = DataManager(SqliteStorage(path))
+    assert len(other.get_holdings()) == 20 and len(other.get_history()) == 30
+
+
+def test_current_strategy_keeps_history(tmp_path):
+    manager = DataManager(SqliteStorage(str(tmp_path / "portfolio.db")))
+    _import(manager, _ndjson(2, 3), history=True)
+    report, staged = _import(manager, _ndjson(4, 9), history=False)
+
+    assert staged == {"holdings": 4, "snapshots": 0}
+    assert report.counts == {"holdings": 4, "snapshots": 9}
+    assert len(manager.get_holdings()) == 4
+    assert len(manager.get_history()) == 3
+
+
+def test_nothing_valid_keeps_existing_data(tmp_path):
+    manager = DataManager(SqliteStorage(str(tmp_path / "portfolio.db")))
+    before = manager.validators("holdings", "snapshots")
+    report, staged = _import(manager, _ndjson(0, 0, bad=2), history=True)
+
+    assert staged == {"holdings": 0, "snapshots": 0} and report.error_count == 2
+    assert len(manager.get_holdings()) == 2  # the demo holdings
+    assert manager.validators("holdings", "snapshots") == before
+
+
+def test_json_storage_import(tmp_path):
+    manager = DataManager(JsonStorage(str(tmp_path / "portfolio.json")))
+    _import(manager, _ndjson(3, 4), history=True)
+    manager.flush()
+
+    reloaded = DataManager(JsonStorage(str(tmp_path / "portfolio.json")))
+    assert len(reloaded.get_holdings()) == 3 and len(reloaded.get_history()) == 4
@@ -0,0 +1,54 @@
+from backend import market_data as md
+from backend.market_data import MarketData, QuoteContext
+from backend.models import Holding
+from backend.valuation import IncrementalValuation, value_portfolio
+
+
+class CountingProvider:
+    """Upstream stand-in: records every fetch so the test can assert there were none."""
+
+    name = "counting"
+
+    def __init__(self):
+        from backend.quote_sources import CircuitBreaker
+        self.breaker = CircuitBreaker()
+        self.calls = []
+
+    def fetch(self, symbols):
+        self.calls.append(list(symbols))
+        return {}
+
+
+def _holding(ticker, quantity, id):
+    return Holding(id=id, ticker=ticker, market="US", asset_type="Stock", quantity=quantity, cost_basis=1)
+
+
+def _model():
+    md._QUOTE_CACHE.put_many([("quote", "usINCA", {"price": 10.0, "name": "A"}),
+                              ("quote", "usINCB", {"price": 20.0, "name": "B"}),
+                              ("fx", "fx_susdhkd", {"rate": 7.8})])
+    provider = CountingProvider()
+    market_data = MarketData(providers=[provider])
+    holdings = [_holding("INCA", 1, "a")]
+    quotes = QuoteContext(market_data).plan(holdings).from_cache()
+    model = IncrementalValuation(market_data)
+    model.reset(value_portfolio(holdings, quotes, market_data), 1)
+    return model, provider
+
+
+def test_edit_is_valued_from_cached_quotes():
+    model, provider = _model()
+    model.on_holding_change("add", None, _holding("INCB", 2, "b").dict(), 2)
+
+    summary = model.summary_for(2)
+    assert summary is not None
+    assert summary.total_net_worth_hkd == (10.0 + 2 * 20.0) * 7.8
+    assert provider.calls == []
+
+
+def test_cache_miss_drops_state_without_fetching():
+    model, provider = _model()
+    model.on_holding_change("add", None, _holding("INCMISSING", 1, "c").dict(), 2)
+
+    assert model.summary_for(2) is None
+    assert provider.calls == []
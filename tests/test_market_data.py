@@ -0,0 +1,109 @@
+from backend import market_data as md
+from backend.market_data import MarketData
+from backend.quote_sources import CircuitBreaker, LastKnownGoodStore
+
+
+class StaticProvider:
+    def __init__(self, name, quotes):
+        self.name = name
+        self.quotes = quotes
+        self.breaker = CircuitBreaker()
+        self.calls = []
+
+    def fetch(self, symbols):
+        self.calls.append(list(symbols))
+        return {s: self.quotes[s] for s in symbols if s in self.quotes}
+
+
+def test_zero_price_falls_through_to_next_provider():
+    first = StaticProvider("first", {"usZPA": {"name": "A", "price": 0.0}, "usZPB": {"name": "B", "price": 5.0}})
+    second = StaticProvider("second", {"usZPA": {"name": "A", "price": 12.0}})
+    quotes = MarketData(providers=[first, second])._fetch_batch(["usZPA", "usZPB"])
+
+    assert second.calls == [["usZPA"]]
+    assert quotes == {"usZPA": {"name": "A", "price": 12.0}, "usZPB": {"name": "B", "price": 5.0}}
+    assert first.breaker.state == "closed"
+
+
+def test_unpriced_symbol_uses_last_known_good(tmp_path):
+    market_data = MarketData(providers=[StaticProvider("zero", {"usZPC": {"name": "C", "price": 0.0},
+                                                                 "fx_szpchkd": {"rate": -1.0}})])
+    market_data.last_known_good = LastKnownGoodStore(str(tmp_path / "last_good.json"))
+    market_data.last_known_good.record({"usZPC": {"name": "C", "price": 9.0}})
+    quotes = market_data.get_quotes(["usZPC", "fx_szpchkd"], refresh=True)
+
+    assert quotes["usZPC"]["price"] == 9.0 and quotes["usZPC"]["stale"]
+    assert "fx_szpchkd" not in quotes
+    assert market_data.last_known_good.get("usZPC")["price"] == 9.0  # the zero never replaced it
+
+
+def _line(symbol, name, price, english_name=""):
+    parts = ["200", name, symbol[2:], price] + [""] * 42 + [english_name, ""]
+    return f'v_{symbol}="{"~".join(parts)}";'
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+
+class FakeSession:
+    """Stands in for the shared requests session: answers from a {symbol: line} table."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        symbols = url.split("q=", 1)[1].split(",")
+        return FakeResponse("\n".join(self.lines.get(s, "v_pv_none_match=\"1\";") for s in symbols) + "\n")
+
+
+def test_parse_multi_symbol_response():
+    body = "\n".join([
+        _line("usPQA", "阿", "190.50", "Pqa Inc."),
+        'v_fx_susdhkd="USDHKD~7.8123~x";',
+        'v_hk99999="";',  # unknown symbol
+        "v_pv_none_match=\"1\";",
+        "garbage line",
+        'v_sh600000="1~short',  # truncated
+        "",
+    ])
+    parsed = md.parse_quotes(body)
+
+    assert set(parsed) == {"usPQA", "fx_susdhkd", "sh600000"}
+    assert parsed["usPQA"][3] == "190.50" and parsed["usPQA"][46] == "Pqa Inc."
+    assert md._quote_from_parts("fx_susdhkd", parsed["fx_susdhkd"]) == {"rate": 7.8123}
+    # Too short to carry a price: unpriced rather than an IndexError
+    assert md._quote_from_parts("sh600000", parsed["sh600000"])["price"] == 0.0
+
+
+def test_get_quotes_batches_requests(monkeypatch):
+    symbols = [f"usPQB{i}" for i in range(5)] + ["fx_spqbhkd"]
+    lines = {s: _line(s, s, f"{10 + i}.5", s) for i, s in enumerate(symbols[:5])}
+    lines["fx_spqbhkd"] = 'v_fx_spqbhkd="PQBHKD~1.25~x";'
+    session = FakeSession(lines)
+    monkeypatch.setattr(md, "_SESSION", session)
+    monkeypatch.setattr(md, "QUOTE_BATCH_SIZE", 2)
+
+    quotes = MarketData(providers=[md.TencentProvider(url="http://quotes.test/q=")]).get_quotes(
+        symbols + ["usPQBNONE"], refresh=True)
+
+    assert sorted(len(url.split("q=")[1].split(",")) for url in session.urls) == [1, 2, 2, 2]
+    assert quotes["usPQB3"] == {"name": "usPQB3", "price": 13.5, "english_name": "usPQB3"}
+    assert quotes["fx_spqbhkd"] == {"rate": 1.25}
+    assert "usPQBNONE" not in quotes and "pv_none_match" not in quotes
+
+
+def test_http_error_counts_as_provider_failure(monkeypatch):
+    class Failing(FakeSession):
+        def get(self, url, timeout=None):
+            self.urls.append(url)
+            return FakeResponse("", status_code=502)
+
+    monkeypatch.setattr(md, "_SESSION", Failing({}))
+    provider = md.TencentProvider(url="http://quotes.test/q=")
+    assert MarketData(providers=[provider]).get_quotes(["usPQC"], refresh=True) == {}
+    assert provider.breaker._consecutive == 1
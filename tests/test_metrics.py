@@ -0,0 +1,27 @@
+from backend import metrics
+from backend.metrics import Counter, Histogram, render
+
+
+def test_render_exposition_format(monkeypatch):
+    monkeypatch.setattr(metrics, "_REGISTRY", [])
+    requests = Counter("test_requests_total", "Requests", ("kind",))
+    latency = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc(kind="fx")
+    requests.inc(2, kind='q"uote')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5.0)
+
+    assert render().splitlines() == [
+        "# HELP test_requests_total Requests",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{kind="fx"} 1.0',
+        'test_requests_total{kind="q\\"uote"} 2.0',
+        "# HELP test_latency_seconds Latency",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{le="0.1"} 1.0',
+        'test_latency_seconds_bucket{le="1.0"} 2.0',
+        'test_latency_seconds_bucket{le="+Inf"} 3.0',
+        "test_latency_seconds_sum 5.55",
+        "test_latency_seconds_count 3.0",
+    ]
@@ -0,0 +1,49 @@
+import math
+import numpy as np
+from backend.options import black_scholes, erfc, norm_cdf
+
+
+def test_erfc_matches_math_erfc():
+    x = np.concatenate([np.linspace(-30.0, 30.0, 60001), [0.0, 0.5, -0.5, 4.0, -4.0, 26.5, 27.5]])
+    expected = np.array([math.erfc(v) for v in x])
+    got = erfc(x)
+    nonzero = expected > 1e-300
+    assert np.max(np.abs(got - expected)) <= 4.5e-16
+    assert np.max(np.abs(got - expected)[nonzero] / expected[nonzero]) < 5e-15
+
+
+def test_erfc_special_values_and_shape():
+    got = erfc(np.array([[np.inf, -np.inf], [np.nan, 0.0]]))
+    assert got.shape == (2, 2)
+    assert got[0, 0] == 0.0 and got[0, 1] == 2.0 and np.isnan(got[1, 0]) and got[1, 1] == 1.0
+    assert abs(float(erfc(1.0)) - math.erfc(1.0)) < 1e-16
+
+
+def test_norm_cdf():
+    x = np.linspace(-10.0, 10.0, 2001)
+    expected = np.array([0.5 * math.erfc(-v / math.sqrt(2.0)) for v in x])
+    assert np.max(np.abs(norm_cdf(x) - expected)) < 5e-16
+    assert norm_cdf(0.0) == 0.5
+
+
+def test_black_scholes_known_values():
+    # Hull's textbook example and the standard at-the-money case
+    result = black_scholes([42, 42, 100, 100], [40, 40, 100, 100], [0.5, 0.5, 1, 1], [0.1, 0.1, 0.05, 0.05],
+                           0.2, [True, False, True, False])
+    np.testing.assert_allclose(result["price"], [4.759422392871532, 0.8085993729000922,
+                                                 10.450583572185565, 5.573526022256971], rtol=1e-12)
+    np.testing.assert_allclose(result["delta"][2:], [0.6368306511756191, 0.6368306511756191 - 1], rtol=1e-12)
+
+
+def test_put_call_parity():
+    rng = np.random.default_rng(1)
+    S, K = rng.uniform(10, 200, 500), rng.uniform(10, 200, 500)
+    T, r, sigma = rng.uniform(0.01, 3, 500), rng.uniform(0, 0.08, 500), rng.uniform(0.05, 1.2, 500)
+    call = black_scholes(S, K, T, r, sigma, True)["price"]
+    put = black_scholes(S, K, T, r, sigma, False)["price"]
+    np.testing.assert_allclose(call - put, S - K * np.exp(-r * T), atol=1e-9)
+
+
+def test_expired_contracts_pay_intrinsic():
+    result = black_scholes([90, 110, 90, 110], 100, 0, 0.05, 0.3, [True, True, False, False])
+    np.testing.assert_allclose(result["price"], [0, 10, 10, 0])
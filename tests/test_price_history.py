@@ -0,0 +1,77 @@
+import os
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from backend.data_manager import DataManager
+from backend.market_data import MarketData
+from backend.models import Holding
+from backend.price_history import PriceHistoryStore, backfill_snapshots, to_day
+from backend.storage import SqliteStorage
+
+
+def _stored(store, symbol):
+    return np.load(os.path.join(store.directory, f"{symbol}.npy")).tolist()
+
+
+def test_live_quotes_patch_the_tail(tmp_path):
+    store = PriceHistoryStore(tmp_path)
+    store.write("usAAPL", np.arange(100, 1100), np.arange(1000.0))
+    path = os.path.join(store.directory, "usAAPL.npy")
+    before = os.stat(path)
+
+    store.write("usAAPL", [1099], [5.0])  # same day: last price wins, nothing appended
+    assert os.path.getsize(path) == before.st_size
+    for day in range(1100, 1120):
+        store.write("usAAPL", [day], [float(day)])
+    rows = _stored(store, "usAAPL")
+
+    assert os.stat(path).st_ino == before.st_ino  # patched in place, never rewritten
+    assert len(rows) == 1020 and rows[999] == (1099, 5.0) and rows[-1] == (1119, 1119.0)
+    assert store.close_on("usAAPL", date(1970, 1, 1) + timedelta(days=1119)) == 1119.0
+
+
+def test_older_days_are_merged(tmp_path):
+    store = PriceHistoryStore(tmp_path)
+    store.write("usAAPL", [10, 20, 30], [1.0, 2.0, 3.0])
+    store.write("usAAPL", [15, 20], [1.5, 9.0])
+    assert _stored(store, "usAAPL") == [(10, 1.0), (15, 1.5), (20, 9.0), (30, 3.0)]
+
+
+def test_flush_writes_buffered_quotes(tmp_path):
+    store = PriceHistoryStore(tmp_path)
+    day = date(2024, 3, 1)
+    store.record_quotes({"usAAPL": {"price": 190.0}, "fx_susdhkd": {"rate": 7.8}}, day=day)
+    store.record_quotes({"usAAPL": {"price": 191.0}}, day=day)
+    store.flush()
+    assert _stored(store, "usAAPL") == [(to_day(day), 191.0)]
+    assert store.close_on("fx_susdhkd", day) == 7.8
+
+
+def test_backfill_skips_days_without_fx_history(tmp_path):
+    store = PriceHistoryStore(tmp_path / "prices")
+    start = date(2024, 3, 4)  # Monday
+    days = [to_day(start + timedelta(days=i)) for i in range(5)]
+    store.write("usBFLA", days, [100.0] * 5)
+    store.write("fx_susdhkd", days[2:], [7.8] * 3)
+    manager = DataManager(SqliteStorage(str(tmp_path / "portfolio.db")))
+    manager.replace_holdings([Holding(id="a", ticker="BFLA", market="US", asset_type="Stock",
+                                      quantity=10, cost_basis=1).dict()])
+
+    created = backfill_snapshots(store, MarketData(providers=[]), manager, start, start + timedelta(days=4))
+    history = sorted(manager.get_history(), key=lambda s: str(s["date"]))
+
+    assert created == 3
+    assert [str(s["date"])[:10] for s in history] == ["2024-03-06", "2024-03-07", "2024-03-08"]
+    assert all(s["total_net_worth_hkd"] == 10 * 100.0 * 7.8 for s in history)
+
+
+def test_symbols_outside_the_store_are_rejected(tmp_path):
+    store = PriceHistoryStore(tmp_path / "prices")
+    for symbol in ("../x", "us../../x", "usA/B", "x", "usAAPL\n", "hk"):
+        with pytest.raises(ValueError, match="Invalid symbol"):
+            store.write(symbol, [1], [1.0])
+        assert len(store.series(symbol)) == 0
+    store.record_quotes({"../evil": {"price": 1.0}, "usAAPL": {"price": 2.0}})
+    store.flush()
+    assert store.symbols() == ["usAAPL"]
+    assert os.listdir(tmp_path) == ["prices"]
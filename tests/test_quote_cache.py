@@ -0,0 +1,112 @@
+from backend import market_data as md
+from backend.market_data import MarketData
+from backend.quote_cache import FRESH, STALE, QuoteCache, SharedQuoteCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fresh_stale_then_missing():
+    clock = Clock()
+    cache = QuoteCache(ttls={"quote": (15, 60)}, clock=clock)
+    cache.put("quote", "usAAPL", {"price": 1.0})
+
+    assert cache.get("quote", "usAAPL") == ({"price": 1.0}, FRESH)
+    clock.now += 15
+    assert cache.get("quote", "usAAPL")[1] == FRESH  # the ttl itself is still fresh
+    clock.now += 1
+    assert cache.get("quote", "usAAPL") == ({"price": 1.0}, STALE)
+    clock.now += 45
+    assert cache.get("quote", "usAAPL") == (None, None)
+    assert len(cache) == 0  # expired entries are dropped
+    assert cache.get("quote", "usNONE") == (None, None)
+
+
+def test_put_restarts_the_ttl():
+    clock = Clock()
+    cache = QuoteCache(ttls={"quote": (15, 60)}, clock=clock)
+    cache.put("quote", "usAAPL", {"price": 1.0})
+    clock.now += 30
+    cache.put("quote", "usAAPL", {"price": 2.0})
+    assert cache.get("quote", "usAAPL") == ({"price": 2.0}, FRESH)
+
+
+def test_kinds_have_their_own_ttl():
+    clock = Clock()
+    cache = QuoteCache(ttls={"quote": (15, 60), "name": (3600, 7200)}, clock=clock)
+    cache.put_many([("quote", "usAAPL", {"price": 1.0}), ("name", "usAAPL", {"name": "Apple"})])
+    clock.now += 100
+    assert cache.get("quote", "usAAPL") == (None, None)
+    assert cache.get("name", "usAAPL") == ({"name": "Apple"}, FRESH)
+
+
+def test_lru_eviction_bound():
+    cache = QuoteCache(max_entries=3, clock=Clock())
+    for symbol in ("a", "b", "c"):
+        cache.put("quote", symbol, {"price": 1.0})
+    cache.get("quote", "a")  # a is now the most recently used
+    cache.put("quote", "d", {"price": 1.0})
+
+    assert len(cache) == 3
+    assert cache.get("quote", "b") == (None, None)
+    assert all(cache.get("quote", s)[0] for s in ("a", "c", "d"))
+
+
+def test_refresh_claims_are_exclusive():
+    cache = QuoteCache(clock=Clock())
+    assert cache.claim_refresh(["a", "b"]) == ["a", "b"]
+    assert cache.claim_refresh(["b", "c"]) == ["c"]
+    cache.release_refresh(["b"])
+    assert cache.claim_refresh(["b"]) == ["b"]
+
+
+def _stale_cache(monkeypatch):
+    clock = Clock()
+    cache = QuoteCache(ttls={"quote": (15, 60), "name": (15, 60)}, clock=clock)
+    cache.put_many([("quote", "usSWR", {"price": 5.0}), ("name", "usSWR", {"name": "Swr", "english_name": "Swr"})])
+    clock.now += 30
+    monkeypatch.setattr(md, "_QUOTE_CACHE", cache)
+
+
+def _market_data(monkeypatch, refresh_stale):
+    market_data = MarketData(providers=[])
+    market_data.refresh_stale = refresh_stale
+    refreshed = []
+    monkeypatch.setattr(market_data, "_refresh_in_background", refreshed.extend)
+    return market_data, refreshed
+
+
+def test_stale_entries_are_served_and_refreshed(monkeypatch):
+    _stale_cache(monkeypatch)
+    market_data, refreshed = _market_data(monkeypatch, refresh_stale=True)
+
+    assert market_data.get_quotes(["usSWR"]) == {"usSWR": {"price": 5.0}}
+    assert market_data.get_company_name("SWR", "US", quotes={}) == "Swr"
+    assert refreshed == ["usSWR", "usSWR"]
+
+
+def test_non_leader_never_refreshes(monkeypatch):
+    _stale_cache(monkeypatch)
+    market_data, refreshed = _market_data(monkeypatch, refresh_stale=False)
+
+    assert market_data.get_quotes(["usSWR"]) == {"usSWR": {"price": 5.0}}
+    assert market_data.get_company_name("SWR", "US", quotes={}) == "Swr"
+    assert refreshed == []
+
+
+def test_shared_entry_is_read_by_another_worker(tmp_path):
+    path = tmp_path / "quote_cache.db"
+    clock = Clock()
+    writer, reader = QuoteCache(ttls={"quote": (15, 60)}), QuoteCache(ttls={"quote": (15, 60)})
+    writer.shared = SharedQuoteCache(path, clock=clock)
+    reader.shared = SharedQuoteCache(path, clock=clock)
+    writer.put_many([("quote", "usAAPL", {"price": 1.0})])
+
+    assert reader.get("quote", "usAAPL") == ({"price": 1.0}, FRESH)
+    clock.now += 30
+    assert reader.shared.get("quote", "usAAPL") == ({"price": 1.0}, 30.0)
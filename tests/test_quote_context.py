@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from datetime import date
+from backend import market_data as md
+from backend.market_data import MarketData, QuoteContext
+from backend.models import Holding
+from backend.quote_sources import CircuitBreaker, LastKnownGoodStore
+
+
+class RecordingProvider:
+    name = "recording"
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.breaker = CircuitBreaker()
+        self.calls = []
+
+    def fetch(self, symbols):
+        self.calls.append(list(symbols))
+        return {s: self.quotes[s] for s in symbols if s in self.quotes}
+
+
+def _holdings():
+    return [
+        Holding(ticker="QCA", market="US", asset_type="Stock", quantity=1, cost_basis=1),
+        Holding(ticker="QCA", market="US", asset_type="Stock", quantity=2, cost_basis=1),
+        Holding(ticker="qca", market="US", asset_type="Option", quantity=-1, cost_basis=1, option_type="Put",
+                strike_price=10, expiry_date=date(2030, 1, 18)),
+        Holding(ticker="USD", market="US", asset_type="Cash", quantity=100, cost_basis=1),
+        Holding(ticker="7001", market="HK", asset_type="Stock", quantity=100, cost_basis=1),
+        Holding(ticker="07001", market="HK", asset_type="Stock", quantity=100, cost_basis=1),
+        Holding(ticker="HKD", market="HK", asset_type="Cash", quantity=100, cost_basis=1),
+    ]
+
+
+def test_plan_dedupes_symbols_and_fx_pairs():
+    context = QuoteContext(MarketData(providers=[])).plan(_holdings())
+    assert list(context.symbols) == ["usQCA", "fx_susdhkd", "hk07001"]
+
+
+def test_fetch_is_one_batched_call_and_lookups_are_memoized(monkeypatch):
+    provider = RecordingProvider({"usQCA": {"price": 12.0, "name": "Q"}, "hk07001": {"price": 3.0, "name": "H"},
+                                  "fx_susdhkd": {"rate": 7.8}})
+    market_data = MarketData(providers=[provider])
+    context = QuoteContext(market_data).plan(_holdings()).fetch(refresh=True)
+    assert provider.calls == [["usQCA", "fx_susdhkd", "hk07001"]]
+
+    lookups = []
+    original = market_data.get_current_price
+    monkeypatch.setattr(market_data, "get_current_price", lambda *a, **k: lookups.append(a) or original(*a, **k))
+    assert [context.price("QCA", "US") for _ in range(3)] == [12.0] * 3
+    assert context.fx_rate("USD") == 7.8
+    assert lookups == [("QCA", "US")]
+    assert len(provider.calls) == 1
+
+
+def test_from_cache_never_fetches(tmp_path):
+    provider = RecordingProvider({"usQCB": {"price": 1.0}})
+    market_data = MarketData(providers=[provider])
+    holdings = [Holding(ticker="QCB", market="US", asset_type="Stock", quantity=1, cost_basis=1),
+                Holding(ticker="QCC", market="US", asset_type="Stock", quantity=1, cost_basis=1)]
+
+    context = QuoteContext(market_data).plan(holdings).from_cache()
+    assert provider.calls == []
+    assert context.price("QCB", "US") == 0.0
+    assert context.price_as_of("QCB", "US") == "unavailable"
+
+    # Misses fall back to last-known-good, marked stale
+    market_data.last_known_good = LastKnownGoodStore(str(tmp_path / "last_good.json"))
+    market_data.last_known_good.record({"usQCC": {"price": 4.0}})
+    context = QuoteContext(market_data).plan(holdings).from_cache()
+    assert provider.calls == []
+    assert context.price("QCC", "US") == 4.0 and context.quotes["usQCC"]["stale"]
+    assert context.price_as_of("QCC", "US") == market_data.last_known_good.get("usQCC")["as_of"]
+
+
+def test_afetch_fetches_every_batch_concurrently(monkeypatch):
+    symbols = [f"usQCD{i}" for i in range(5)]
+    barrier = threading.Barrier(3, timeout=5)  # all three batches must be in flight at once
+
+    class ConcurrentProvider(RecordingProvider):
+        def fetch(self, batch):
+            barrier.wait()
+            return super().fetch(batch)
+
+    provider = ConcurrentProvider({s: {"price": float(i + 1)} for i, s in enumerate(symbols)})
+    monkeypatch.setattr(md, "QUOTE_BATCH_SIZE", 2)
+    holdings = [Holding(ticker=s[2:], market="US", asset_type="Stock", quantity=1, cost_basis=1) for s in symbols]
+    context = QuoteContext(MarketData(providers=[provider])).plan(holdings)
+
+    asyncio.run(context.afetch(refresh=True))
+    assert sorted(map(len, provider.calls)) == [2, 2, 2]  # five stocks plus fx_susdhkd
+    assert [context.price(s[2:], "US") for s in symbols] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_aget_quotes_serves_cache_without_fetching():
+    md._QUOTE_CACHE.put("quote", "usQCE", {"price": 9.0})
+    provider = RecordingProvider({})
+    assert asyncio.run(MarketData(providers=[provider]).aget_quotes(["usQCE"])) == {"usQCE": {"price": 9.0}}
+    assert provider.calls == []
@@ -0,0 +1,58 @@
+from backend.quote_sources import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _opened(clock):
+    breaker = CircuitBreaker(failures=3, reset_timeout=30, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures():
+    clock = Clock()
+    breaker = CircuitBreaker(failures=3, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker = _opened(clock)
+    assert breaker.state == OPEN
+    clock.now = 29.9
+    assert not breaker.allow()
+
+
+def test_half_open_lets_one_trial_through():
+    clock = Clock()
+    breaker = _opened(clock)
+    clock.now = 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one trial in flight
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_trial_reopens():
+    clock = Clock()
+    breaker = _opened(clock)
+    clock.now = 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now = 59
+    assert not breaker.allow()
+    clock.now = 60
+    assert breaker.allow()
@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+import numpy as np
+from backend import market_data as md
+from backend import risk
+from backend.market_data import MarketData, QuoteContext
+from backend.models import Holding
+from backend.price_history import PriceHistoryStore, to_day
+from backend.valuation import value_portfolio
+
+
+def _book(tmp_path):
+    md._QUOTE_CACHE.put_many([("quote", "usRSKA", {"price": 100.0, "name": "A"}),
+                              ("fx", "fx_susdhkd", {"rate": 7.8})])
+    market_data = MarketData(providers=[])
+    holdings = [
+        Holding(ticker="RSKA", market="US", asset_type="Stock", quantity=100, cost_basis=1),
+        # American: the summary prices it on the binomial tree
+        Holding(ticker="RSKA", market="US", asset_type="Option", quantity=-3, cost_basis=1, option_type="Put",
+                strike_price=105, expiry_date=date.today() + timedelta(days=90)),
+        Holding(ticker="HKD", market="HK", asset_type="Cash", quantity=5000, cost_basis=1),
+    ]
+    quotes = QuoteContext(market_data).plan(holdings).from_cache()
+    store = PriceHistoryStore(tmp_path)
+    days = np.arange(to_day(date.today()) - 300, to_day(date.today()))
+    closes = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.02, len(days))))
+    store.write("usRSKA", days, closes)
+    return holdings, quotes, market_data, store
+
+
+def test_value_matches_summary(tmp_path):
+    holdings, quotes, market_data, store = _book(tmp_path)
+    report = risk.risk_report(holdings, quotes, market_data, store, paths=2000)
+
+    assert report["portfolio_value_hkd"] == value_portfolio(holdings, quotes, market_data).total_net_worth_hkd
+    assert report["monte_carlo"]["var"]["0.99"] >= report["monte_carlo"]["var"]["0.95"] > 0
+    assert report["missing_history"] == ["fx_susdhkd"]
+
+
+def test_unshocked_path_has_no_pnl(tmp_path):
+    holdings, quotes, market_data, _ = _book(tmp_path)
+    symbols, _, positions, _ = risk.build_positions(holdings, quotes, market_data)
+
+    pnl = risk.revalue(positions, np.zeros((1, len(symbols))), horizon_days=0)
+    assert abs(pnl[0]) < 1e-9
@@ -0,0 +1,77 @@
+import threading
+import time
+from backend.rwlock import ReadWriteLock
+
+
+def _start(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_readers_run_concurrently():
+    lock = ReadWriteLock()
+    both_inside = threading.Barrier(2, timeout=5)
+
+    def reader():
+        with lock.read():
+            both_inside.wait()  # BrokenBarrierError if the readers were serialized
+
+    threads = [_start(reader) for _ in range(2)]
+    for thread in threads:
+        thread.join(5)
+    assert not both_inside.broken
+
+
+def test_writer_excludes_readers_and_writers():
+    lock = ReadWriteLock()
+    inside = []
+    overlaps = []
+
+    def enter(kind):
+        ctx = lock.write() if kind == "w" else lock.read()
+        with ctx:
+            if "w" in inside or (kind == "w" and inside):
+                overlaps.append((kind, list(inside)))
+            inside.append(kind)
+            time.sleep(0.001)
+            inside.remove(kind)
+
+    threads = [_start(lambda k=k: [enter(k) for _ in range(20)]) for k in "wwrrr"]
+    for thread in threads:
+        thread.join(10)
+    assert overlaps == []
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    order = []
+    first_reader_in = threading.Event()
+    release_first = threading.Event()
+
+    def first_reader():
+        with lock.read():
+            first_reader_in.set()
+            release_first.wait(5)
+        order.append("r1 out")
+
+    def writer():
+        with lock.write():
+            order.append("w")
+
+    def late_reader():
+        with lock.read():
+            order.append("r2")
+
+    threads = [_start(first_reader)]
+    first_reader_in.wait(5)
+    threads.append(_start(writer))
+    while not lock._writers_waiting:
+        time.sleep(0.001)
+    threads.append(_start(late_reader))
+    time.sleep(0.05)
+    assert order == []  # the late reader queues behind the waiting writer
+    release_first.set()
+    for thread in threads:
+        thread.join(5)
+    assert order.index("w") < order.index("r2")
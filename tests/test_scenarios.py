@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+import pytest
+from backend import market_data as md
+from backend.market_data import MarketData, QuoteContext
+from backend.models import Holding, Scenario
+from backend.options import OPTION_MULTIPLIER
+from backend.scenarios import ScenarioBook
+
+FX = 7.8
+
+
+def _book():
+    md._QUOTE_CACHE.put_many([("quote", "usSCNA", {"price": 120.0, "name": "A"}),
+                              ("fx", "fx_susdhkd", {"rate": FX})])
+    market_data = MarketData(providers=[])
+    holdings = [
+        Holding(id="stock", ticker="SCNA", market="US", asset_type="Stock", quantity=10, cost_basis=1),
+        Holding(id="call", ticker="SCNA", market="US", asset_type="Option", quantity=2, cost_basis=1,
+                option_type="Call", strike_price=100, expiry_date=date.today() + timedelta(days=30)),
+        Holding(id="put", ticker="SCNA", market="US", asset_type="Option", quantity=-1, cost_basis=1,
+                option_type="Put", strike_price=130, expiry_date=date.today() + timedelta(days=30)),
+    ]
+    quotes = QuoteContext(market_data).plan(holdings).from_cache()
+    return ScenarioBook(holdings, quotes, market_data)
+
+
+def test_unshocked_scenario_matches_base():
+    book = _book()
+    [result] = book.evaluate([Scenario(name="base")])
+    assert result["change_hkd"] == pytest.approx(0, abs=1e-6)
+    assert result["total_net_worth_hkd"] == pytest.approx(book.base.total_net_worth_hkd)
+
+
+def test_exercise_settles_shares_and_cash_at_strike():
+    book = _book()
+    [result] = book.evaluate([Scenario(exercise=["call", "put"], ticker={"SCNA": -0.5})], include_holdings=True)
+    spot = 60.0
+    rows = {row["id"]: row for row in result["holdings"]}
+
+    # Long call exercised: buy 200 shares at 100; short put assigned: buy 100 shares at 130
+    call_shares, put_shares = 2 * OPTION_MULTIPLIER, 1 * OPTION_MULTIPLIER
+    assert rows["call"]["exercised"] and rows["put"]["exercised"]
+    assert rows["call"]["market_value_hkd"] == pytest.approx(call_shares * (spot - 100) * FX)
+    assert rows["put"]["market_value_hkd"] == pytest.approx(put_shares * (spot - 130) * FX)
+    cash = -(call_shares * 100 + put_shares * 130) * FX
+    stock = 10 * spot * FX
+    assert result["market_distribution"]["Cash"] == pytest.approx(cash)
+    assert result["total_net_worth_hkd"] == pytest.approx(stock + (call_shares + put_shares) * spot * FX + cash)
+
+
+def test_unknown_exercise_id_is_rejected():
+    with pytest.raises(ValueError, match="stock"):
+        _book().evaluate([Scenario(exercise=["stock"])])
+
+
+def test_unknown_shock_keys_are_rejected():
+    book = _book()
+    with pytest.raises(ValueError, match="ticker shocks match nothing in the portfolio: SCNB, 0700"):
+        book.evaluate([Scenario(ticker={"SCNB": 0.1}), Scenario(ticker={"0700": 0.1, "SCNA": 0.1})])
+    with pytest.raises(ValueError, match="market shocks .*: JP"):
+        book.evaluate([Scenario(market={"US": -0.1, "JP": -0.1})])
+    with pytest.raises(ValueError, match="fx shocks .*: EUR"):
+        book.evaluate([Scenario(fx={"EUR": 0.01})])
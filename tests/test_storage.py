@@ -0,0 +1,67 @@
+import json
+import sqlite3
+import time
+from backend.storage import JsonStorage, SqliteStorage
+
+V0_SCHEMA = """
+    CREATE TABLE holdings (id TEXT PRIMARY KEY, ticker TEXT, market TEXT, data TEXT NOT NULL);
+    CREATE TABLE snapshots (id TEXT PRIMARY KEY, date TEXT, total_net_worth_hkd REAL, data TEXT NOT NULL);
+"""
+
+
+def _snapshots(n):
+    return [{"id": f"s{i}", "date": f"2024-01-{i % 28 + 1:02d}", "total_net_worth_hkd": float(i),
+             "holdings_snapshot": [{"id": "h", "ticker": "0700", "market": "HK", "quantity": i}]}
+            for i in range(n)]
+
+
+def _interrupted_v0(path, snapshots, converted):
+    """A v0 database whose migration committed `converted` rows before the process stopped."""
+    conn = sqlite3.connect(path)
+    conn.executescript(V0_SCHEMA)
+    with conn:
+        conn.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?)",
+                         [(s["id"], s["date"], s["total_net_worth_hkd"], json.dumps(s)) for s in snapshots])
+        conn.execute("ALTER TABLE snapshots ADD COLUMN holdings BLOB")
+        for s in snapshots[:converted]:
+            conn.execute("UPDATE snapshots SET data = ?, holdings = ? WHERE id = ?",
+                         SqliteStorage._snapshot_row(s)[3:] + (s["id"],))
+    conn.close()
+
+
+def test_interrupted_migration_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(SqliteStorage, "MIGRATE_BATCH", 4)
+    path = str(tmp_path / "portfolio.db")
+    snapshots = _snapshots(11)
+    _interrupted_v0(path, snapshots, converted=5)
+
+    storage = SqliteStorage(path)
+    assert storage.load_snapshots() == snapshots  # mixed rows read correctly meanwhile
+    storage.migration.join(10)
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SqliteStorage.SCHEMA_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM snapshots WHERE holdings IS NULL").fetchone()[0] == 0
+    assert storage.load_snapshots() == snapshots
+    # Migrating is not a data change: HTTP validators stay put
+    assert {v for v, _ in storage.versions().values()} == {0}
+
+
+def test_migrated_database_does_not_migrate_again(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    _interrupted_v0(path, _snapshots(3), converted=0)
+    SqliteStorage(path).migration.join(10)
+
+    assert SqliteStorage(path).migration is None
+
+
+def test_json_write_behind_has_a_max_delay(tmp_path):
+    path = tmp_path / "portfolio.json"
+    storage = JsonStorage(str(path), debounce=0.2, max_delay=0.5)
+    start = time.monotonic()
+    # Edits every 50ms never pause for the debounce; the max delay still forces a write
+    while not path.exists() and time.monotonic() - start < 3:
+        storage.save_all({"holdings": [], "snapshots": []})
+        time.sleep(0.05)
+    assert path.exists() and time.monotonic() - start < 1.0
+    storage.flush()
@@ -0,0 +1,72 @@
+import asyncio
+from backend.models import PortfolioSummary
+from backend.streaming import SummaryStreamer, diff_summary
+
+
+def _summary(*rows, total=None):
+    holdings = [{"id": id, "ticker": id.upper(), "market_value_hkd": value} for id, value in rows]
+    return PortfolioSummary(
+        total_net_worth_hkd=total if total is not None else sum(value for _, value in rows),
+        holdings=holdings,
+        market_distribution={"US": 0}, sector_distribution={}, ticker_distribution={}
+    )
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.accepted = False
+        self.sent = []
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+def test_unchanged_summary_sends_nothing():
+    assert diff_summary(_summary(("a", 1.0), ("b", 2.0)), _summary(("a", 1.0), ("b", 2.0))) is None
+
+
+def test_only_changed_holdings_are_sent():
+    message = diff_summary(_summary(("a", 1.0), ("b", 2.0)), _summary(("a", 1.0), ("b", 3.0)))
+
+    assert message["type"] == "update"
+    assert [h["id"] for h in message["holdings"]] == ["b"] and message["removed"] == []
+    assert message["total_net_worth_hkd"] == 4.0
+
+
+def test_removed_holdings_are_listed():
+    message = diff_summary(_summary(("a", 1.0), ("b", 2.0)), _summary(("a", 1.0), total=3.0))
+
+    assert message["holdings"] == [] and message["removed"] == ["b"]
+
+
+def test_first_clients_start_and_last_client_stops_the_refresher():
+    computes = []
+    summary = _summary(("a", 1.0))
+
+    async def compute():
+        computes.append(1)
+        return summary
+
+    async def scenario():
+        streamer = SummaryStreamer(compute, interval=0.01)
+        first, second = FakeWebSocket(), FakeWebSocket()
+        await streamer.connect(first, summary)
+        task = streamer._task
+        await streamer.connect(second, summary)
+        assert streamer._task is task  # one refresher, however many clients
+        await asyncio.sleep(0.05)
+        await streamer.disconnect(first)
+        assert streamer._task is task
+        await streamer.disconnect(second)
+        assert streamer._task is None
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.accepted and first.sent[0]["type"] == "summary" and first.sent[0]["holdings"][0]["id"] == "a"
+    # Nothing changed, so the refresher ran without broadcasting
+    assert computes and len(first.sent) == len(second.sent) == 1
@@ -0,0 +1,91 @@
+import asyncio
+from backend import market_data as md
+from backend.data_manager import DataManager
+from backend.market_data import MarketData, QuoteContext
+from backend.models import Holding
+from backend.scheduler import SummaryCache
+from backend.storage import SqliteStorage
+from backend.valuation import IncrementalValuation, value_portfolio
+
+
+def _holding(ticker, quantity, id):
+    return Holding(id=id, ticker=ticker, market="US", asset_type="Stock", quantity=quantity, cost_basis=1)
+
+
+def _setup(tmp_path, edits, deliver_later=None, incremental=True):
+    """
+    DataManager + IncrementalValuation + SummaryCache valued from cached quotes.
+    `edits` are applied inside the compute, before the holdings are read; with
+    `deliver_later` (a list) change events are queued there instead of delivered.
+    The compute appends to the returned list each time it runs.
+    """
+    md._QUOTE_CACHE.put_many([("quote", "usSCA", {"price": 10.0, "name": "A"}),
+                              ("quote", "usSCB", {"price": 20.0, "name": "B"}),
+                              ("fx", "fx_susdhkd", {"rate": 7.8})])
+    market_data = MarketData(providers=[])
+    manager = DataManager(SqliteStorage(str(tmp_path / "portfolio.db")))
+    manager.replace_holdings([_holding("SCA", 1, "a").dict()])
+    model = IncrementalValuation(market_data)
+    if deliver_later is None:
+        manager.subscribe(model.on_holding_change)
+    else:
+        manager.subscribe(lambda *event: deliver_later.append(event))
+
+    computes = []
+
+    async def compute():
+        computes.append(1)
+        while edits:
+            manager.add_holding(edits.pop())
+        holdings, version = manager.get_holdings_versioned()
+        quotes = QuoteContext(market_data).plan(holdings).from_cache()
+        return value_portfolio(holdings, quotes, market_data), version
+
+    cache = SummaryCache(compute, lambda: manager.holdings_version, incremental=model if incremental else None)
+    return manager, model, cache, computes
+
+
+def test_edit_during_compute_is_counted_once(tmp_path):
+    events = []
+    edits = []
+    manager, model, cache, _ = _setup(tmp_path, edits, deliver_later=events)
+    asyncio.run(cache.refresh())
+    for event in events:
+        model.on_holding_change(*event)
+    events.clear()
+
+    # The edit commits after refresh() started, and its event reaches the model late
+    edits.append(_holding("SCB", 2, "b"))
+    asyncio.run(cache.refresh())
+    for event in events:
+        model.on_holding_change(*event)
+
+    summary = asyncio.run(cache.get())
+    assert summary.total_net_worth_hkd == (10.0 + 2 * 20.0) * 7.8
+    assert [h["id"] for h in summary.holdings] == ["a", "b"]
+
+
+def test_summary_outdated_by_the_compute_does_not_seed_the_model(tmp_path):
+    manager, model, cache, _ = _setup(tmp_path, [])
+    before = asyncio.run(cache.refresh())
+    version = manager.holdings_version
+    assert model.version == version
+
+    manager.add_holding(_holding("SCB", 2, "b"))
+    assert model.version == version + 1
+    # A compute that read the holdings before that edit finishes late
+    cache.put(before, version)
+    assert model.version == version + 1
+    summary = asyncio.run(cache.get())
+    assert summary.total_net_worth_hkd == (10.0 + 2 * 20.0) * 7.8
+
+
+def test_holdings_edit_invalidates_cached_summary(tmp_path):
+    manager, _, cache, computes = _setup(tmp_path, [], incremental=False)
+    first = asyncio.run(cache.get())
+    assert asyncio.run(cache.get()) is first and len(computes) == 1
+
+    manager.add_holding(_holding("SCB", 2, "b"))
+    summary = asyncio.run(cache.get())
+    assert len(computes) == 2
+    assert summary.total_net_worth_hkd == (10.0 + 2 * 20.0) * 7.8
@@ -0,0 +1,32 @@
+import pytest
+from backend.symbol_metadata import SymbolMetadataStore
+
+
+def _store(tmp_path):
+    return SymbolMetadataStore(str(tmp_path / "symbols.json"))
+
+
+def test_lot_size_is_normalized(tmp_path):
+    store = _store(tmp_path)
+    assert store.update("hk00700", {"lot_size": "100"})["lot_size"] == 100
+    assert store.update("hk00005", {"lot_size": 400.0})["lot_size"] == 400
+
+
+@pytest.mark.parametrize("value", ["abc", "0", "-100", "12.5", "inf", [100]])
+def test_invalid_lot_size_is_rejected(tmp_path, value):
+    store = _store(tmp_path)
+    with pytest.raises(ValueError, match="lot_size"):
+        store.update("hk00700", {"lot_size": value})
+    assert store.get("hk00700") is None
+
+
+def test_reference_import_names_the_bad_row_and_stores_nothing(tmp_path):
+    store = _store(tmp_path)
+    text = "symbol,name,lot_size\nhk00700,Tencent,100\nhk00005,HSBC,four hundred\n"
+    with pytest.raises(ValueError, match=r"line 3 \(hk00005\): lot_size .*'four hundred'"):
+        store.load_reference(text)
+    assert store.get("hk00700") is None
+
+    with pytest.raises(ValueError, match="hk09988: lot_size"):
+        store.load_reference('{"hk09988": {"lot_size": "x"}}')
+    assert store.load_reference(text.replace("four hundred", "400")) == 2
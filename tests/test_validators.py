@@ -0,0 +1,56 @@
+from datetime import date
+from backend.data_manager import DataManager
+from backend.models import Holding, PortfolioSnapshot
+from backend.storage import SqliteStorage
+
+
+def _snapshot(day, total):
+    return PortfolioSnapshot(date=day, total_net_worth_hkd=total, holdings_snapshot=[])
+
+
+def _managers(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    return DataManager(SqliteStorage(path)), DataManager(SqliteStorage(path))
+
+
+def test_workers_agree_on_validators(tmp_path):
+    a, b = _managers(tmp_path)
+    assert a.validators("holdings", "snapshots") == b.validators("holdings", "snapshots")
+
+    a.save_snapshot(_snapshot(date(2024, 1, 1), 1.0))
+    assert a.validators("snapshots") == b.validators("snapshots")
+    assert len(b.get_history()) == 1
+
+
+def test_other_worker_commits_change_validators(tmp_path):
+    # Worker A serves (X, Y); worker B then writes Z. The same in-process counter value must
+    # not be reported for different data.
+    a, b = _managers(tmp_path)
+    a.save_snapshot(_snapshot(date(2024, 1, 1), 1.0))
+    a.save_snapshot(_snapshot(date(2024, 1, 2), 2.0))
+    served = a.validators("snapshots")
+    b.get_history()
+    b.save_snapshot(_snapshot(date(2024, 1, 3), 3.0))
+
+    assert a.validators("snapshots") != served
+    assert a.validators("snapshots") == b.validators("snapshots")
+    assert len(a.get_history()) == 3
+
+
+def test_validators_track_each_kind(tmp_path):
+    a, b = _managers(tmp_path)
+    snapshots = a.validators("snapshots")
+    holdings = a.validators("holdings")
+    b.add_holding(Holding(ticker="AAPL", market="US", asset_type="Stock", quantity=1, cost_basis=1))
+
+    assert a.validators("snapshots") == snapshots
+    assert a.validators("holdings") != holdings
+
+
+def test_validators_survive_restart(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    a = DataManager(SqliteStorage(path))
+    a.save_snapshot(_snapshot(date(2024, 1, 1), 1.0))
+    before = a.validators("holdings", "snapshots")
+
+    assert DataManager(SqliteStorage(path)).validators("holdings", "snapshots") == before
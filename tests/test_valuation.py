@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+from backend import market_data as md
+from backend.market_data import MarketData, QuoteContext
+from backend.models import Holding
+from backend.options import EXPOSURE_MODE
+from backend.symbol_metadata import SymbolMetadataStore
+from backend.valuation import value_portfolio
+
+
+def _portfolio(tmp_path):
+    md._QUOTE_CACHE.put_many([
+        ("quote", "usVALA", {"price": 187.5, "name": "阿", "english_name": "Vala Inc."}),
+        ("quote", "hk00700", {"price": 401.2, "name": "腾讯控股"}),
+        ("quote", "hk09988", {"price": 85.35, "name": "阿里巴巴"}),
+        ("quote", "sh600519", {"price": 1650.0, "name": "贵州茅台"}),
+        ("fx", "fx_susdhkd", {"rate": 7.81}),
+        ("fx", "fx_scnyhkd", {"rate": 1.087}),
+    ])
+    market_data = MarketData(providers=[])
+    market_data.symbol_metadata = SymbolMetadataStore(str(tmp_path / "symbols.json"))
+    market_data.symbol_metadata.update("hk00700", {"sector": "Communication"})
+    market_data.symbol_metadata.update("usVALA", {"sector": "Technology"})
+    expiry = date.today() + timedelta(days=45)
+    holdings = [
+        Holding(ticker="USD", market="US", asset_type="Cash", quantity=12500.5, cost_basis=1),
+        Holding(ticker="HKD", market="HK", asset_type="Cash", quantity=-3000, cost_basis=1),
+        Holding(ticker="CNY", market="CN", asset_type="Cash", quantity=8000, cost_basis=1),
+        Holding(ticker="VALA", market="US", asset_type="Stock", quantity=35, cost_basis=120.3),
+        Holding(ticker="0700", market="HK", asset_type="Stock", quantity=300, cost_basis=310),
+        Holding(ticker="9988", market="HK", asset_type="Stock", quantity=1000, cost_basis=95,
+                custom_sector="E-commerce", company_name="Alibaba"),
+        Holding(ticker="600519", market="CN", asset_type="Stock", quantity=100, cost_basis=1500),
+        Holding(ticker="0700", market="HK", asset_type="Stock", quantity=200, cost_basis=350),  # same symbol twice
+        Holding(ticker="NOQT", market="US", asset_type="Stock", quantity=10, cost_basis=50),  # no quote anywhere
+        Holding(ticker="VALA", market="US", asset_type="Option", quantity=-2, cost_basis=4.1,
+                option_type="Put", strike_price=180, expiry_date=expiry),
+        Holding(ticker="VALA", market="US", asset_type="Option", quantity=3, cost_basis=6.0,
+                option_type="Call", strike_price=195, expiry_date=expiry),
+        Holding(ticker="0700", market="HK", asset_type="Option", quantity=-1, cost_basis=9.0,
+                option_type="Put", strike_price=380, expiry_date=expiry),
+    ]
+    quotes = QuoteContext(market_data).plan(holdings).from_cache()
+    return holdings, quotes, market_data
+
+
+def _reference(holdings, quotes, market_data):
+    """The original per-holding loop, reading the same quotes."""
+    total = 0.0
+    market_dist = {"US": 0, "HK": 0, "CN": 0, "Cash": 0}
+    sector_dist, ticker_dist = {}, {}
+    for h in holdings:
+        fx = quotes.fx_rate(market_data.get_currency(h.market))
+        if h.asset_type == "Cash":
+            value = h.quantity * fx
+            total += value
+            market_dist["Cash"] += value
+        elif h.asset_type == "Stock":
+            value = h.quantity * quotes.price(h.ticker, h.market) * fx
+            total += value
+            name = h.company_name or quotes.company_name(h.ticker, h.market)
+            sector = h.custom_sector or market_data.get_sector(h.ticker, h.market)
+            ticker_key = h.ticker if h.market == "US" else (name or h.ticker)
+            market_dist[h.market] = market_dist.get(h.market, 0) + value
+            sector_dist[sector] = sector_dist.get(sector, 0) + value
+            ticker_dist[ticker_key] = ticker_dist.get(ticker_key, 0) + value
+        else:
+            premium = quotes.option_price(h.ticker, h.strike_price, h.expiry_date, h.option_type, h.market)
+            value = h.quantity * premium * 100 * fx
+            total += value
+            exposure = abs(h.quantity) * h.strike_price * 100 * fx if h.option_type == "Put" and h.quantity < 0 else 0
+            market_dist[h.market] = market_dist.get(h.market, 0) + value
+            sector = market_data.get_sector(h.ticker, h.market)
+            sector_dist[sector] = sector_dist.get(sector, 0) + exposure
+            ticker_dist[h.ticker] = ticker_dist.get(h.ticker, 0) + exposure
+    return total, market_dist, sector_dist, ticker_dist
+
+
+def test_vectorized_valuation_matches_per_row_loop(tmp_path):
+    assert EXPOSURE_MODE == "strike"  # the reference loop computes strike exposure
+    holdings, quotes, market_data = _portfolio(tmp_path)
+    summary = value_portfolio(holdings, quotes, market_data)
+    total, market_dist, sector_dist, ticker_dist = _reference(holdings, quotes, market_data)
+
+    assert summary.total_net_worth_hkd == total
+    assert summary.market_distribution == market_dist
+    assert summary.sector_distribution == sector_dist
+    assert summary.ticker_distribution == ticker_dist
+    assert list(summary.ticker_distribution) == list(ticker_dist)  # first-appearance order
+    assert summary.stale_tickers == ["NOQT"]
+    assert summary.holdings[8]["market_value_hkd"] == 0.0
@@ -0,0 +1,36 @@
+import asyncio
+from backend.workers import LeaderElection, LeaderLock
+
+
+def test_second_lock_is_not_acquired_until_released(tmp_path):
+    path = tmp_path / "leader.lock"
+    first, second = LeaderLock(path), LeaderLock(path)
+
+    assert first.try_acquire() and first.held
+    assert not second.try_acquire() and not second.held
+    first.release()
+    assert not first.held
+    assert second.try_acquire()
+    second.release()
+
+
+def test_stopping_the_leader_releases_the_lock(tmp_path):
+    path = tmp_path / "leader.lock"
+    events = []
+
+    async def elected():
+        events.append("elected")
+
+    async def resigned():
+        events.append("resigned")
+
+    async def scenario():
+        election = LeaderElection(LeaderLock(path), elected, resigned)
+        await election.start()
+        assert election.is_leader and not LeaderLock(path).try_acquire()
+        await election.stop()
+        assert not election.is_leader
+
+    asyncio.run(scenario())
+    assert events == ["elected", "resigned"]
+    assert LeaderLock(path).try_acquire()